@@ -0,0 +1,412 @@
+"""Benchmarks of gmalg.
+
+Usage:
+
+    python benchmark.py [name ...]
+
+Run all benchmarks if no name given.
+"""
+
+import sys
+import time
+from typing import Callable, Dict
+
+import gmalg
+import gmalg.ellipticcurve as Ec
+import gmalg.primefield as Fp
+
+
+def _timeit(fn: Callable[[], object], number: int) -> float:
+    """Returns average seconds of one call."""
+
+    begin = time.perf_counter()
+    for _ in range(number):
+        fn()
+    return (time.perf_counter() - begin) / number
+
+
+def _report(name: str, seconds: float) -> None:
+    print(f"  {name:<24}{seconds * 1000:>10.3f} ms/op{1 / seconds:>12.2f} op/s")
+
+
+def _report_speed(name: str, nbytes: int, seconds: float) -> None:
+    print(f"  {name:<24}{seconds * 1000:>10.3f} ms/op{nbytes / seconds / 1e6:>12.3f} MB/s")
+
+
+def _report_blocks(name: str, nblocks: int, seconds: float) -> None:
+    print(f"  {name:<24}{seconds * 1000:>10.3f} ms/op{nblocks / seconds:>12.0f} blocks/s")
+
+
+def bench_primefield() -> None:
+    """SM2 and SM9 operation speeds on every prime field backend."""
+
+    default = Fp.get_backend().name
+
+    sm2_ecdlp = gmalg.sm2._ecdlp
+    sm9_bnbp = gmalg.sm9._bnbp
+
+    k = 0x59276E27_D506861A_16680F3A_D9C02DCC_EF3CC1FA_3CDBE4CE_6D54B80D_EAC1BC21
+    message = b"message digest"
+    uid = b"1234567812345678"
+
+    try:
+        for name in Fp.available_backends():
+            Fp.set_backend(name)
+            print(f"backend: {name}")
+
+            ecdlp = Ec.ECDLP(int(sm2_ecdlp.fp.p), int(sm2_ecdlp.ec.a), int(sm2_ecdlp.ec.b), sm2_ecdlp.G, int(sm2_ecdlp.fpn.p))
+            sm2 = gmalg.sm2.SM2Core(ecdlp, gmalg.SM3)
+            sk, pk = sm2.generate_keypair()
+            r, s = sm2.sign(message, sk, uid, pk)
+
+            _report("SM2 kG", _timeit(lambda: ecdlp.kG(k), 20))
+            _report("SM2 sign", _timeit(lambda: sm2.sign(message, sk, uid, pk), 20))
+            _report("SM2 verify", _timeit(lambda: sm2.verify(message, r, s, uid, pk), 20))
+
+            bnbp = Ec.SM9BNBP(sm9_bnbp.G1, sm9_bnbp.G2)
+            _report("SM9 kG1", _timeit(lambda: bnbp.kG1(k), 10))
+            _report("SM9 kG2", _timeit(lambda: bnbp.kG2(k), 5))
+            _report("SM9 pairing", _timeit(lambda: bnbp.e(bnbp.G1, bnbp.G2), 3))
+    finally:
+        Fp.set_backend(default)
+
+
+def bench_precompute() -> None:
+    """Generator multiplication with and without fixed-base tables."""
+
+    import os
+    import tempfile
+
+    from gmalg.precompute import FixedBaseTable
+
+    sm2_ecdlp = gmalg.sm2._ecdlp
+    sm9_bnbp = gmalg.sm9._bnbp
+
+    k = 0x59276E27_D506861A_16680F3A_D9C02DCC_EF3CC1FA_3CDBE4CE_6D54B80D_EAC1BC21
+    cases = [
+        ("SM2 G", sm2_ecdlp.ec, sm2_ecdlp.G, sm2_ecdlp.fpn.p.bit_length()),
+        ("SM9 P1", sm9_bnbp.ec1, sm9_bnbp.G1, sm9_bnbp.fpn.p.bit_length()),
+        ("SM9 P2", sm9_bnbp.ec2, sm9_bnbp.G2, sm9_bnbp.fpn.p.bit_length()),
+    ]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for name, ec, P, nbits in cases:
+            path = os.path.join(tmpdir, name.replace(" ", "_") + ".gmpt")
+
+            _report(f"{name} plain", _timeit(lambda: ec.mul(k, P), 5))
+            _report(f"{name} build", _timeit(lambda: FixedBaseTable(ec, P, nbits, path=path).mul(k), 1))
+            _report(f"{name} load", _timeit(lambda: FixedBaseTable(ec, P, nbits, path=path).mul(k), 5))
+            table = FixedBaseTable(ec, P, nbits, path=path)
+            _report(f"{name} table", _timeit(lambda: table.mul(k), 20))
+
+
+def bench_import() -> None:
+    """Startup cost of importing gmalg in a fresh interpreter."""
+
+    import subprocess
+
+    def run(code: str) -> float:
+        best = float("inf")
+        for _ in range(10):
+            begin = time.perf_counter()
+            subprocess.run([sys.executable, "-c", code], check=True)
+            best = min(best, time.perf_counter() - begin)
+        return best
+
+    baseline = run("pass")
+    for name, code in [
+        ("import gmalg", "import gmalg"),
+        ("SM3 hash", "import gmalg; gmalg.SM3().update(b'abc')"),
+        ("SM4 encrypt", "import gmalg; gmalg.SM4(bytes(16)).encrypt(bytes(16))"),
+        ("SM2 first use", "import gmalg; gmalg.SM2()"),
+        ("SM9 first use", "import gmalg; gmalg.SM9KGC()"),
+    ]:
+        _report(name, run(code) - baseline)
+
+
+def bench_sm3() -> None:
+    """SM3 compression function and hashing throughput."""
+
+    import os
+
+    import gmalg.sm3 as sm3
+
+    block = os.urandom(64)
+    V = [0x7380166f, 0x4914b2b9, 0x172442d7, 0xda8a0600, 0xa96f30bc, 0x163138aa, 0xe38dee4d, 0xb0fb0e4e]
+    W1 = [0] * 68
+    W2 = [0] * 64
+
+    def reference():
+        sm3._expand(block, W1, W2)
+        sm3._compress(W1, W2, V)
+
+    _report_speed("compress reference", 64, _timeit(reference, 2000))
+    _report_speed("compress", 64, _timeit(lambda: sm3._compress_block(V, block), 2000))
+
+    data = os.urandom(1 << 20)
+
+    for backend in sm3.available_backends():
+        hash_cls = sm3._BACKENDS[backend]
+        _report_speed(f"SM3 1MB {backend}", len(data), _timeit(lambda: hash_cls(data).value(), 1))
+
+
+def bench_sm2_za() -> None:
+    """SM2 entity information digest with and without cache."""
+
+    ecdlp = gmalg.sm2._ecdlp
+    uid = b"1234567812345678"
+    pk = ecdlp.kG(0x59276E27_D506861A_16680F3A_D9C02DCC_EF3CC1FA_3CDBE4CE_6D54B80D_EAC1BC21)
+
+    nocache = gmalg.sm2.SM2Core(ecdlp, gmalg.SM3, za_cache_size=0)
+    cached = gmalg.sm2.SM2Core(ecdlp, gmalg.SM3)
+
+    _report("Z_A uncached", _timeit(lambda: nocache.entity_info(uid, pk), 200))
+    _report("Z_A cached", _timeit(lambda: cached.entity_info(uid, pk), 200))
+
+
+def bench_kdf() -> None:
+    """Key derivation function with long shared input."""
+
+    import os
+
+    core = gmalg.sm2.SM2Core(gmalg.sm2._ecdlp, gmalg.SM3)
+    Z = bytes(384)  # size of a SM9 Fp12 element
+
+    for klen in (32, 1024, 16384):
+        _report_speed(f"KDF |Z|=384 klen={klen}", klen, _timeit(lambda: core._key_derivation_fn(Z, klen), 3))
+
+    # long key stream for multi-megabyte SM2/SM9 plaintexts
+    klen = 1 << 18
+    workers = os.cpu_count() or 1
+    core.kdf_workers = 1
+    _report_speed(f"KDF klen={klen} serial", klen, _timeit(lambda: core._key_derivation_fn(Z, klen), 1))
+    core.kdf_workers = workers
+    core.kdf_parallel_threshold = 0
+    _report_speed(f"KDF klen={klen} {workers} workers", klen, _timeit(lambda: core._key_derivation_fn(Z, klen), 1))
+    native = gmalg.sm2.SM2Core(gmalg.sm2._ecdlp, gmalg.sm3.get_hash_cls())
+    _report_speed(f"KDF klen={klen} {gmalg.sm3.get_backend()}", klen, _timeit(lambda: native._key_derivation_fn(Z, klen), 1))
+
+
+def bench_sm3_buffer() -> None:
+    """SM3 update on large buffers, size in MB from $GMALG_BENCH_MB (default 100)."""
+
+    import mmap
+    import os
+    import tracemalloc
+
+    import gmalg.sm3 as sm3
+
+    size = int(float(os.environ.get("GMALG_BENCH_MB", "100")) * (1 << 20)) & ~63
+    data = os.urandom(size)
+
+    def reference(data):
+        # per block slicing as before
+        V = [0x7380166f, 0x4914b2b9, 0x172442d7, 0xda8a0600, 0xa96f30bc, 0x163138aa, 0xe38dee4d, 0xb0fb0e4e]
+        W1 = [0] * 68
+        W2 = [0] * 64
+        for pos in range(0, len(data), 64):
+            sm3._expand(data[pos:pos + 64], W1, W2)
+            sm3._compress(W1, W2, V)
+
+    def run(name, fn, nbytes):
+        _report_speed(name, nbytes, _timeit(lambda: fn(nbytes), 1))
+
+        # tracing slows down everything a lot, only trace a small sample
+        tracemalloc.start()
+        fn(1 << 16)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"  {'':<24}{peak / 1024:>10.1f} KB peak traced memory on 64 KB")
+
+    with mmap.mmap(-1, size) as m:
+        m.write(data)
+
+        run("sliced blocks", lambda n: reference(data[:n]), min(size, 1 << 20))
+        run("update bytes", lambda n: gmalg.SM3(memoryview(data)[:n]), size)
+        run("update mmap", lambda n: gmalg.SM3(memoryview(m)[:n]), size)
+
+
+def bench_hmac() -> None:
+    """HMAC-SM3 of short messages with a reused key."""
+
+    import hmac
+
+    import gmalg.sm3 as sm3
+    from gmalg.hmac_sm3 import hmac_sm3_many
+
+    key = bytes(range(32))
+    message = bytes(200)
+    messages = [message] * 100
+
+    for backend in sm3.available_backends():
+        hash_cls = sm3._BACKENDS[backend]
+        keyed = gmalg.HMAC_SM3(key, backend=backend)
+
+        def copied():
+            m = keyed.copy()
+            m.update(message)
+            m.digest()
+
+        _report(f"hmac.new {backend}", _timeit(lambda: hmac.new(key, message, hash_cls).digest(), 100))
+        _report(f"HMAC_SM3 copy {backend}", _timeit(copied, 100))
+        _report(f"hmac_sm3_many {backend}", _timeit(lambda: hmac_sm3_many(key, messages, backend=backend), 1) / len(messages))
+
+
+def bench_pbkdf2() -> None:
+    """PBKDF2-HMAC-SM3 with 100k iterations, pure Python is measured on 1k and scaled."""
+
+    import gmalg.sm3 as sm3
+
+    iterations = 100000
+    for backend in sm3.available_backends():
+        n = iterations if backend != "python" else iterations // 100
+        seconds = _timeit(lambda: gmalg.pbkdf2_sm3(b"password", b"salt", n, backend=backend), 1)
+        _report(f"100k iterations {backend}", seconds * iterations / n)
+
+
+def bench_merkle() -> None:
+    """SM3 Merkle tree build with process pool and incremental chunk update."""
+
+    import os
+    import tempfile
+
+    import gmalg.sm3 as sm3
+    from gmalg.merkle import SM3MerkleTree
+
+    size = (64 if sm3.get_backend() != "python" else 1) << 20
+    chunk_size = 1 << 16 if sm3.get_backend() != "python" else 1 << 12
+    workers = os.cpu_count() or 1
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "data")
+        with open(path, "wb") as f:
+            f.write(os.urandom(size))
+
+        _report_speed("SM3 stream", size, _timeit(lambda: sm3.file_digest(path), 1))
+        _report_speed("tree 1 worker", size, _timeit(lambda: SM3MerkleTree.from_file(path, chunk_size), 1))
+        _report_speed(f"tree {workers} workers", size, _timeit(lambda: SM3MerkleTree.from_file(path, chunk_size, workers=workers), 1))
+
+        tree = SM3MerkleTree.from_file(path, chunk_size)
+        chunk = os.urandom(chunk_size)
+        _report("update one chunk", _timeit(lambda: tree.update_chunk(len(tree) // 2, chunk), 10))
+
+
+def bench_hash_many() -> None:
+    """Batch SM3 of many short messages, per message cost."""
+
+    import os
+
+    import gmalg.sm3 as sm3
+
+    messages = [os.urandom(64) for _ in range(20000)]
+    workers = os.cpu_count() or 1
+
+    for backend in sm3.available_backends():
+        n = len(messages) if backend != "python" else len(messages) // 10
+        batch = messages[:n]
+        hash_cls = sm3._BACKENDS[backend]
+
+        _report(f"new object {backend}", _timeit(lambda: [hash_cls(m).value() for m in batch], 1) / n)
+        _report(f"hash_many {backend}", _timeit(lambda: list(sm3.hash_many(batch, backend=backend)), 1) / n)
+        _report(f"hash_many {workers} workers {backend}",
+                _timeit(lambda: list(sm3.hash_many(batch, workers=workers, backend=backend)), 1) / n)
+
+
+def bench_sm3_lanes() -> None:
+    """SM3 of many equal-length records, NumPy lanes against one by one."""
+
+    import os
+
+    import gmalg.sm3 as sm3
+
+    for length in [32, 64, 1024]:
+        messages = [os.urandom(length) for _ in range(4096)]
+        _report(f"{length} bytes SM3", _timeit(lambda: [sm3.SM3(m).value() for m in messages[:256]], 1) / 256)
+        if gmalg.utils.import_numpy() is not None:
+            _report(f"{length} bytes lanes", _timeit(lambda: sm3.hash_equal_length(messages), 1) / len(messages))
+
+
+def bench_sm4() -> None:
+    """SM4 T-table rounds against S-box and L per round, single block and bulk modes."""
+
+    import gmalg.sm4 as sm4
+
+    def reference(block: bytes, RK) -> bytes:
+        X0 = int.from_bytes(block[0:4], "big")
+        X1 = int.from_bytes(block[4:8], "big")
+        X2 = int.from_bytes(block[8:12], "big")
+        X3 = int.from_bytes(block[12:16], "big")
+        for i in range(0, 32, 4):
+            X0 = X0 ^ sm4._T0(X1 ^ X2 ^ X3 ^ RK[i])
+            X1 = X1 ^ sm4._T0(X2 ^ X3 ^ X0 ^ RK[i + 1])
+            X2 = X2 ^ sm4._T0(X3 ^ X0 ^ X1 ^ RK[i + 2])
+            X3 = X3 ^ sm4._T0(X0 ^ X1 ^ X2 ^ RK[i + 3])
+        return X3.to_bytes(4, "big") + X2.to_bytes(4, "big") + X1.to_bytes(4, "big") + X0.to_bytes(4, "big")
+
+    key = bytes(range(16))
+    block = bytes(16)
+    c = gmalg.SM4(key)
+    assert reference(block, c._rkey) == c.encrypt(block)
+
+    _report_blocks("reference encrypt", 1, _timeit(lambda: reference(block, c._rkey), 10000))
+    _report_blocks("SM4.encrypt", 1, _timeit(lambda: c.encrypt(block), 10000))
+    _report_blocks("SM4.decrypt", 1, _timeit(lambda: c.decrypt(block), 10000))
+    _report("key expansion", _timeit(lambda: gmalg.SM4(key), 1000))
+
+    from gmalg.sm4_cipher import SM4_CBC, SM4_CTR
+
+    data = bytes(1 << 16)
+    n = len(data) // 16
+    _report_blocks("encrypt loop 64KB", n, _timeit(lambda: [c.encrypt(data[i:i + 16]) for i in range(0, len(data), 16)], 1))
+    c.encrypt_blocks(data)  # build bitsliced S-box maps
+    _report_blocks("table 64KB", n, _timeit(lambda: sm4._crypt_blocks(memoryview(data), bytearray(len(data)), c._rkey), 1))
+    _report_blocks("encrypt_blocks 64KB", n, _timeit(lambda: c.encrypt_blocks(data), 1))
+    _report_blocks("encrypt_blocks 1MB", n * 16, _timeit(lambda: c.encrypt_blocks(data * 16), 1))
+    _report_blocks("bitsliced 1MB", n * 16, _timeit(lambda: sm4._bitslice_crypt(memoryview(data * 16), bytearray(len(data) * 16), c._rkey), 1))
+    np = gmalg.utils.import_numpy()
+    if np is not None:
+        _report_blocks("numpy 1MB", n * 16, _timeit(lambda: sm4._numpy_crypt(np, memoryview(data * 16), bytearray(len(data) * 16), c._rkey), 1))
+        _report_blocks("CTR 1MB", n * 16, _timeit(lambda: SM4_CTR(key).encrypt(data * 16), 1))
+    _report_blocks("CTR 64KB", n, _timeit(lambda: SM4_CTR(key).encrypt(data), 1))
+
+    def ctr_stream():
+        context = SM4_CTR(key).encryptor()
+        for i in range(0, len(data), 4096):
+            context.update(data[i:i + 4096])
+        context.finalize()
+
+    _report_blocks("CTR 64KB in 4KB chunks", n, _timeit(ctr_stream, 1))
+    cbc = SM4_CBC(key).encrypt(data)
+    from gmalg.sm4_cipher import SM4_GCM
+
+    gcm = SM4_GCM(key)  # a fresh IV for every message
+    _report("GCM init (H table)", _timeit(lambda: SM4_GCM(key, bytes(12)), 100))
+    _report_blocks("GCM 64KB", n, _timeit(lambda: gcm.encrypt(data), 1))
+    _report("GCM 64 bytes", _timeit(lambda: gcm.encrypt(data[:64]), 100))
+    _report_blocks("CBC encrypt 64KB", n, _timeit(lambda: SM4_CBC(key, bytes(16)).encrypt(data), 1))
+    _report_blocks("CBC decrypt 64KB", n, _timeit(lambda: SM4_CBC(key, bytes(16)).decrypt(cbc), 1))
+
+
+BENCHMARKS: Dict[str, Callable[[], None]] = {
+    "primefield": bench_primefield,
+    "precompute": bench_precompute,
+    "import": bench_import,
+    "sm3": bench_sm3,
+    "sm2_za": bench_sm2_za,
+    "kdf": bench_kdf,
+    "sm3_buffer": bench_sm3_buffer,
+    "hmac": bench_hmac,
+    "pbkdf2": bench_pbkdf2,
+    "merkle": bench_merkle,
+    "hash_many": bench_hash_many,
+    "sm3_lanes": bench_sm3_lanes,
+    "sm4": bench_sm4,
+}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print(f"[{name}] {BENCHMARKS[name].__doc__}")
+        BENCHMARKS[name]()
+        print()
@@ -1,15 +1,14 @@
+import importlib
+
 from . import errors
 from .base import KEYXCHG_MODE, PC_MODE
-from .sm2 import SM2
-from .sm3 import SM3
-from .sm4 import SM4
-from .sm9 import SM9, SM9KGC
-from .zuc import ZUC
 
 __all__ = [
     "errors",
+    "HMAC_SM3",
     "KEYXCHG_MODE",
     "PC_MODE",
+    "pbkdf2_sm3",
     "SM2",
     "SM3",
     "SM4",
@@ -19,3 +18,47 @@ __all__ = [
 ]
 
 __version__ = "1.0.6"
+
+# algorithm modules are imported on first access to keep `import gmalg` cheap
+_LAZY_ATTRS = {
+    "HMAC_SM3": "hmac_sm3",
+    "pbkdf2_sm3": "hmac_sm3",
+    "SM2": "sm2",
+    "SM3": "sm3",
+    "SM4": "sm4",
+    "SM9": "sm9",
+    "SM9KGC": "sm9",
+    "ZUC": "zuc",
+}
+
+_LAZY_MODULES = {
+    "ellipticcurve",
+    "hmac_sm3",
+    "merkle",
+    "opcount",
+    "precompute",
+    "primefield",
+    "sm2",
+    "sm3",
+    "sm4",
+    "sm4_cipher",
+    "sm9",
+    "utils",
+    "zuc",
+}
+
+
+def __getattr__(name: str):
+    if name in _LAZY_ATTRS:
+        value = getattr(importlib.import_module(f".{_LAZY_ATTRS[name]}", __name__), name)
+    elif name in _LAZY_MODULES:
+        value = importlib.import_module(f".{name}", __name__)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRS) | _LAZY_MODULES)
@@ -1,7 +1,7 @@
 """This module provides some base classes and common items."""
 
+import copy
 import enum
-import secrets
 from typing import Callable, Type
 
 from .errors import *
@@ -76,6 +76,17 @@ class Hash:
 
         raise NotImplementedError
 
+    def copy(self) -> "Hash":
+        """Returns a copy of current state.
+
+        The default implementation deep copies the object, subclasses can override it with a cheaper one.
+
+        Returns:
+            Hash: An independent hash object.
+        """
+
+        return copy.deepcopy(self)
+
 
 class BlockCipher:
     """Base class of block cipher algorithm."""
@@ -113,7 +124,15 @@ class BlockCipher:
 
 
 class SMCoreBase:
-    """SM core algorithm base class."""
+    """SM core algorithm base class.
+
+    Attributes:
+        kdf_parallel_threshold (int): Key stream byte length from which KDF may run in a process pool.
+        kdf_workers (int): Number of KDF processes, the pool is only used if larger than `1`.
+    """
+
+    kdf_parallel_threshold: int = 1 << 20
+    kdf_workers: int = 1
 
     def __init__(self, hash_cls: Type[Hash], rnd_fn: Callable[[int], int] = None) -> None:
         """SM core algorithm base class.
@@ -127,6 +146,8 @@ class SMCoreBase:
         self._rnd_fn = rnd_fn or self._default_rnd_fn
 
     def _default_rnd_fn(self, k: int) -> int:
+        import secrets
+
         return secrets.randbits(k)
 
     def _hash_fn(self, data: bytes) -> bytes:
@@ -145,6 +166,11 @@ class SMCoreBase:
     def _key_derivation_fn(self, Z: bytes, klen: int) -> bytes:
         """Key derivation function.
 
+        Counter blocks are independent, when `kdf_workers > 1` and `klen` reaches `kdf_parallel_threshold`
+            disjoint counter ranges are computed by a process pool, which receives the secret `Z`.
+            The native SM3 backend is fast enough to always run serially,
+            and hash classes that can not be pickled or a pool that can not start fall back to serial.
+
         Args:
             Z: Secret bytes.
             klen: Key byte length to derivate.
@@ -153,18 +179,65 @@ class SMCoreBase:
             DataOverflowError: `klen` is too large.
         """
 
-        hash_fn = self._hash_fn
         v = self._hash_cls.hash_length()
 
-        count, tail = divmod(klen, v)
-        if count + (tail > 0) > 0xffffffff:
+        count = (klen + v - 1) // v
+        if count > 0xffffffff:
             raise DataOverflowError("Key stream", f"{0xffffffff * v} bytes")
 
-        K = bytearray()
-        for ct in range(1, count + 1):
-            K.extend(hash_fn(Z + ct.to_bytes(4, "big")))
+        workers = self.kdf_workers or 1
+        if workers <= 1 or klen < self.kdf_parallel_threshold or count < 2 or not _kdf_poolable(self._hash_cls):
+            return _kdf_range(self._hash_cls, Z, 1, count + 1)[:klen]
+
+        import concurrent.futures
+        import concurrent.futures.process
+
+        batches = min(count, workers * 4)
+        bounds = [1 + count * i // batches for i in range(batches + 1)]
+
+        K = bytearray(count * v)
+        try:
+            with concurrent.futures.ProcessPoolExecutor(min(workers, batches)) as executor:
+                futures = [executor.submit(_kdf_range, self._hash_cls, Z, begin, end) for begin, end in zip(bounds[:-1], bounds[1:])]
+                for begin, future in zip(bounds, futures):
+                    offset = (begin - 1) * v
+                    block = future.result()
+                    K[offset:offset + len(block)] = block
+        except (OSError, concurrent.futures.process.BrokenProcessPool):
+            # no processes on this platform, or workers failed to start (e.g. spawn without `__main__` guard)
+            return _kdf_range(self._hash_cls, Z, 1, count + 1)[:klen]
+
+        del K[klen:]
+        return bytes(K)
 
-        if tail > 0:
-            K.extend(hash_fn(Z + (count + 1).to_bytes(4, "big"))[:tail])
 
-        return bytes(K)
+def _kdf_poolable(hash_cls: Type[Hash]) -> bool:
+    """Whether a process pool can speed up KDF of `hash_cls`."""
+
+    from . import sm3
+
+    if hash_cls is sm3._NativeSM3:
+        return False
+
+    import pickle
+
+    try:
+        pickle.dumps(hash_cls)
+    except (pickle.PicklingError, AttributeError, TypeError):
+        return False
+    return True
+
+
+def _kdf_range(hash_cls: Type[Hash], Z: bytes, begin: int, end: int) -> bytes:
+    """Compute KDF blocks of counters `[begin, end)`, also runs in worker processes."""
+
+    # absorb Z once, then fork the state for each counter
+    state = hash_cls()
+    state.update(Z)
+
+    K = bytearray()
+    for ct in range(begin, end):
+        h = state.copy()
+        h.update(ct.to_bytes(4, "big"))
+        K.extend(h.value())
+    return bytes(K)
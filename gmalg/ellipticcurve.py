@@ -8,6 +8,7 @@ from typing import Tuple, Union
 
 from . import primefield as Fp
 from .errors import *
+from .precompute import FixedBaseTable
 
 __all__ = [
     "EcPoint",
@@ -70,7 +71,7 @@ class EllipticCurve:
         """Whether the point is on curve."""
 
         x, y = P
-        return self._fp.mul(y, y) == self.get_y_sqr(x)
+        return self._fp.sqr(y) == self.get_y_sqr(x)
 
     def neg(self, P: EcPointEx) -> EcPointEx:
         """Get negative point."""
@@ -95,15 +96,34 @@ class EllipticCurve:
             if fp.isoppo(y1, y2):
                 return self.INF
             elif y1 == y2:
-                _t1 = fp.add(self.a, fp.smul(3, fp.mul(x1, x1)))
-                _t2 = fp.inv(fp.smul(2, y1))
-                lam = fp.mul(_t1, _t2)
+                return self.double(P1)
             else:
                 raise UnknownError(f"y1 and y2 is neither equal nor opposite.")
-        else:
-            lam = fp.mul(fp.sub(y2, y1), fp.inv(fp.sub(x2, x1)))
 
-        x3 = fp.sub(fp.mul(lam, lam), fp.add(x1, x2))
+        lam = fp.mul(fp.sub(y2, y1), fp.inv(fp.sub(x2, x1)))
+
+        x3 = fp.sub(fp.sqr(lam), fp.add(x1, x2))
+        y3 = fp.sub(fp.mul(lam, fp.sub(x1, x3)), y1)
+        return x3, y3
+
+    def double(self, P: EcPointEx) -> EcPointEx:
+        """Double a point."""
+
+        fp = self._fp
+
+        if P == self.INF:
+            return P
+
+        x1, y1 = P
+
+        if fp.isoppo(y1, y1):
+            return self.INF
+
+        _t1 = fp.add(self.a, fp.smul(3, fp.sqr(x1)))
+        _t2 = fp.inv(fp.smul(2, y1))
+        lam = fp.mul(_t1, _t2)
+
+        x3 = fp.sub(fp.sqr(lam), fp.add(x1, x1))
         y3 = fp.sub(fp.mul(lam, fp.sub(x1, x3)), y1)
         return x3, y3
 
@@ -117,7 +137,7 @@ class EllipticCurve:
 
         Q = P
         for i in f"{k:b}"[1:]:
-            Q = self.add(Q, Q)
+            Q = self.double(Q)
             if i == "1":
                 Q = self.add(Q, P)
         return Q
@@ -152,9 +172,25 @@ class ECDLP:
         self.fpn = Fp.PrimeField(n)
         self.h = h
 
+        self._G_table: FixedBaseTable = None
+
+    def precompute(self, path: str = None, window: int = 4) -> None:
+        """Use a fixed-base precomputation table for `kG`.
+
+        The table is loaded or built on the first call of `kG`.
+
+        Args:
+            path: Table file to be loaded, or to be written if missing or stale. `None` means in memory only.
+            window: Window bit width of table.
+        """
+
+        self._G_table = FixedBaseTable(self.ec, self.G, self.fpn.p_bitlength, window, path)
+
     def kG(self, k: int) -> EcPoint:
         """Scalar multiplication of G by k."""
 
+        if self._G_table is not None:
+            return self._G_table.mul(k)
         return self.ec.mul(k, self.G)
 
 
@@ -241,14 +277,35 @@ class SM9BNBP:
         self._frob3_factor = (((p - w3, w3), (w0, p - w0)), ((p - w0, w0), (p - w3, w3)), ((w3, p - w3), (p - w0, w0)))
         self._frob6_factor = (((p - w0, p - w0), (w0, w0)), ((w0, w0), (p - w0, p - w0)), ((p - w0, p - w0), (w0, w0)))
 
+        self._G1_table: FixedBaseTable = None
+        self._G2_table: FixedBaseTable = None
+
+    def precompute(self, path1: str = None, path2: str = None, window: int = 4) -> None:
+        """Use fixed-base precomputation tables for `kG1` and `kG2`.
+
+        The tables are loaded or built on the first call of `kG1` and `kG2`.
+
+        Args:
+            path1: Table file of G1, to be loaded, or to be written if missing or stale. `None` means in memory only.
+            path2: Table file of G2, same as `path1`.
+            window: Window bit width of tables.
+        """
+
+        self._G1_table = FixedBaseTable(self.ec1, self.G1, self.fpn.p_bitlength, window, path1)
+        self._G2_table = FixedBaseTable(self.ec2, self.G2, self.fpn.p_bitlength, window, path2)
+
     def kG1(self, k: int) -> EcPoint:
         """Scalar multiplication of G1 by k."""
 
+        if self._G1_table is not None:
+            return self._G1_table.mul(k)
         return self.ec1.mul(k, self.G1)
 
     def kG2(self, k: int) -> EcPoint2:
         """Scalar multiplication of G2 by k."""
 
+        if self._G2_table is not None:
+            return self._G2_table.mul(k)
         return self.ec2.mul(k, self.G2)
 
     def _g_fn(self, U: EcPoint12, V: EcPoint12, Q: EcPoint12) -> Fp.Fp12Ele:
@@ -271,7 +328,7 @@ class SM9BNBP:
                 return fp12.sub(xQ, xV), fp12.one()
             elif yU == yV:
                 lam = fp12.mul(
-                    fp12.smul(3, fp12.mul(xV, xV)),
+                    fp12.smul(3, fp12.sqr(xV)),
                     fp12.inv(fp12.smul(2, yV))
                 )
             else:
@@ -357,7 +414,7 @@ class SM9BNBP:
         y4 = P(M(f_t2_p, f_t), 18)
         y3 = P(f_t_p, 12)
         y2 = P(f_t2_p2, 6)
-        y1 = M(f, f)
+        y1 = fp12.sqr(f)
         y0 = M(f_p, M(f_p2, f_p3))
 
         f_num = M(y2, y0)
@@ -366,16 +423,8 @@ class SM9BNBP:
         f = M(f_num, I(f_den))
         return f
 
-    def e(self, P: EcPoint, Q: EcPoint2) -> Fp.Fp12Ele:
-        """R-ate bilinear pairing.
-
-        Args:
-            P: Element of group 1.
-            Q: Element of group 2.
-
-        Returns:
-            Fp12Ele: Pairing value on Fp12.
-        """
+    def _miller_loop(self, P: EcPoint, Q: EcPoint2) -> Fp.Fp12Ele:
+        """Miller loop of R-ate pairing, without final exponentiation."""
 
         fp12 = self.fp12
         ec2 = self.ec2
@@ -390,8 +439,8 @@ class SM9BNBP:
         for i in self._e_a:
             _T = phi(T)  # T on E(Fp12)
             g = g_fn(_T, _T, _P)
-            f = fp12.mul(fp12.mul(f, f), g)
-            T = ec2.add(T, T)
+            f = fp12.mul(fp12.sqr(f), g)
+            T = ec2.double(T)
 
             if i == "1":
                 g = g_fn(phi(T), _Q, _P)
@@ -409,9 +458,21 @@ class SM9BNBP:
         g = g_fn(phi(T), _Q2, _P)
         f = fp12.mul(f, g)
 
-        f = self._finalexp(f)
         return f
 
+    def e(self, P: EcPoint, Q: EcPoint2) -> Fp.Fp12Ele:
+        """R-ate bilinear pairing.
+
+        Args:
+            P: Element of group 1.
+            Q: Element of group 2.
+
+        Returns:
+            Fp12Ele: Pairing value on Fp12.
+        """
+
+        return self._finalexp(self._miller_loop(P, Q))
+
     def eG1(self, Q: EcPoint2) -> Fp.Fp12Ele:
         """R-ate of G1 and Q."""
 
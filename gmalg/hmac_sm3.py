@@ -0,0 +1,219 @@
+"""HMAC-SM3 Implementation Module.
+
+The inner and outer hash states of a key are computed once when the object is created,
+    reuse a keyed object by `copy` to skip the key schedule for every message.
+
+```python
+mac = HMAC_SM3(key)
+
+m = mac.copy()
+m.update(message)
+tag = m.digest()
+```
+"""
+
+import hashlib
+import struct
+from typing import Iterable, List
+
+from . import sm3
+from .base import Hash
+from .errors import *
+
+__all__ = [
+    "HMAC_SM3",
+    "hmac_sm3_many",
+    "pbkdf2_sm3",
+]
+
+_IPAD = bytes(x ^ 0x36 for x in range(256))
+_OPAD = bytes(x ^ 0x5c for x in range(256))
+
+
+class HMAC_SM3:
+    """HMAC with SM3 (RFC 2104), output is the same as `hmac.new(key, msg, "sm3")`."""
+
+    name = "hmac-sm3"
+    digest_size = 32
+    block_size = 64
+
+    def __init__(self, key: bytes, msg: bytes = b"", *, backend: str = None) -> None:
+        """HMAC with SM3.
+
+        Args:
+            key: Secret key of any length.
+            msg: Initial message to be updated.
+            backend: SM3 backend name, default to the one returned by `gmalg.sm3.get_backend`.
+
+        Raises:
+            InvalidArgumentError: Backend not available.
+        """
+
+        hash_cls = sm3._get_hash_cls(backend)
+
+        if len(key) > self.block_size:
+            key = hash_cls(key).value()
+        key = bytes(key).ljust(self.block_size, b"\x00")
+
+        self._inner: Hash = hash_cls(key.translate(_IPAD))
+        self._outer: Hash = hash_cls(key.translate(_OPAD))
+
+        if msg:
+            self.update(msg)
+
+    def update(self, msg: bytes) -> None:
+        """Update message.
+
+        Args:
+            msg: Message stream to be updated.
+        """
+
+        self._inner.update(msg)
+
+    def copy(self) -> "HMAC_SM3":
+        """Get an independent copy of current state."""
+
+        other = self.__class__.__new__(self.__class__)
+        other._inner = self._inner.copy()
+        other._outer = self._outer  # never updated, safe to share
+        return other
+
+    def value(self) -> bytes:
+        """Get current MAC value.
+
+        Returns:
+            bytes: MAC value.
+        """
+
+        outer = self._outer.copy()
+        outer.update(self._inner.value())
+        return outer.value()
+
+    def digest(self) -> bytes:
+        """Same as `value`, for compatibility with `hmac`."""
+
+        return self.value()
+
+    def hexdigest(self) -> str:
+        """Get current MAC value in hex string."""
+
+        return self.value().hex()
+
+
+def hmac_sm3_many(key: bytes, messages: Iterable[bytes], *, backend: str = None) -> List[bytes]:
+    """Compute HMAC-SM3 of many messages with the same key.
+
+    Args:
+        key: Secret key of any length.
+        messages: Messages to be authenticated.
+        backend: SM3 backend name, default to the one returned by `gmalg.sm3.get_backend`.
+
+    Returns:
+        List[bytes]: MAC values in the order of messages.
+
+    Raises:
+        InvalidArgumentError: Backend not available.
+    """
+
+    keyed = HMAC_SM3(key, backend=backend)
+    inner = keyed._inner
+    outer = keyed._outer
+
+    macs = []
+    for msg in messages:
+        h = inner.copy()
+        h.update(msg)
+        o = outer.copy()
+        o.update(h.value())
+        macs.append(o.value())
+    return macs
+
+
+def _pbkdf2_block(password: bytes, salt: bytes, iterations: int, index: int) -> bytes:
+    """Compute block `T_index` of PBKDF2-HMAC-SM3 with the pure Python SM3.
+
+    After the first HMAC, every message is a 32 bytes digest, so each iteration is exactly
+        one compression on the inner midstate and one on the outer midstate, done directly on words.
+    """
+
+    keyed = HMAC_SM3(password, backend="python")
+
+    mac = keyed.copy()
+    mac.update(salt + index.to_bytes(4, "big"))
+    u = list(struct.unpack(">8I", mac.value()))
+
+    # both midstates absorbed exactly one block, the padding of a 32 bytes message is fixed
+    Vi: List[int] = keyed._inner._value
+    Vo: List[int] = keyed._outer._value
+    pad = [0x80000000, 0, 0, 0, 0, 0, 0, (64 + 32) << 3]
+    compress = sm3._compress_words
+
+    t0, t1, t2, t3, t4, t5, t6, t7 = u
+    for _ in range(iterations - 1):
+        w = Vi.copy()
+        compress(w, u + pad)
+        u = Vo.copy()
+        compress(u, w + pad)
+
+        u0, u1, u2, u3, u4, u5, u6, u7 = u
+        t0 ^= u0
+        t1 ^= u1
+        t2 ^= u2
+        t3 ^= u3
+        t4 ^= u4
+        t5 ^= u5
+        t6 ^= u6
+        t7 ^= u7
+
+    return struct.pack(">8I", t0, t1, t2, t3, t4, t5, t6, t7)
+
+
+def pbkdf2_sm3(password: bytes, salt: bytes, iterations: int, dklen: int = None, *,
+               workers: int = 1, backend: str = None) -> bytes:
+    """PBKDF2 (RFC 8018) with HMAC-SM3, same as `hashlib.pbkdf2_hmac("sm3", ...)`.
+
+    Args:
+        password: Password.
+        salt: Salt.
+        iterations: Iteration count.
+        dklen: Derived key byte length, default to 32.
+        workers: Number of processes to compute output blocks in parallel, only used by the `"python"` backend
+            when `dklen` spans several blocks.
+        backend: SM3 backend name, default to the one returned by `gmalg.sm3.get_backend`.
+
+    Returns:
+        bytes: Derived key.
+
+    Raises:
+        InvalidArgumentError: Invalid iterations, dklen or backend.
+        DataOverflowError: `dklen` is too large.
+    """
+
+    if iterations < 1:
+        raise InvalidArgumentError("Iterations must be positive.")
+
+    if dklen is None:
+        dklen = HMAC_SM3.digest_size
+    if dklen < 1:
+        raise InvalidArgumentError("dklen must be positive.")
+
+    count = (dklen + HMAC_SM3.digest_size - 1) // HMAC_SM3.digest_size
+    if count > 0xffffffff:
+        raise DataOverflowError("Derived key", f"{0xffffffff * HMAC_SM3.digest_size} bytes")
+
+    if sm3._get_hash_cls(backend) is not sm3.SM3:
+        return hashlib.pbkdf2_hmac("sm3", bytes(password), bytes(salt), iterations, dklen)
+
+    password = bytes(password)
+    salt = bytes(salt)
+    indexes = range(1, count + 1)
+
+    if workers > 1 and count > 1:
+        import concurrent.futures
+
+        with concurrent.futures.ProcessPoolExecutor(min(workers, count)) as executor:
+            blocks = list(executor.map(_pbkdf2_block, [password] * count, [salt] * count, [iterations] * count, indexes))
+    else:
+        blocks = [_pbkdf2_block(password, salt, iterations, i) for i in indexes]
+
+    return b"".join(blocks)[:dklen]
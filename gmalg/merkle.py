@@ -0,0 +1,394 @@
+"""SM3 Merkle Tree Module.
+
+Data is split into chunks of a fixed size, the tree is built over the chunk hashes:
+
+- Leaf: `SM3(0x00 || chunk)`
+- Node: `SM3(0x01 || left || right)`
+
+The domain separation bytes make a leaf hash never equal to a node hash.
+    A node without right sibling is promoted to the next level unchanged.
+    Empty data has one empty chunk.
+
+Leaves can be computed by a process pool, and changing a chunk only recomputes its path to the root.
+    The tree can be exported by `to_dict` and loaded later to re-verify any subset of chunks.
+"""
+
+import os
+from typing import Dict, Iterable, List, Sequence, Tuple, Union
+
+from . import sm3
+from .errors import *
+
+__all__ = [
+    "SM3MerkleTree",
+]
+
+_LEAF_PREFIX = b"\x00"
+_NODE_PREFIX = b"\x01"
+
+_FORMAT_VERSION = 1
+
+_BATCH_BYTES = 16 << 20  # bytes of data copied for one worker batch in `from_bytes`
+
+
+def _leaf_hash(hash_cls, chunk: bytes) -> bytes:
+    h = hash_cls(_LEAF_PREFIX)
+    h.update(chunk)
+    return h.value()
+
+
+def _node_hash(hash_cls, left: bytes, right: bytes) -> bytes:
+    return hash_cls(_NODE_PREFIX + left + right).value()
+
+
+def _hash_file_chunks(path: str, begin: int, end: int, chunk_size: int, backend: str) -> List[bytes]:
+    """Hash chunks `[begin, end)` of a file, runs in worker processes."""
+
+    hash_cls = sm3._get_hash_cls(backend)
+
+    leaves = []
+    buffer = bytearray(chunk_size)
+    with open(path, "rb") as f, memoryview(buffer) as view:
+        f.seek(begin * chunk_size)
+        for _ in range(begin, end):
+            size = f.readinto(buffer)
+            leaves.append(_leaf_hash(hash_cls, view[:size]))
+    return leaves
+
+
+def _hash_chunks(chunks: Sequence[bytes], backend: str) -> List[bytes]:
+    """Hash a batch of chunks, runs in worker processes."""
+
+    hash_cls = sm3._get_hash_cls(backend)
+    return [_leaf_hash(hash_cls, chunk) for chunk in chunks]
+
+
+def _split(count: int, workers: int) -> List[Tuple[int, int]]:
+    """Split `count` chunks into contiguous batches, a few per worker for load balancing."""
+
+    batches = min(count, workers * 4)
+    bounds = [count * i // batches for i in range(batches + 1)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+class SM3MerkleTree:
+    """SM3 Merkle tree over fixed size chunks.
+
+    Attributes:
+        chunk_size (int): Chunk byte size.
+        size (int): Total data byte size.
+    """
+
+    def __init__(self, leaves: List[bytes], size: int, chunk_size: int, *, backend: str = None) -> None:
+        """SM3 Merkle tree from leaf hashes, use `from_bytes`, `from_file` or `from_dict` instead.
+
+        Args:
+            leaves: Leaf hashes of all chunks.
+            size: Total data byte size.
+            chunk_size: Chunk byte size.
+            backend: SM3 backend name, default to the one returned by `gmalg.sm3.get_backend`.
+
+        Raises:
+            InvalidArgumentError: Invalid chunk size or backend.
+            IncorrectLengthError: Number of leaves not match data size.
+        """
+
+        if chunk_size < 1:
+            raise InvalidArgumentError("Chunk size must be positive.")
+
+        count = max(1, (size + chunk_size - 1) // chunk_size)
+        if len(leaves) != count:
+            raise IncorrectLengthError("Leaves", f"{count}", f"{len(leaves)}")
+
+        self.chunk_size = chunk_size
+        self.size = size
+        self._backend = backend
+        self._hash_cls = sm3._get_hash_cls(backend)
+
+        self._levels: List[List[bytes]] = [list(leaves)]
+        self._build()
+
+    @classmethod
+    def from_bytes(cls, data: bytes, chunk_size: int = 1 << 20, *, workers: int = 1, backend: str = None) -> "SM3MerkleTree":
+        """Build tree of data in memory.
+
+        Args:
+            data: Data to be hashed.
+            chunk_size: Chunk byte size.
+            workers: Number of processes to hash chunks.
+            backend: SM3 backend name, default to the one returned by `gmalg.sm3.get_backend`.
+
+        Returns:
+            SM3MerkleTree: Merkle tree.
+        """
+
+        if chunk_size < 1:
+            raise InvalidArgumentError("Chunk size must be positive.")
+
+        with memoryview(data) as view, view.cast("B") as flat:
+            size = len(flat)
+            count = max(1, (size + chunk_size - 1) // chunk_size)
+
+            if workers > 1 and count > 1:
+                import collections
+                import concurrent.futures
+
+                backend = backend or sm3.get_backend()  # workers do not share backend switches
+
+                # chunks are copied only when their batch is submitted, at most `2 * workers` batches are in flight
+                leaves = []
+                with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+                    pending = collections.deque()
+                    for begin, end in _split(count, max(workers * 4, size // _BATCH_BYTES)):
+                        chunks = [bytes(flat[i * chunk_size:(i + 1) * chunk_size]) for i in range(begin, end)]
+                        pending.append(executor.submit(_hash_chunks, chunks, backend))
+                        if len(pending) >= 2 * workers:
+                            leaves.extend(pending.popleft().result())
+                    while pending:
+                        leaves.extend(pending.popleft().result())
+            else:
+                hash_cls = sm3._get_hash_cls(backend)
+                leaves = [_leaf_hash(hash_cls, flat[i * chunk_size:(i + 1) * chunk_size]) for i in range(count)]
+
+        return cls(leaves, size, chunk_size, backend=backend)
+
+    @classmethod
+    def from_file(cls, path: Union[str, os.PathLike], chunk_size: int = 1 << 20, *,
+                  workers: int = 1, backend: str = None) -> "SM3MerkleTree":
+        """Build tree of a file, each worker process reads its own range of chunks.
+
+        Args:
+            path: File path.
+            chunk_size: Chunk byte size.
+            workers: Number of processes to hash chunks.
+            backend: SM3 backend name, default to the one returned by `gmalg.sm3.get_backend`.
+
+        Returns:
+            SM3MerkleTree: Merkle tree.
+        """
+
+        if chunk_size < 1:
+            raise InvalidArgumentError("Chunk size must be positive.")
+
+        backend = backend or sm3.get_backend()
+        sm3._get_hash_cls(backend)  # check early
+
+        size = os.path.getsize(path)
+        count = max(1, (size + chunk_size - 1) // chunk_size)
+
+        if workers > 1 and count > 1:
+            import concurrent.futures
+
+            with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+                futures = [
+                    executor.submit(_hash_file_chunks, path, begin, end, chunk_size, backend)
+                    for begin, end in _split(count, workers)
+                ]
+                leaves = [leaf for future in futures for leaf in future.result()]
+        else:
+            leaves = _hash_file_chunks(path, 0, count, chunk_size, backend)
+
+        return cls(leaves, size, chunk_size, backend=backend)
+
+    def _build(self) -> None:
+        node_hash = self._node_hash
+        levels = self._levels
+        del levels[1:]
+
+        level = levels[0]
+        while len(level) > 1:
+            parents = [node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+            if len(level) & 1:
+                parents.append(level[-1])
+            levels.append(parents)
+            level = parents
+
+    def _leaf_hash(self, chunk: bytes) -> bytes:
+        return _leaf_hash(self._hash_cls, chunk)
+
+    def _node_hash(self, left: bytes, right: bytes) -> bytes:
+        return _node_hash(self._hash_cls, left, right)
+
+    def _check_chunk(self, index: int, chunk: bytes) -> None:
+        count = len(self._levels[0])
+        if index < 0 or index >= count:
+            raise InvalidArgumentError(f"Chunk index {index} out of range [0, {count}).")
+
+        expected = min(self.chunk_size, self.size - index * self.chunk_size)
+        if len(chunk) != expected:
+            raise IncorrectLengthError(f"Chunk {index}", f"{expected} bytes", f"{len(chunk)} bytes")
+
+    @property
+    def root(self) -> bytes:
+        """Root hash."""
+
+        return self._levels[-1][0]
+
+    @property
+    def leaves(self) -> List[bytes]:
+        """Leaf hashes of all chunks."""
+
+        return list(self._levels[0])
+
+    def __len__(self) -> int:
+        """Number of chunks."""
+
+        return len(self._levels[0])
+
+    def update_chunk(self, index: int, chunk: bytes) -> bytes:
+        """Replace a chunk and recompute the hashes on its path to the root.
+
+        Args:
+            index: Chunk index.
+            chunk: New chunk data, same length as the old one.
+
+        Returns:
+            bytes: New root hash.
+
+        Raises:
+            InvalidArgumentError: Index out of range.
+            IncorrectLengthError: Chunk length changed.
+        """
+
+        self._check_chunk(index, chunk)
+
+        levels = self._levels
+        levels[0][index] = self._leaf_hash(chunk)
+        for depth in range(1, len(levels)):
+            child = levels[depth - 1]
+            left = index & ~1
+            index >>= 1
+            if left + 1 < len(child):
+                levels[depth][index] = self._node_hash(child[left], child[left + 1])
+            else:
+                levels[depth][index] = child[left]
+        return self.root
+
+    def verify_chunk(self, index: int, chunk: bytes) -> bool:
+        """Check a chunk against its leaf hash.
+
+        Args:
+            index: Chunk index.
+            chunk: Chunk data.
+
+        Returns:
+            bool: Whether the chunk is unchanged.
+        """
+
+        try:
+            self._check_chunk(index, chunk)
+        except IncorrectLengthError:
+            return False
+        return self._leaf_hash(chunk) == self._levels[0][index]
+
+    def verify_file(self, path: Union[str, os.PathLike], indexes: Iterable[int] = None) -> List[int]:
+        """Re-verify chunks of a file.
+
+        Args:
+            path: File path.
+            indexes: Chunk indexes to check, default to all.
+
+        Returns:
+            List[int]: Indexes of changed chunks, the last chunk is also reported if file size changed.
+        """
+
+        if indexes is None:
+            indexes = range(len(self))
+
+        changed = []
+        with open(path, "rb") as f:
+            for index in indexes:
+                f.seek(index * self.chunk_size)
+                if not self.verify_chunk(index, f.read(self.chunk_size)):
+                    changed.append(index)
+
+        if os.path.getsize(path) != self.size and len(self) - 1 not in changed:
+            changed.append(len(self) - 1)
+        return changed
+
+    def proof(self, index: int) -> List[bytes]:
+        """Get sibling hashes on the path from a leaf to the root, `None` for a promoted node without sibling.
+
+        Args:
+            index: Chunk index.
+
+        Returns:
+            List[bytes]: Audit path from bottom to top.
+        """
+
+        path = []
+        for level in self._levels[:-1]:
+            sibling = index ^ 1
+            path.append(level[sibling] if sibling < len(level) else None)
+            index >>= 1
+        return path
+
+    @staticmethod
+    def verify_proof(root: bytes, index: int, chunk: bytes, proof: List[bytes], *, backend: str = None) -> bool:
+        """Verify a chunk by its audit path without the whole tree.
+
+        Args:
+            root: Trusted root hash.
+            index: Chunk index.
+            chunk: Chunk data.
+            proof: Audit path returned by `proof`.
+            backend: SM3 backend name, default to the one returned by `gmalg.sm3.get_backend`.
+
+        Returns:
+            bool: Whether the chunk belongs to the tree, `False` if `index` is out of the range the proof covers.
+        """
+
+        hash_cls = sm3._get_hash_cls(backend)
+
+        # every bit of index selects a side, higher bits would be ignored
+        if index < 0 or index >> len(proof):
+            return False
+
+        h = _leaf_hash(hash_cls, chunk)
+        for sibling in proof:
+            if sibling is not None:
+                h = _node_hash(hash_cls, sibling, h) if index & 1 else _node_hash(hash_cls, h, sibling)
+            elif index & 1:
+                return False  # only the last node of a level is promoted, it is never a right child
+            index >>= 1
+        return h == root
+
+    def to_dict(self) -> Dict:
+        """Export tree to a JSON serializable dict, only leaves and root are stored.
+
+        Returns:
+            Dict: Serialized tree.
+        """
+
+        return {
+            "version": _FORMAT_VERSION,
+            "hash": "sm3",
+            "chunk_size": self.chunk_size,
+            "size": self.size,
+            "root": self.root.hex(),
+            "leaves": [leaf.hex() for leaf in self._levels[0]],
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict, *, backend: str = None) -> "SM3MerkleTree":
+        """Load tree exported by `to_dict`, inner nodes are recomputed.
+
+        Args:
+            d: Serialized tree.
+            backend: SM3 backend name, default to the one returned by `gmalg.sm3.get_backend`.
+
+        Returns:
+            SM3MerkleTree: Merkle tree.
+
+        Raises:
+            InvalidArgumentError: Unsupported format.
+            CheckFailedError: Root hash not match leaves.
+        """
+
+        if d.get("version") != _FORMAT_VERSION or d.get("hash") != "sm3":
+            raise InvalidArgumentError("Unsupported Merkle tree format.")
+
+        tree = cls([bytes.fromhex(leaf) for leaf in d["leaves"]], d["size"], d["chunk_size"], backend=backend)
+        if tree.root != bytes.fromhex(d["root"]):
+            raise CheckFailedError("Merkle root not match leaves.")
+        return tree
@@ -0,0 +1,143 @@
+"""Operation counting instrumentation.
+
+This module counts calls of the arithmetic methods in `gmalg.primefield` and `gmalg.ellipticcurve`,
+    which helps to find out where the time of a high level operation goes.
+
+```python
+import gmalg
+from gmalg.opcount import count_ops
+
+sm9 = gmalg.SM9(...)
+with count_ops() as counts:
+    sm9.decrypt(cipher)
+
+print(counts.as_dict())
+```
+
+The counting methods are patched into the classes only while at least one `count_ops` context is active,
+    so there is no overhead at all when counting is disabled.
+    The patching is process wide, calls made from other threads during the context are counted too.
+"""
+
+import contextlib
+import functools
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from . import ellipticcurve as Ec
+from . import primefield as Fp
+
+__all__ = [
+    "OpCounts",
+    "count_ops",
+]
+
+
+class OpCounts:
+    """Operation counts grouped by level.
+
+    Levels are named after the class that performs the operation,
+        i.e. `"PrimeField"`, `"PrimeField2"`, `"PrimeField4"`, `"PrimeField12"`, `"SM9BNBP"`,
+        and `"EllipticCurve(<field class name>)"` for curves.
+
+    Note:
+        Operations are counted on every level they pass through,
+            e.g. a `PrimeField2.mul` is counted once in `"PrimeField2"` and also adds its inner `PrimeField.mul` calls.
+            A `EllipticCurve.add` of two equal points is counted both as `add` and `double`.
+    """
+
+    def __init__(self) -> None:
+        self._counts: Dict[str, Dict[str, int]] = {}
+
+    def _inc(self, level: str, op: str) -> None:
+        ops = self._counts.setdefault(level, {})
+        ops[op] = ops.get(op, 0) + 1
+
+    def __getitem__(self, level: str) -> Dict[str, int]:
+        return dict(self._counts.get(level, {}))
+
+    def levels(self) -> List[str]:
+        """Get all levels that have counts."""
+
+        return list(self._counts)
+
+    def as_dict(self) -> Dict[str, Dict[str, int]]:
+        """Export counts as `{level: {op: count}}`."""
+
+        return {level: dict(ops) for level, ops in self._counts.items()}
+
+    def __repr__(self) -> str:
+        return f"OpCounts({self._counts!r})"
+
+
+def _field_level(self) -> str:
+    return type(self).__name__
+
+
+def _curve_level(self) -> str:
+    return f"EllipticCurve({type(self._fp).__name__})"
+
+
+def _pairing_level(self) -> str:
+    return "SM9BNBP"
+
+
+_FIELD_OPS = (("add", "add"), ("sub", "sub"), ("mul", "mul"), ("sqr", "sqr"), ("inv", "inv"), ("sqrt", "sqrt"))
+
+# (class, level function, ((method name, op name), ...))
+_TARGETS: List[Tuple[type, Callable[[object], str], Tuple[Tuple[str, str], ...]]] = [
+    (Fp.PrimeField, _field_level, _FIELD_OPS),
+    (Fp.PrimeField2, _field_level, _FIELD_OPS),
+    (Fp.PrimeField4, _field_level, _FIELD_OPS),
+    (Fp.PrimeField12, _field_level, _FIELD_OPS),
+    (Ec.EllipticCurve, _curve_level, (("add", "add"), ("double", "double"))),
+    (Ec.SM9BNBP, _pairing_level, (("_miller_loop", "miller_loop"), ("_finalexp", "final_exp"))),
+]
+
+_active: List[OpCounts] = []
+_originals: List[Tuple[type, str, Callable]] = []
+
+
+def _counting(func: Callable, level_fn: Callable[[object], str], op: str) -> Callable:
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        level = level_fn(self)
+        for counts in _active:
+            counts._inc(level, op)
+        return func(self, *args, **kwargs)
+    return wrapper
+
+
+def _patch() -> None:
+    for cls, level_fn, ops in _TARGETS:
+        for name, op in ops:
+            func = cls.__dict__[name]
+            _originals.append((cls, name, func))
+            setattr(cls, name, _counting(func, level_fn, op))
+
+
+def _unpatch() -> None:
+    while _originals:
+        cls, name, func = _originals.pop()
+        setattr(cls, name, func)
+
+
+@contextlib.contextmanager
+def count_ops() -> Iterator[OpCounts]:
+    """Count field, curve and pairing operations inside the context.
+
+    Contexts can be nested, each one gets the counts of the operations performed inside it.
+
+    Yields:
+        OpCounts: Counts collected in the context, remains readable after the context exits.
+    """
+
+    counts = OpCounts()
+    if not _active:
+        _patch()
+    _active.append(counts)
+    try:
+        yield counts
+    finally:
+        _active.remove(counts)
+        if not _active:
+            _unpatch()
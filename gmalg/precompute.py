@@ -0,0 +1,240 @@
+"""Fixed-base precomputation tables.
+
+A table stores the multiples `(j + 1) * 2^(w * i) * P` of a base point `P`,
+    for every window `i` and every nonzero window value `j + 1` of `w` bits,
+    so that a scalar multiplication of `P` only needs one point addition per nonzero window.
+
+Tables can be persisted to a binary file and loaded back through `mmap`.
+    Entries are decoded lazily from the mapped pages when first used,
+    so loading costs almost nothing and the pages are shared by all processes using the same file.
+    Each decoded entry is checked to be on the curve, a corrupted file is rebuilt on the first bad entry.
+
+File format, all integers are big endian:
+
+| Field       | Size  | Description                                  |
+| ----------- | ----- | -------------------------------------------- |
+| magic       | 4     | `b"GMPT"`                                    |
+| version     | 2     | Format version, currently `2`                |
+| window      | 1     | Window bit width `w`                         |
+| reserved    | 1     | Zero                                         |
+| windows     | 4     | Number of windows                            |
+| elen        | 4     | Byte length of one entry                     |
+| fingerprint | 32    | SM3 of curve parameters, base point and size |
+| digest      | 32    | SM3 of entries, written for offline checks   |
+| entries     | ...   | `windows * (2^w - 1)` entries of `x || y`    |
+
+A file whose header does not match the expected values is considered stale and rebuilt.
+    Loading does not hash the entries, that would read every page of the file.
+"""
+
+import mmap
+import os
+import struct
+import tempfile
+from typing import List, Union
+
+from .sm3 import SM3, get_hash_cls
+
+__all__ = [
+    "FixedBaseTable",
+    "cache_path",
+]
+
+_MAGIC = b"GMPT"
+_VERSION = 2
+_HEADER = struct.Struct(">4sHBBII32s32s")
+_DIGEST_OFFSET = _HEADER.size - 32
+
+
+def cache_path(name: str) -> Union[str, None]:
+    """Get path of a table file in the cache directory.
+
+    The cache directory is `$GMALG_CACHE_DIR` if set, otherwise `gmalg` under `$XDG_CACHE_HOME` or `~/.cache`.
+        Setting `GMALG_CACHE_DIR` to an empty string disables persisted tables.
+
+    Args:
+        name: File name of table.
+
+    Returns:
+        Union[str, None]: Path of table file, `None` if persistence is disabled.
+    """
+
+    cache_dir = os.environ.get("GMALG_CACHE_DIR")
+    if cache_dir is None:
+        cache_dir = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "gmalg")
+    if not cache_dir:
+        return None
+    return os.path.join(cache_dir, name)
+
+
+class FixedBaseTable:
+    """Fixed-base precomputation table of a point.
+
+    Attributes:
+        path (Union[str, None]): Path of persisted table file, `None` means in memory only.
+        window (int): Window bit width.
+        windows (int): Number of windows.
+    """
+
+    def __init__(self, ec, P, nbits: int, window: int = 4, path: str = None) -> None:
+        """Fixed-base precomputation table of a point.
+
+        Nothing is computed or loaded until the first multiplication.
+
+        Args:
+            ec (EllipticCurve): Curve of `P`.
+            P (EcPointEx): Base point, must have a prime order larger than `2^window`.
+            nbits: Bit length of scalars to be accelerated, usually the bit length of the order of `P`.
+            window: Window bit width.
+            path: Path of persisted table file, `None` means in memory only.
+        """
+
+        self._ec = ec
+        self._fp = ec._fp
+        self._P = P
+
+        self.window = window
+        self.windows = (nbits + window - 1) // window
+        self.path = path
+
+        self._width = (1 << window) - 1
+        self._max_bits = self.windows * window
+        self._elen = self._fp.e_length * 2
+        self._fingerprint = self._compute_fingerprint()
+
+        self._buffer: Union[mmap.mmap, None] = None
+        self._entries: Union[List, None] = None
+
+    def _compute_fingerprint(self) -> bytes:
+        fp = self._fp
+        etob = fp.etob
+        x, y = self._P
+
+        h = SM3()
+        h.update(type(fp).__name__.encode())
+        h.update(etob(fp.neg(fp.one())))  # encodes prime p
+        h.update(etob(self._ec.a))
+        h.update(etob(self._ec.b))
+        h.update(etob(x))
+        h.update(etob(y))
+        h.update(struct.pack(">BI", self.window, self.windows))
+        return h.value()
+
+    def _header(self, digest: bytes) -> bytes:
+        return _HEADER.pack(_MAGIC, _VERSION, self.window, 0, self.windows, self._elen, self._fingerprint, digest)
+
+    def _build(self) -> List:
+        ec = self._ec
+        add = ec.add
+
+        entries = []
+        base = self._P
+        for _ in range(self.windows):
+            Q = base
+            entries.append(Q)
+            for _ in range(self._width - 1):
+                Q = add(Q, base)
+                entries.append(Q)
+            base = add(Q, base)
+        return entries
+
+    def _open(self) -> Union[mmap.mmap, None]:
+        """Map table file, returns `None` if missing or stale."""
+
+        try:
+            with open(self.path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                if size != _HEADER.size + self.windows * self._width * self._elen:
+                    return None
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        if buffer[:_HEADER.size] != self._header(buffer[_DIGEST_OFFSET:_HEADER.size]):
+            buffer.close()
+            return None
+        return buffer
+
+    def _save(self, entries: List) -> None:
+        """Write table file atomically, failures are ignored."""
+
+        etob = self._fp.etob
+        body = b"".join(etob(x) + etob(y) for x, y in entries)
+
+        directory = os.path.dirname(self.path) or "."
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix=".gmpt-", dir=directory)
+        except OSError:
+            return
+
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(self._header(get_hash_cls()(body).value()))
+                f.write(body)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def _load(self) -> None:
+        if self.path is not None:
+            self._buffer = self._open()
+
+        if self._buffer is not None:
+            self._entries = [None] * (self.windows * self._width)
+        else:
+            self._entries = self._build()
+            if self.path is not None:
+                self._save(self._entries)
+
+    def _entry(self, index: int):
+        P = self._entries[index]
+        if P is None:
+            btoe = self._fp.btoe
+            half = self._elen >> 1
+            begin = _HEADER.size + index * self._elen
+            P = (btoe(self._buffer[begin:begin + half]), btoe(self._buffer[begin + half:begin + self._elen]))
+            if not self._ec.isvalid(P):
+                return self._rebuild()[index]
+            self._entries[index] = P
+        return P
+
+    def _rebuild(self) -> List:
+        """Drop a corrupted table file and replace it with a computed table."""
+
+        self._buffer.close()
+        self._buffer = None
+        self._entries = self._build()
+        self._save(self._entries)
+        return self._entries
+
+    def mul(self, k: int):
+        """Scalar multiplication of base point by k.
+
+        Scalars that can not be handled by table are passed to `EllipticCurve.mul`.
+        """
+
+        if k <= 0 or k.bit_length() > self._max_bits:
+            return self._ec.mul(k, self._P)
+
+        if self._entries is None:
+            self._load()
+
+        add = self._ec.add
+        entry = self._entry
+        window = self.window
+        width = self._width
+
+        Q = self._ec.INF
+        offset = -1
+        while k:
+            d = k & width
+            if d:
+                Q = add(Q, entry(offset + d))
+            k >>= window
+            offset += width
+        return Q
@@ -5,11 +5,16 @@ This module provides basic operations on extension fields.
     as detailed in the SM9 standard documentation.
 """
 
-from typing import Tuple, Union
+from typing import Any, Callable, Dict, List, NamedTuple, Tuple, Union
 
 from .errors import *
 
 __all__ = [
+    "FieldBackend",
+    "register_backend",
+    "available_backends",
+    "get_backend",
+    "set_backend",
     "Fp2Ele",
     "Fp4Ele",
     "Fp12Ele",
@@ -31,6 +36,110 @@ Fp12Ele = Tuple[Fp4Ele, Fp4Ele, Fp4Ele]
 FpExEle = Union[int, Fp2Ele, Fp4Ele, Fp12Ele]
 
 
+class FieldBackend(NamedTuple):
+    """Big integer backend used by `PrimeField`.
+
+    Attributes:
+        name (str): Backend name.
+        mpz (Callable[[int], Any]): Convert a Python `int` to the backend integer type.
+        powmod (Callable[[Any, int, Any], Any]): Modular exponentiation `powmod(x, e, p)`.
+        invert (Callable[[Any, Any], Any]): Modular inversion `invert(x, p)`.
+    """
+
+    name: str
+    mpz: Callable[[int], Any]
+    powmod: Callable[[Any, int, Any], Any]
+    invert: Callable[[Any, Any], Any]
+
+
+def _invert(x: int, p: int) -> int:
+    """Modular inversion by extended euclidean algorithm."""
+
+    r1 = p
+    r2 = x
+    t1 = 0
+    t2 = 1
+    while r2 > 0:
+        q, r = divmod(r1, r2)
+        r1 = r2
+        r2 = r
+        t = t1 - q * t2
+        t1 = t2
+        t2 = t
+    return t1 % p
+
+
+_BACKENDS: Dict[str, FieldBackend] = {}
+_backend: FieldBackend = None
+
+
+def register_backend(name: str, mpz: Callable[[int], Any], powmod: Callable[[Any, int, Any], Any], invert: Callable[[Any, Any], Any]) -> FieldBackend:
+    """Register a big integer backend.
+
+    Args:
+        name: Backend name, an existing backend with the same name will be replaced.
+        mpz: Convert a Python `int` to the backend integer type.
+        powmod: Modular exponentiation `powmod(x, e, p)`.
+        invert: Modular inversion `invert(x, p)`.
+
+    Returns:
+        FieldBackend: Registered backend.
+    """
+
+    backend = FieldBackend(name, mpz, powmod, invert)
+    _BACKENDS[name] = backend
+    return backend
+
+
+def available_backends() -> List[str]:
+    """Get names of all registered backends."""
+
+    return list(_BACKENDS)
+
+
+def get_backend() -> FieldBackend:
+    """Get default backend used by newly created prime fields."""
+
+    return _backend
+
+
+def set_backend(name: str) -> None:
+    """Set default backend used by newly created prime fields.
+
+    Fields created before the call keep the backend they were created with.
+
+    Args:
+        name: Registered backend name.
+
+    Raises:
+        InvalidArgumentError: Unknown backend name.
+    """
+
+    global _backend
+
+    if name not in _BACKENDS:
+        raise InvalidArgumentError(f"Unknown prime field backend {name}.")
+    _backend = _BACKENDS[name]
+
+
+def _get_backend(name: str = None) -> FieldBackend:
+    if name is None:
+        return _backend
+    if name not in _BACKENDS:
+        raise InvalidArgumentError(f"Unknown prime field backend {name}.")
+    return _BACKENDS[name]
+
+
+register_backend("python", int, pow, _invert)
+
+try:
+    import gmpy2
+except ImportError:
+    _backend = _BACKENDS["python"]
+else:
+    _backend = register_backend("gmpy2", gmpy2.mpz, gmpy2.powmod, gmpy2.invert)
+
+
 class PrimeFieldBase:
     """Base class of Fp operations.
 
@@ -115,6 +224,11 @@ class PrimeFieldBase:
 
         raise NotImplementedError
 
+    def sqr(self, x: FpExEle) -> FpExEle:
+        """Square of element."""
+
+        raise NotImplementedError
+
     def inv(self, x: FpExEle) -> FpExEle:
         """Inverse of element."""
 
@@ -145,6 +259,7 @@ class PrimeField(PrimeFieldBase):
     """Fp operations.
 
     Attributes:
+        backend (FieldBackend): Big integer backend used in operations.
         p (int): Prime number used in operations.
         p_bitlength (int): Bit length of p.
         p_length (int): Byte length of p.
@@ -174,8 +289,20 @@ class PrimeField(PrimeFieldBase):
     def extend(cls, x: int) -> int:
         return x
 
-    def __init__(self, p: int) -> None:
-        self.p = p
+    def __init__(self, p: int, backend: str = None) -> None:
+        """Fp operations.
+
+        Args:
+            p: A prime number.
+            backend: Registered backend name, default to the one returned by `get_backend`.
+        """
+
+        self.backend = _get_backend(backend)
+        self._mpz = self.backend.mpz
+        self._powmod = self.backend.powmod
+        self._invert = self.backend.invert
+
+        self.p = self._mpz(p)
         self.p_bitlength = self.p.bit_length()
         self.p_length = (self.p_bitlength + 7) >> 3
         self.e_length = self.p_length
@@ -183,15 +310,16 @@ class PrimeField(PrimeFieldBase):
         self._u, self._r = divmod(self.p, 8)
 
         if self._r == 1:
-            self.sqrt = self._sqrt_8u1
+            self._ts_c = None  # Tonelli-Shanks constants are computed on first use
+            self._sqrt = self._sqrt_8u1
         elif self._r == 3:
             self._u = self._u * 2
-            self.sqrt = self._sqrt_4u3
+            self._sqrt = self._sqrt_4u3
         elif self._r == 5:
-            self.sqrt = self._sqrt_8u5
+            self._sqrt = self._sqrt_8u5
         elif self._r == 7:
             self._u = self._u * 2 + 1
-            self.sqrt = self._sqrt_4u3
+            self._sqrt = self._sqrt_4u3
         else:
             raise InvalidArgumentError(f"0x{p:x} is not a prime number.")
 
@@ -219,51 +347,21 @@ class PrimeField(PrimeFieldBase):
     def mul(self, x: int, y: int) -> int:
         return (x * y) % self.p
 
-    def inv(self, x: int):
-        r1 = self.p
-        r2 = x
-        t1 = 0
-        t2 = 1
-        while r2 > 0:
-            q, r = divmod(r1, r2)
-            r1 = r2
-            r2 = r
-            t = t1 - q * t2
-            t1 = t2
-            t2 = t
-        return t1 % self.p
-
-    def pow(self, x: int, e: int) -> int:
-        return pow(x, e, self.p)
-
-    def _lucas(self, X: int, Y: int, k: int) -> Tuple[int, int]:
-        """Lucas sequence, k begin at 0.
-
-        Uk = X * Uk-1 - Y * Uk-2
-        Vk = X * Vk-1 - Y * Vk-2
+    def sqr(self, x: int) -> int:
+        return (x * x) % self.p
 
-        Returns:
-            (int, int): The k-th lucas value pair.
-        """
-
-        p = self.p
-
-        delta = (X * X - 4 * Y) % p
-        inv2 = self.inv(2)
+    def inv(self, x: int) -> int:
+        return self._invert(x, self.p)
 
-        U, V = 0, 2
-        for i in f"{k:b}":
-            U, V = (U * V) % p, ((V * V + delta * U * U) * inv2) % p
-            if i == "1":
-                U, V = ((X * U + V) * inv2) % p, ((X * V + delta * U) * inv2) % p
-        return U, V
+    def pow(self, x: int, e: int) -> int:
+        return self._powmod(x, e, self.p)
 
     def _sqrt_4u3(self, x: int) -> Union[int, None]:
         """sqrt_8u3 and sqrt_8u7"""
         p = self.p
         u = self._u
 
-        y = pow(x, u + 1, p)
+        y = self._powmod(x, u + 1, p)
         if (y * y) % p == x:
             return y
         return None
@@ -272,39 +370,83 @@ class PrimeField(PrimeFieldBase):
         p = self.p
         u = self._u
 
-        z = pow(x, 2 * u + 1, p)
+        if x == 0:
+            return x
+
+        z = self._powmod(x, 2 * u + 1, p)
         if z == 1:
-            return pow(x, u + 1, p)
+            return self._powmod(x, u + 1, p)
         if z == p - 1:
-            return (2 * x * pow(4 * x, u, p)) % p
+            return (2 * x * self._powmod(4 * x, u, p)) % p
         return None
 
+    def _init_sqrt_8u1(self) -> None:
+        """Precompute Tonelli-Shanks constants, p - 1 = q * 2^s with q odd."""
+
+        p = self.p
+        powmod = self._powmod
+
+        q, s = p - 1, 0
+        while not q & 1:
+            q >>= 1
+            s += 1
+
+        # smallest quadratic non-residue by Euler's criterion
+        z = 2
+        while z < p and powmod(z, (p - 1) >> 1, p) != p - 1:
+            z += 1
+        if z >= p:
+            raise InvalidArgumentError(f"0x{p:x} is not a prime number.")
+
+        self._ts_s = s
+        self._ts_e = (q - 1) >> 1
+        self._ts_c = powmod(z, q, p)
+
     def _sqrt_8u1(self, x: int) -> Union[int, None]:
+        """Tonelli-Shanks."""
+
         p = self.p
-        p_1 = p - 1
-        _4u1 = 4 * self._u + 1
-        inv2 = self.inv(2)
 
-        Y = x
-        for X in range(1, p):
-            U, V = self._lucas(X, Y, _4u1)
+        if x == 0:
+            return x
 
-            if (V * V - 4 * Y) % p == 0:
-                return (V * inv2) % p
+        if self._ts_c is None:
+            self._init_sqrt_8u1()
 
-            if U != 1 or U != p_1:
-                return None
+        w = self._powmod(x, self._ts_e, p)
+        r = (x * w) % p  # x^((q+1)/2)
+        t = (r * w) % p  # x^q
+        c = self._ts_c
+        m = self._ts_s
 
-        return None
+        while t != 1:
+            # least i that t^(2^i) == 1
+            i = 0
+            t2 = t
+            while t2 != 1:
+                t2 = (t2 * t2) % p
+                i += 1
+                if i == m:
+                    return None
+
+            b = c
+            for _ in range(m - i - 1):
+                b = (b * b) % p
+            m = i
+            c = (b * b) % p
+            t = (t * c) % p
+            r = (r * b) % p
+
+        return r
 
     def sqrt(self, x: int) -> Union[int, None]:
-        raise NotImplementedError
+        return self._sqrt(x)
 
     def etob(self, e: int) -> bytes:
-        return e.to_bytes(self.e_length, "big")
+        return int(e).to_bytes(self.e_length, "big")
 
     def btoe(self, b: bytes) -> int:
-        return int.from_bytes(b, "big")
+        return self._mpz(int.from_bytes(b, "big"))
 
 
 class PrimeField2(PrimeFieldBase):
@@ -322,7 +464,7 @@ class PrimeField2(PrimeFieldBase):
 
     @classmethod
     def extend(cls, x: Union[int, Fp2Ele]) -> Fp2Ele:
-        if isinstance(x, int):
+        if not isinstance(x, tuple):
             return (PrimeField.zero(), x)
         return x
 
@@ -342,8 +484,15 @@ class PrimeField2(PrimeFieldBase):
     def isone(cls, X: Fp2Ele) -> bool:
         return X == cls._ONE
 
-    def __init__(self, p: int) -> None:
-        self.fp = PrimeField(p)
+    def __init__(self, p: int, backend: str = None) -> None:
+        """Fp2 operations.
+
+        Args:
+            p: A prime number.
+            backend: Registered backend name, default to the one returned by `get_backend`.
+        """
+
+        self.fp = PrimeField(p, backend)
         self.e_length = self.fp.e_length * 2
 
     def isoppo(self, X: Fp2Ele, Y: Fp2Ele) -> bool:
@@ -387,6 +536,22 @@ class PrimeField2(PrimeFieldBase):
 
         return Z1, Z0
 
+    def sqr(self, X: Fp2Ele) -> Fp2Ele:
+        a = self.fp.add
+        s = self.fp.sub
+        m = self.fp.mul
+        sm = self.fp.smul
+
+        X1, X0 = X
+        U = self._ALPHA
+
+        X1mX0 = m(X1, X0)
+
+        Z1 = a(X1mX0, X1mX0)
+        Z0 = s(m(a(X0, X1), a(X0, sm(U, X1))), a(X1mX0, sm(U, X1mX0)))
+
+        return Z1, Z0
+
     def inv(self, X: Fp2Ele) -> Fp2Ele:
         n = self.fp.neg
         s = self.fp.sub
@@ -410,7 +575,7 @@ class PrimeField2(PrimeFieldBase):
     def pow(self, X: Fp2Ele, e: int) -> Fp2Ele:
         Y = X
         for i in f"{e:b}"[1:]:
-            Y = self.mul(Y, Y)
+            Y = self.sqr(Y)
             if i == "1":
                 Y = self.mul(Y, X)
         return Y
@@ -469,9 +634,9 @@ class PrimeField4(PrimeFieldBase):
 
     @classmethod
     def extend(cls, x: Union[int, Fp2Ele, Fp4Ele]) -> Fp4Ele:
-        if isinstance(x, int):
+        if not isinstance(x, tuple):
             return (PrimeField2.zero(), (PrimeField.zero(), x))
-        elif isinstance(x[0], int):
+        elif not isinstance(x[0], tuple):
             return (PrimeField2.zero(), x)
         return x
 
@@ -491,8 +656,15 @@ class PrimeField4(PrimeFieldBase):
     def isone(cls, X: Fp4Ele) -> bool:
         return X == cls._ONE
 
-    def __init__(self, p: int) -> None:
-        self.fp2 = PrimeField2(p)
+    def __init__(self, p: int, backend: str = None) -> None:
+        """Fp4 operations.
+
+        Args:
+            p: A prime number.
+            backend: Registered backend name, default to the one returned by `get_backend`.
+        """
+
+        self.fp2 = PrimeField2(p, backend)
         self.e_length = self.fp2.e_length * 2
 
     def isoppo(self, X: Fp4Ele, Y: Fp4Ele) -> bool:
@@ -536,6 +708,21 @@ class PrimeField4(PrimeFieldBase):
 
         return Z1, Z0
 
+    def sqr(self, X: Fp4Ele) -> Fp4Ele:
+        a = self.fp2.add
+        m = self.fp2.mul
+        q = self.fp2.sqr
+
+        X1, X0 = X
+        U = self._ALPHA
+
+        X1mX0 = m(X1, X0)
+
+        Z1 = a(X1mX0, X1mX0)
+        Z0 = a(m(U, q(X1)), q(X0))
+
+        return Z1, Z0
+
     def inv(self, X: Fp4Ele) -> Fp4Ele:
         n = self.fp2.neg
         s = self.fp2.sub
@@ -559,7 +746,7 @@ class PrimeField4(PrimeFieldBase):
     def pow(self, X: Fp4Ele, e: int) -> Fp4Ele:
         Y = X
         for i in f"{e:b}"[1:]:
-            Y = self.mul(Y, Y)
+            Y = self.sqr(Y)
             if i == "1":
                 Y = self.mul(Y, X)
         return Y
@@ -592,11 +779,11 @@ class PrimeField12(PrimeFieldBase):
 
     @classmethod
     def extend(cls, x: Union[int, Fp2Ele, Fp4Ele, Fp12Ele]) -> Fp12Ele:
-        if isinstance(x, int):
+        if not isinstance(x, tuple):
             return (PrimeField4.zero(), PrimeField4.zero(), (PrimeField2.zero(), (PrimeField.zero(), x)))
-        elif isinstance(x[0], int):
+        elif not isinstance(x[0], tuple):
             return (PrimeField4.zero(), PrimeField4.zero(), (PrimeField2.zero(), x))
-        elif isinstance(x[0][0], int):
+        elif not isinstance(x[0][0], tuple):
             return (PrimeField4.zero(), PrimeField4.zero(), x)
         return x
 
@@ -616,8 +803,15 @@ class PrimeField12(PrimeFieldBase):
     def isone(cls, X: Fp12Ele) -> bool:
         return X == cls._ONE
 
-    def __init__(self, p: int) -> None:
-        self.fp4 = PrimeField4(p)
+    def __init__(self, p: int, backend: str = None) -> None:
+        """Fp12 operations.
+
+        Args:
+            p: A prime number.
+            backend: Registered backend name, default to the one returned by `get_backend`.
+        """
+
+        self.fp4 = PrimeField4(p, backend)
         self.e_length = self.fp4.e_length * 3
 
     def isoppo(self, X: Fp12Ele, Y: Fp12Ele) -> bool:
@@ -669,6 +863,24 @@ class PrimeField12(PrimeFieldBase):
 
         return Z2, Z1, Z0
 
+    def sqr(self, X: Fp12Ele) -> Fp12Ele:
+        a = self.fp4.add
+        m = self.fp4.mul
+        q = self.fp4.sqr
+
+        X2, X1, X0 = X
+        U = self._ALPHA
+
+        X2mX1 = m(X2, X1)
+        X2mX0 = m(X2, X0)
+        X1mX0 = m(X1, X0)
+
+        Z2 = a(a(X2mX0, X2mX0), q(X1))
+        Z1 = a(m(U, q(X2)), a(X1mX0, X1mX0))
+        Z0 = a(q(X0), m(U, a(X2mX1, X2mX1)))
+
+        return Z2, Z1, Z0
+
     def inv(self, X: Fp12Ele) -> Fp12Ele:
         a = self.fp4.add
         s = self.fp4.sub
@@ -696,7 +908,7 @@ class PrimeField12(PrimeFieldBase):
     def pow(self, X: Fp12Ele, e: int) -> Fp12Ele:
         Y = X
         for i in f"{e:b}"[1:]:
-            Y = self.mul(Y, Y)
+            Y = self.sqr(Y)
             if i == "1":
                 Y = self.mul(Y, X)
         return Y
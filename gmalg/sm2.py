@@ -1,13 +1,15 @@
 """SM2 Algorithm Implementation Module."""
 
 import math
-from typing import Callable, Tuple, Type
+import threading
+from typing import Callable, Tuple, Type, Union
 
 from . import ellipticcurve as Ec
+from . import precompute
 from .base import KEYXCHG_MODE, PC_MODE, Hash, SMCoreBase
 from .errors import *
-from .sm3 import SM3
-from .utils import bytes_to_int, int_to_bytes
+from . import sm3
+from .utils import CacheInfo, LRUCache, bytes_to_int, int_to_bytes
 
 __all__ = [
     "SM2",
@@ -15,14 +17,39 @@ __all__ = [
     "KEYXCHG_MODE",
 ]
 
-_ecdlp = Ec.ECDLP(
-    0xFFFFFFFE_FFFFFFFF_FFFFFFFF_FFFFFFFF_FFFFFFFF_00000000_FFFFFFFF_FFFFFFFF,
-    0xFFFFFFFE_FFFFFFFF_FFFFFFFF_FFFFFFFF_FFFFFFFF_00000000_FFFFFFFF_FFFFFFFC,
-    0x28E9FA9E_9D9F5E34_4D5A9E4B_CF6509A7_F39789F5_15AB8F92_DDBCBD41_4D940E93,
-    (0x32C4AE2C_1F198119_5F990446_6A39C994_8FE30BBF_F2660BE1_715A4589_334C74C7,
-     0xBC3736A2_F4F6779C_59BDCEE3_6B692153_D0A9877C_C62A4740_02DF32E5_2139F0A0),
-    0xFFFFFFFE_FFFFFFFF_FFFFFFFF_FFFFFFFF_7203DF6B_21C6052B_53BBF409_39D54123,
-)
+_ecdlp_instance: Union[Ec.ECDLP, None] = None
+_ecdlp_lock = threading.Lock()
+
+
+def _get_ecdlp() -> Ec.ECDLP:
+    """Get SM2 curve parameters, built on first use."""
+
+    global _ecdlp_instance
+    if _ecdlp_instance is None:
+        with _ecdlp_lock:
+            if _ecdlp_instance is None:
+                ecdlp = Ec.ECDLP(
+                    0xFFFFFFFE_FFFFFFFF_FFFFFFFF_FFFFFFFF_FFFFFFFF_00000000_FFFFFFFF_FFFFFFFF,
+                    0xFFFFFFFE_FFFFFFFF_FFFFFFFF_FFFFFFFF_FFFFFFFF_00000000_FFFFFFFF_FFFFFFFC,
+                    0x28E9FA9E_9D9F5E34_4D5A9E4B_CF6509A7_F39789F5_15AB8F92_DDBCBD41_4D940E93,
+                    (0x32C4AE2C_1F198119_5F990446_6A39C994_8FE30BBF_F2660BE1_715A4589_334C74C7,
+                     0xBC3736A2_F4F6779C_59BDCEE3_6B692153_D0A9877C_C62A4740_02DF32E5_2139F0A0),
+                    0xFFFFFFFE_FFFFFFFF_FFFFFFFF_FFFFFFFF_7203DF6B_21C6052B_53BBF409_39D54123,
+                )
+                ecdlp.precompute(precompute.cache_path("sm2_G.gmpt"))
+                _ecdlp_instance = ecdlp
+    return _ecdlp_instance
+
+
+# entity information cache shared by all `SM2` instances
+_za_cache = LRUCache(1024)
+
+
+def __getattr__(name: str):
+    # keep `sm2._ecdlp` available without building it at import
+    if name == "_ecdlp":
+        return _get_ecdlp()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def point_to_bytes(P: Ec.EcPoint, mode: PC_MODE) -> bytes:
@@ -39,10 +66,11 @@ def point_to_bytes(P: Ec.EcPoint, mode: PC_MODE) -> bytes:
         TypeError: Invalid mode.
     """
 
-    if P == _ecdlp.ec.INF:
+    ecdlp = _get_ecdlp()
+    if P == ecdlp.ec.INF:
         return b"\x00"
 
-    etob = _ecdlp.fp.etob
+    etob = ecdlp.fp.etob
     x, y = P
 
     if mode is PC_MODE.RAW:
@@ -75,8 +103,9 @@ def bytes_to_point(b: bytes) -> Ec.EcPoint:
         InvalidPCError: Invalid PC byte.
     """
 
-    fp = _ecdlp.fp
-    ec = _ecdlp.ec
+    ecdlp = _get_ecdlp()
+    fp = ecdlp.fp
+    ec = ecdlp.ec
 
     mode = b[0]
     if mode == 0x00:
@@ -105,19 +134,30 @@ class SM2Core(SMCoreBase):
         ecdlp (ECDLP): ECDLP used in SM2.
     """
 
-    def __init__(self, ecdlp: Ec.ECDLP, hash_cls: Type[Hash], rnd_fn: Callable[[int], int] = None) -> None:
+    def __init__(self, ecdlp: Ec.ECDLP, hash_cls: Type[Hash], rnd_fn: Callable[[int], int] = None, *,
+                 za_cache_size: int = 1024, za_cache: LRUCache = None) -> None:
         """SM2 Core Algorithms.
 
         Args:
             ecdlp: ECDLP used in SM2.
             hash_cls (Type[Hash]): Hash class used in SM2.
             rnd_fn (Callable[[int], int]): Random function used to generate k-bit random number, default to [`secrets.randbits`][].
+            za_cache_size: Maximum number of cached entity information digests, 0 disables caching.
+            za_cache (LRUCache): Share an existing entity information cache, overrides `za_cache_size`.
+                Only share it between cores with the same `ecdlp` and `hash_cls`.
         """
 
         super().__init__(hash_cls, rnd_fn)
 
         self.ecdlp = ecdlp
 
+        # entity information, Z = H(ENTL || ID || a || b || xG || yG || xP || yP)
+        etob = ecdlp.fp.etob
+        xG, yG = ecdlp.G
+        self._curve_info = etob(ecdlp.ec.a) + etob(ecdlp.ec.b) + etob(xG) + etob(yG)
+        self._za_cache = za_cache if za_cache is not None else LRUCache(za_cache_size)
+        self._uid_states = LRUCache(16 if self._za_cache.maxsize > 0 else 0)  # hash states after the curve info
+
         # used in key exchange
         w = math.ceil(math.ceil(math.log2(self.ecdlp.fpn.p)) / 2) - 1
         self._2w = 1 << w
@@ -187,21 +227,38 @@ class SM2Core(SMCoreBase):
         if ENTL.bit_length() >= 16:
             raise DataOverflowError("ID", "8192 bytes")
 
+        uid = bytes(uid)
+        key = (uid, pk)
+
+        Z = self._za_cache.get(key)
+        if Z is not None:
+            return Z
+
+        # ENTL || ID || curve info does not change with the public key
+        state = self._uid_states.get(uid)
+        if state is None:
+            state = self._hash_cls()
+            state.update(ENTL.to_bytes(2, "big") + uid + self._curve_info)
+            self._uid_states.put(uid, state)
+
         etob = self.ecdlp.fp.etob
         xP, yP = pk
-        xG, yG = self.ecdlp.G
 
-        Z = bytearray()
-        Z.extend(ENTL.to_bytes(2, "big"))
-        Z.extend(uid)
-        Z.extend(etob(self.ecdlp.ec.a))
-        Z.extend(etob(self.ecdlp.ec.b))
-        Z.extend(etob(xG))
-        Z.extend(etob(yG))
-        Z.extend(etob(xP))
-        Z.extend(etob(yP))
+        h = state.copy()
+        h.update(etob(xP) + etob(yP))
+        Z = h.value()
+
+        self._za_cache.put(key, Z)
+        return Z
+
+    def za_cache_info(self) -> CacheInfo:
+        """Get statistics of the entity information cache.
+
+        Returns:
+            CacheInfo: Named tuple of `hits`, `misses`, `maxsize` and `currsize`.
+        """
 
-        return self._hash_fn(Z)
+        return self._za_cache.info()
 
     def sign(self, message: bytes, sk: int, uid: bytes, pk: Ec.EcPoint = None) -> Tuple[int, int]:
         """Generate signature on the message.
@@ -456,7 +513,7 @@ class SM2:
             pc_mode: Point compress mode used for generated data, no effects on the data to be parsed.
         """
 
-        self._core = SM2Core(_ecdlp, SM3, rnd_fn)
+        self._core = SM2Core(_get_ecdlp(), sm3.get_hash_cls(), rnd_fn, za_cache=_za_cache)
         self._sk = bytes_to_int(sk) if sk else None
         self._pk = self._get_pk(pk)
 
@@ -472,6 +529,16 @@ class SM2:
             else:
                 return None
 
+    @staticmethod
+    def za_cache_info() -> CacheInfo:
+        """Get statistics of the entity information cache shared by all instances.
+
+        Returns:
+            CacheInfo: Named tuple of `hits`, `misses`, `maxsize` and `currsize`.
+        """
+
+        return _za_cache.info()
+
     @property
     def can_sign(self) -> bool:
         """Whether can do sign."""
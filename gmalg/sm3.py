@@ -1,12 +1,27 @@
-"""SM3 Algorithm Implementation Module."""
+"""SM3 Algorithm Implementation Module.
 
-from typing import List
+Run `python -m gmalg.sm3 [-j N] FILE ...` to print SM3 digests of files.
+"""
+
+import os
+import struct
+import sys
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Sequence, Tuple, Type, Union
 
 from .base import Hash
 from .errors import *
-from .utils import ROL32
-
-__all__ = ["SM3"]
+from .utils import ROL32, import_numpy
+
+__all__ = [
+    "SM3",
+    "file_digest",
+    "available_backends",
+    "get_backend",
+    "set_backend",
+    "get_hash_cls",
+    "hash_many",
+    "hash_equal_length",
+]
 
 _ROL_T_TABLE = [
     0x79cc4519, 0xf3988a32, 0xe7311465, 0xce6228cb, 0x9cc45197, 0x3988a32f, 0x7311465e, 0xe6228cbc,
@@ -84,6 +99,83 @@ def _compress(W1: List[int], W2: List[int], V: List[int]):
     V[7] ^= H
 
 
+_IV = [0x7380166f, 0x4914b2b9, 0x172442d7, 0xda8a0600, 0xa96f30bc, 0x163138aa, 0xe38dee4d, 0xb0fb0e4e]
+
+_unpack_block = struct.Struct(">16I").unpack_from
+
+_STATE_MAGIC = b"SM3S"
+_STATE_VERSION = 1
+_STATE_HEADER = struct.Struct(">4sB8IQ")
+
+_CHUNK_BLOCKS = 16  # blocks decoded by one struct call in `SM3.update`
+_unpack_chunk = struct.Struct(f">{_CHUNK_BLOCKS * 16}I").unpack_from
+
+
+def _compress_block(V: List[int], B: bytes, offset: int = 0):
+    """Expand and compress one message block `B[offset:offset+64]` into `V`."""
+
+    _compress_words(V, _unpack_block(B, offset))
+
+
+def _compress_words(V: List[int], words: Sequence[int], offset: int = 0):
+    """Expand and compress one message block of decoded words `words[offset:offset+16]` into `V`.
+
+    Same as `_expand` followed by `_compress`, with all helpers inlined and rounds 0-15 split from rounds 16-63.
+    """
+
+    M = 0xffffffff
+    T = _ROL_T_TABLE
+
+    W = list(words[offset:offset + 16])
+    append = W.append
+    for j in range(16, 68):
+        # P1(x) ^ ROL32(W[j-13], 7) ^ W[j-6]
+        x = (W[j - 16] ^ W[j - 9] ^ ((W[j - 3] << 15) | (W[j - 3] >> 17))) & M
+        y = W[j - 13]
+        append((x ^ (x << 15) ^ (x >> 17) ^ (x << 23) ^ (x >> 9) ^ (y << 7) ^ (y >> 25) ^ W[j - 6]) & M)
+
+    A, B, C, D, E, F, G, H = V
+
+    for j in range(16):
+        A12 = ((A << 12) | (A >> 20)) & M
+        SS1 = (A12 + E + T[j]) & M
+        SS1 = ((SS1 << 7) | (SS1 >> 25)) & M
+        TT1 = ((A ^ B ^ C) + D + (SS1 ^ A12) + (W[j] ^ W[j + 4])) & M
+        TT2 = ((E ^ F ^ G) + H + SS1 + W[j]) & M
+        D = C
+        C = ((B << 9) | (B >> 23)) & M
+        B = A
+        A = TT1
+        H = G
+        G = ((F << 19) | (F >> 13)) & M
+        F = E
+        E = (TT2 ^ (TT2 << 9) ^ (TT2 >> 23) ^ (TT2 << 17) ^ (TT2 >> 15)) & M
+
+    for j in range(16, 64):
+        A12 = ((A << 12) | (A >> 20)) & M
+        SS1 = (A12 + E + T[j]) & M
+        SS1 = ((SS1 << 7) | (SS1 >> 25)) & M
+        TT1 = (((A & B) | (A & C) | (B & C)) + D + (SS1 ^ A12) + (W[j] ^ W[j + 4])) & M
+        TT2 = ((((F ^ G) & E) ^ G) + H + SS1 + W[j]) & M
+        D = C
+        C = ((B << 9) | (B >> 23)) & M
+        B = A
+        A = TT1
+        H = G
+        G = ((F << 19) | (F >> 13)) & M
+        F = E
+        E = (TT2 ^ (TT2 << 9) ^ (TT2 >> 23) ^ (TT2 << 17) ^ (TT2 >> 15)) & M
+
+    V[0] ^= A
+    V[1] ^= B
+    V[2] ^= C
+    V[3] ^= D
+    V[4] ^= E
+    V[5] ^= F
+    V[6] ^= G
+    V[7] ^= H
+
+
 class SM3(Hash):
     """SM3 Algorithm."""
 
@@ -99,54 +191,143 @@ class SM3(Hash):
 
         return 32
 
-    def __init__(self) -> None:
-        """SM3 Algorithm."""
+    name = "sm3"
+    digest_size = 32
+    block_size = 64
+
+    def __init__(self, data: bytes = b"") -> None:
+        """SM3 Algorithm.
 
-        self._value: List[int] = [0x7380166f, 0x4914b2b9, 0x172442d7, 0xda8a0600, 0xa96f30bc, 0x163138aa, 0xe38dee4d, 0xb0fb0e4e]
+        Args:
+            data: Initial data to be updated.
+        """
+
+        self._value: List[int] = _IV.copy()
         self._msg_len: int = 0
         self._msg_block_buffer: bytearray = bytearray()
 
-        self._words_buffer1: List[int] = [0] * 68
-        self._words_buffer2: List[int] = [0] * 64
+        if data:
+            self.update(data)
+
+    def reset(self) -> None:
+        """Reset to initial state, reuse the object for a new message."""
+
+        self._value[:] = _IV
+        self._msg_len = 0
+        self._msg_block_buffer.clear()
+
+    def copy(self) -> "SM3":
+        """Get a copy of current state.
+
+        Hash a common prefix once, then fork it by copies for different suffixes.
+
+        Returns:
+            SM3: An independent copy.
+        """
+
+        other = self.__class__.__new__(self.__class__)
+        other._value = self._value.copy()
+        other._msg_len = self._msg_len
+        other._msg_block_buffer = self._msg_block_buffer.copy()
+        return other
+
+    def export_state(self) -> bytes:
+        """Export internal state, to be checkpointed and resumed later by `from_state`, maybe in another process.
+
+        Format: `b"SM3S"`, 1 byte version, 8 words of compression state, 8 bytes message length,
+            then the pending bytes of the last short block. All integers are big-endian.
+
+        Returns:
+            bytes: Serialized state, at most 108 bytes.
+        """
+
+        return _STATE_HEADER.pack(_STATE_MAGIC, _STATE_VERSION, *self._value, self._msg_len) + bytes(self._msg_block_buffer)
+
+    @classmethod
+    def from_state(cls, state: bytes) -> "SM3":
+        """Resume hashing from a state returned by `export_state`, cost does not depend on the hashed length.
+
+        Args:
+            state: Serialized state.
+
+        Returns:
+            SM3: Hash object to continue updating.
+
+        Raises:
+            InvalidArgumentError: Not a SM3 state or unsupported version.
+            IncorrectLengthError: State is truncated or has extra bytes.
+        """
+
+        state = bytes(state)
+        if len(state) < _STATE_HEADER.size:
+            raise IncorrectLengthError("SM3 state", f">= {_STATE_HEADER.size} bytes", f"{len(state)} bytes")
+
+        magic, version, *V, msg_len = _STATE_HEADER.unpack_from(state)
+        if magic != _STATE_MAGIC:
+            raise InvalidArgumentError("Not a SM3 state.")
+        if version != _STATE_VERSION:
+            raise InvalidArgumentError(f"Unsupported SM3 state version {version}.")
+        if msg_len > cls.max_msg_length():
+            raise DataOverflowError("Message", f"0x{cls.max_msg_length():x} bytes")
+
+        expected = _STATE_HEADER.size + msg_len % 64
+        if len(state) != expected:
+            raise IncorrectLengthError("SM3 state", f"{expected} bytes", f"{len(state)} bytes")
+
+        h = cls.__new__(cls)
+        h._value = V
+        h._msg_len = msg_len
+        h._msg_block_buffer = bytearray(state[_STATE_HEADER.size:])
+        return h
 
     def update(self, data: bytes) -> None:
         """Update internal state.
 
         Args:
-            data: Data stream to be updated.
+            data: Data stream to be updated, any C-contiguous buffer such as `bytes`, `bytearray`, `memoryview` or `mmap`.
 
         Raises:
             DataOverflowError: Message too long.
         """
 
-        if self._msg_len + len(data) > self.max_msg_length():
+        with memoryview(data) as view, view.cast("B") as flat:
+            self._update(flat)
+
+    def _update(self, data: memoryview) -> None:
+        d_len = len(data)
+        if self._msg_len + d_len > self.max_msg_length():
             raise DataOverflowError("Message", f"0x{self.max_msg_length():x} bytes")
 
         B = self._msg_block_buffer
-        W1 = self._words_buffer1
-        W2 = self._words_buffer2
         V = self._value
 
         b_len = len(B)
-        d_len = len(data)
-        if b_len + d_len >= 64:
-            # process last short block
-            begin = 64 - b_len
-            B.extend(data[:begin])
-            _expand(B, W1, W2)
-            _compress(W1, W2, V)
+        pos = 0
+        if b_len > 0:
+            if b_len + d_len < 64:
+                B.extend(data)
+                self._msg_len += d_len
+                return
+
+            # fill last short block
+            pos = 64 - b_len
+            B.extend(data[:pos])
+            _compress_block(V, B)
             B.clear()
 
-            pos = begin
-            while pos + 63 < d_len:
-                _expand(data[pos:pos+64], W1, W2)
-                _compress(W1, W2, V)
-                pos += 64
+        # decode words of many blocks at once, directly from the buffer
+        chunk_size = _CHUNK_BLOCKS * 64
+        while pos + chunk_size <= d_len:
+            words = _unpack_chunk(data, pos)
+            for i in range(0, _CHUNK_BLOCKS * 16, 16):
+                _compress_words(V, words, i)
+            pos += chunk_size
 
-            B.extend(data[pos:])
-        else:
-            B.extend(data)
+        while pos + 64 <= d_len:
+            _compress_block(V, data, pos)
+            pos += 64
 
+        B.extend(data[pos:])
         self._msg_len += d_len
 
     def value(self) -> bytes:
@@ -161,8 +342,6 @@ class SM3(Hash):
         """
 
         B = self._msg_block_buffer.copy()
-        W1 = self._words_buffer1
-        W2 = self._words_buffer2
         V = self._value.copy()
 
         b_len = len(B)
@@ -175,16 +354,462 @@ class SM3(Hash):
         else:
             for _ in range(b_len + 1, 64):
                 B.append(0x00)
-            _expand(B, W1, W2)
-            _compress(W1, W2, V)
+            _compress_block(V, B)
             B = bytearray(56)
 
         B.extend((self._msg_len << 3).to_bytes(8, "big"))
 
-        _expand(B, W1, W2)
-        _compress(W1, W2, V)
+        _compress_block(V, B)
 
         value = bytearray()
         for w in V:
             value.extend(w.to_bytes(4, "big"))
         return bytes(value)
+
+    def digest(self) -> bytes:
+        """Same as `value`, for compatibility with `hashlib`."""
+
+        return self.value()
+
+    def hexdigest(self) -> str:
+        """Get current hash value in hex string."""
+
+        return self.value().hex()
+
+
+class _NativeSM3(Hash):
+    """SM3 Algorithm provided by `hashlib` (OpenSSL), same interface as `SM3`."""
+
+    name = "sm3"
+    digest_size = 32
+    block_size = 64
+
+    @classmethod
+    def max_msg_length(self) -> int:
+        return SM3.max_msg_length()
+
+    @classmethod
+    def hash_length(self) -> int:
+        return 32
+
+    def __init__(self, data: bytes = b"") -> None:
+        self._h = _native_new("sm3", data)
+
+    def reset(self) -> None:
+        self._h = _native_new("sm3")
+
+    def update(self, data: bytes) -> None:
+        self._h.update(data)
+
+    def value(self) -> bytes:
+        return self._h.digest()
+
+    def copy(self) -> "_NativeSM3":
+        other = self.__class__.__new__(self.__class__)
+        other._h = self._h.copy()
+        return other
+
+    def digest(self) -> bytes:
+        return self._h.digest()
+
+    def hexdigest(self) -> str:
+        return self._h.hexdigest()
+
+
+_native_new = None  # `hashlib.new`, resolved when the native backend is probed
+
+
+def _native_available() -> bool:
+    global _native_new
+    import hashlib
+
+    try:
+        hashlib.new("sm3")
+    except ValueError:
+        return False
+    _native_new = hashlib.new
+    return True
+
+
+_BACKENDS: Dict[str, Type[Hash]] = {"python": SM3}
+_backend: Union[str, None] = None  # probing OpenSSL imports hashlib, done on first use
+
+
+def _backends() -> Dict[str, Type[Hash]]:
+    global _backend
+    if _backend is None:
+        if _native_available():
+            _BACKENDS["hashlib"] = _NativeSM3
+        _backend = "hashlib" if "hashlib" in _BACKENDS else "python"
+    return _BACKENDS
+
+
+def available_backends() -> List[str]:
+    """Get names of available SM3 backends.
+
+    `"python"` is the pure Python `SM3`, always available.
+        `"hashlib"` uses `hashlib.new("sm3")`, available if the OpenSSL linked to Python supports SM3.
+    """
+
+    return list(_backends())
+
+
+def get_backend() -> str:
+    """Get name of SM3 backend used by SM2, SM9 and `file_digest`."""
+
+    _backends()
+    return _backend
+
+
+def set_backend(name: str) -> None:
+    """Set SM3 backend used by SM2, SM9 and `file_digest`.
+
+    The default is `"hashlib"` if available, otherwise `"python"`.
+        Objects created before the switch keep their backend.
+
+    Args:
+        name: Backend name in `available_backends()`.
+
+    Raises:
+        InvalidArgumentError: Backend not available.
+    """
+
+    global _backend
+    if name not in _backends():
+        raise InvalidArgumentError(f"SM3 backend {name!r} not available.")
+    _backend = name
+
+
+def get_hash_cls() -> Type[Hash]:
+    """Get SM3 hash class of current backend, both have the same interface and outputs as `SM3`."""
+
+    return _BACKENDS[get_backend()]
+
+
+def _get_hash_cls(backend: str = None) -> Type[Hash]:
+    if backend is None:
+        return _BACKENDS[get_backend()]
+    if backend not in _backends():
+        raise InvalidArgumentError(f"SM3 backend {backend!r} not available.")
+    return _BACKENDS[backend]
+
+
+_LANES_MIN = 32  # fewer messages are faster one by one
+
+def _padding(length: int) -> bytes:
+    return b"\x80" + b"\x00" * ((55 - length) % 64) + (length << 3).to_bytes(8, "big")
+
+
+def _compress_lanes(np, V, words, T) -> None:
+    """Expand and compress one message block of every lane, `V` is `(8, N)` and `words` is `(16, N)` uint32."""
+
+    def rol(x, n):
+        return (x << n) | (x >> (32 - n))
+
+    W = list(words)
+    append = W.append
+    for j in range(16, 68):
+        x = W[j - 16] ^ W[j - 9] ^ rol(W[j - 3], 15)
+        append(x ^ rol(x, 15) ^ rol(x, 23) ^ rol(W[j - 13], 7) ^ W[j - 6])
+
+    A, B, C, D, E, F, G, H = V
+
+    for j in range(64):
+        A12 = rol(A, 12)
+        SS1 = rol(A12 + E + T[j], 7)
+        if j < 16:
+            TT1 = (A ^ B ^ C) + D + (SS1 ^ A12) + (W[j] ^ W[j + 4])
+            TT2 = (E ^ F ^ G) + H + SS1 + W[j]
+        else:
+            TT1 = ((A & B) | (A & C) | (B & C)) + D + (SS1 ^ A12) + (W[j] ^ W[j + 4])
+            TT2 = (((F ^ G) & E) ^ G) + H + SS1 + W[j]
+        D = C
+        C = rol(B, 9)
+        B = A
+        A = TT1
+        H = G
+        G = rol(F, 19)
+        F = E
+        E = TT2 ^ rol(TT2, 9) ^ rol(TT2, 17)
+
+    V ^= np.stack([A, B, C, D, E, F, G, H])
+
+
+def _hash_lanes(np, messages: Sequence[bytes], length: int) -> List[bytes]:
+    """Hash messages of the same byte length in lockstep, one NumPy lane per message."""
+
+    n = len(messages)
+    padding = _padding(length)
+    data = np.frombuffer(b"".join([m + padding for m in messages]), dtype=">u4")
+
+    # (blocks, 16, N) native words, each block is a contiguous set of word rows
+    words = np.ascontiguousarray(data.astype(np.uint32).reshape(n, -1, 16).transpose(1, 2, 0))
+
+    T = np.array(_ROL_T_TABLE, dtype=np.uint32)
+    V = np.repeat(np.array(_IV, dtype=np.uint32)[:, None], n, axis=1)
+    for block in words:
+        _compress_lanes(np, V, block, T)
+
+    out = V.T.astype(">u4").tobytes()
+    return [out[i:i + 32] for i in range(0, len(out), 32)]
+
+
+def hash_equal_length(messages: Sequence[bytes]) -> List[bytes]:
+    """Hash messages of the same length, in lockstep over NumPy arrays if installed.
+
+    Every round operates on all messages at once, suitable for many fixed-size records.
+        Without NumPy, or with only a few messages, messages are hashed one by one by `SM3`.
+
+    Args:
+        messages: Messages of the same byte length.
+
+    Returns:
+        List[bytes]: Digest of each message, same as `SM3(message).value()`.
+
+    Raises:
+        IncorrectLengthError: Messages have different lengths.
+    """
+
+    messages = [bytes(m) for m in messages]
+    if not messages:
+        return []
+
+    length = len(messages[0])
+    for m in messages:
+        if len(m) != length:
+            raise IncorrectLengthError("Message", f"{length} bytes", f"{len(m)} bytes")
+
+    np = import_numpy()
+    if np is None or len(messages) < _LANES_MIN:
+        return _hash_batch(messages, "python")
+    return _hash_lanes(np, messages, length)
+
+
+def _hash_batch(batch: List[bytes], backend: str) -> List[bytes]:
+    """Hash a batch of messages with one reused state, also runs in worker processes."""
+
+    if backend == "hashlib":
+        _backends()  # worker processes probe on their own
+        new = _native_new
+        return [new("sm3", data).digest() for data in batch]
+
+    np = import_numpy()
+    if backend == "python" and len(batch) >= _LANES_MIN and np is not None:
+        length = len(batch[0])
+        if all(len(data) == length for data in batch):
+            return _hash_lanes(np, [bytes(data) for data in batch], length)
+
+    h = _get_hash_cls(backend)()
+    reset = h.reset
+    update = h.update
+    value = h.value
+
+    digests = []
+    for data in batch:
+        reset()
+        update(data)
+        digests.append(value())
+    return digests
+
+
+def _batches(iterable: Iterable[bytes], size: int) -> Iterator[List[bytes]]:
+    import itertools
+
+    it = iter(iterable)
+    while True:
+        batch = list(itertools.islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+def hash_many(iterable: Iterable[bytes], *, workers: int = 1, chunksize: int = 1024, backend: str = None) -> Iterator[bytes]:
+    """Hash many messages, yields digests in input order.
+
+    Messages are hashed in batches of `chunksize` by one reused state.
+        With `workers > 1` batches are sent to a process pool once there is more than one batch,
+        at most `2 * workers` batches are in flight so the input is consumed lazily.
+
+    Args:
+        iterable: Messages, may be an unbounded generator.
+        workers: Number of worker processes, `1` hashes in current process.
+        chunksize: Number of messages sent to a worker at once.
+        backend: SM3 backend name, default to the one returned by `get_backend`.
+
+    Yields:
+        bytes: Digest of each message.
+
+    Raises:
+        InvalidArgumentError: Invalid chunksize or backend.
+    """
+
+    if chunksize < 1:
+        raise InvalidArgumentError("chunksize must be positive.")
+
+    backend = backend or get_backend()
+    _get_hash_cls(backend)  # check early
+
+    batches = _batches(iterable, chunksize)
+    first = next(batches, None)
+    if first is None:
+        return
+
+    if workers <= 1 or len(first) < chunksize:
+        # small input, not worth starting processes
+        yield from _hash_batch(first, backend)
+        for batch in batches:
+            yield from _hash_batch(batch, backend)
+        return
+
+    import collections
+    import concurrent.futures
+
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        pending = collections.deque([executor.submit(_hash_batch, first, backend)])
+        for batch in batches:
+            pending.append(executor.submit(_hash_batch, batch, backend))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def file_digest(file: Union[str, os.PathLike, BinaryIO], chunk_size: int = 1 << 20, *,
+                use_mmap: bool = None, backend: str = None) -> SM3:
+    """Compute SM3 of a file.
+
+    A path is mapped by `mmap` and hashed without copies,
+        a file object is read by `readinto` into a reused buffer of `chunk_size` bytes.
+
+    Args:
+        file: Path or binary file object opened for reading, file object is read from current position.
+        chunk_size: Buffer size for reading file objects.
+        use_mmap: Whether to map a path by `mmap`, default to `True` for non-empty regular files.
+        backend: SM3 backend name, default to the one returned by `get_backend`.
+
+    Returns:
+        SM3: Hash object after all data updated.
+
+    Raises:
+        InvalidArgumentError: Backend not available.
+    """
+
+    h = _get_hash_cls(backend)()
+
+    if isinstance(file, (str, bytes, os.PathLike)):
+        with open(file, "rb") as f:
+            if use_mmap is not False:
+                st = os.fstat(f.fileno())
+                if st.st_size > 0 and (use_mmap or os.path.isfile(file)):
+                    import mmap
+
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                        h.update(m)
+                    return h
+            return _update_from_fileobj(h, f, chunk_size)
+
+    return _update_from_fileobj(h, file, chunk_size)
+
+
+def _update_from_fileobj(h: SM3, f: BinaryIO, chunk_size: int) -> SM3:
+    if not hasattr(f, "readinto"):
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+        return h
+
+    buffer = bytearray(chunk_size)
+    with memoryview(buffer) as view:
+        while True:
+            size = f.readinto(buffer)
+            if not size:
+                break
+            h.update(view[:size])
+    return h
+
+
+def _hash_file(path: str, chunk_size: int, use_mmap: bool, backend: str) -> Tuple[str, int]:
+    """Hash one file for the command line tool, returns hex digest and byte size."""
+
+    if path == "-":
+        f = sys.stdin.buffer
+        counter = _CountingReader(f)
+        return file_digest(counter, chunk_size, backend=backend).hexdigest(), counter.count
+
+    return file_digest(path, chunk_size, use_mmap=use_mmap, backend=backend).hexdigest(), os.path.getsize(path)
+
+
+class _CountingReader:
+    def __init__(self, f: BinaryIO) -> None:
+        self._f = f
+        self.count = 0
+
+    def readinto(self, b) -> int:
+        size = self._f.readinto(b)
+        self.count += size or 0
+        return size
+
+
+def main(argv: List[str] = None) -> int:
+    """Command line entry of `python -m gmalg.sm3`.
+
+    Prints `<digest>  <file>` for each file in order, like `sha256sum`, and the throughput to stderr.
+
+    Returns:
+        int: Exit code, `1` if any file failed.
+    """
+
+    import argparse
+    import concurrent.futures
+    import time
+
+    parser = argparse.ArgumentParser(prog="python -m gmalg.sm3", description="Print SM3 digests of files.")
+    parser.add_argument("files", nargs="*", default=["-"], help="files to hash, '-' or none for stdin")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="number of worker processes across files, 0 for CPU count")
+    parser.add_argument("--chunk-size", type=int, default=1 << 20, help="read buffer size in bytes when not using mmap")
+    parser.add_argument("--no-mmap", action="store_true", help="read files by buffered reads instead of mmap")
+    parser.add_argument("--backend", choices=available_backends(), default=get_backend(), help="SM3 backend")
+    parser.add_argument("-q", "--quiet", action="store_true", help="do not report throughput")
+    args = parser.parse_args(argv)
+
+    use_mmap = False if args.no_mmap else None
+    jobs = args.jobs or os.cpu_count() or 1
+    if "-" in args.files:
+        jobs = 1  # stdin can not be shared with workers
+
+    def report(path: str, result: Tuple[str, int]) -> int:
+        digest, size = result
+        print(f"{digest}  {path}", flush=True)
+        return size
+
+    status = 0
+    total = 0
+    begin = time.perf_counter()
+
+    if jobs > 1 and len(args.files) > 1:
+        with concurrent.futures.ProcessPoolExecutor(min(jobs, len(args.files))) as executor:
+            futures = [executor.submit(_hash_file, path, args.chunk_size, use_mmap, args.backend) for path in args.files]
+            for path, future in zip(args.files, futures):
+                try:
+                    total += report(path, future.result())
+                except OSError as e:
+                    print(f"sm3: {path}: {e.strerror or e}", file=sys.stderr)
+                    status = 1
+    else:
+        for path in args.files:
+            try:
+                total += report(path, _hash_file(path, args.chunk_size, use_mmap, args.backend))
+            except OSError as e:
+                print(f"sm3: {path}: {e.strerror or e}", file=sys.stderr)
+                status = 1
+
+    seconds = time.perf_counter() - begin
+    if not args.quiet:
+        print(f"sm3: {total} bytes in {seconds:.3f} s, {total / max(seconds, 1e-9) / 1e6:.3f} MB/s", file=sys.stderr)
+
+    return status
+
+
+if __name__ == "__main__":
+    # use the package module so functions are picklable by worker processes
+    from gmalg.sm3 import main as _main
+    sys.exit(_main())
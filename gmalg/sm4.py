@@ -1,10 +1,13 @@
 """SM4 Algorithm Implementation Module."""
 
-from typing import List
+import functools
+import struct
+import sys
+from typing import List, Tuple, Union
 
 from .base import BlockCipher
 from .errors import *
-from .utils import ROL32
+from .utils import ROL32, import_numpy
 
 __all__ = ["SM4"]
 
@@ -42,35 +45,362 @@ def _BS(X):
             (_S_BOX[X & 0xff]))
 
 
+def _L0(B):
+    return B ^ ROL32(B, 2) ^ ROL32(B, 10) ^ ROL32(B, 18) ^ ROL32(B, 24)
+
+
+def _L1(B):
+    return B ^ ROL32(B, 13) ^ ROL32(B, 23)
+
+
 def _T0(X):
-    X = _BS(X)
-    return X ^ ROL32(X, 2) ^ ROL32(X, 10) ^ ROL32(X, 18) ^ ROL32(X, 24)
+    return _L0(_BS(X))
 
 
 def _T1(X):
-    X = _BS(X)
-    return X ^ ROL32(X, 13) ^ ROL32(X, 23)
+    return _L1(_BS(X))
+
+
+def _make_tables(L):
+    """Tables `[t0, t1, t2, t3]` with `L(BS(X)) == t0[X >> 24] ^ t1[(X >> 16) & 0xff] ^ t2[(X >> 8) & 0xff] ^ t3[X & 0xff]`.
+
+    S-box works byte by byte and L is linear, so each table folds both for one input byte.
+    """
+
+    return [[L(_S_BOX[b] << shift) for b in range(256)] for shift in (24, 16, 8, 0)]
+
+
+_T0_TABLES = _make_tables(_L0)  # S-box with L, used by rounds
+_T1_TABLES = _make_tables(_L1)  # S-box with L', used by key expansion
+
+_unpack_block = struct.Struct(">4I").unpack
+_pack_block = struct.Struct(">4I").pack
 
 
 def _key_expand(key: bytes, rkey: List[int]):
     """Key expansion."""
 
+    A, B, C, D = _T1_TABLES
+
     K0 = int.from_bytes(key[0:4], "big") ^ 0xa3b1bac6
     K1 = int.from_bytes(key[4:8], "big") ^ 0x56aa3350
     K2 = int.from_bytes(key[8:12], "big") ^ 0x677d9197
     K3 = int.from_bytes(key[12:16], "big") ^ 0xb27022dc
 
     for i in range(0, 32, 4):
-        K0 = K0 ^ _T1(K1 ^ K2 ^ K3 ^ _CK[i])
+        x = K1 ^ K2 ^ K3 ^ _CK[i]
+        K0 ^= A[x >> 24] ^ B[(x >> 16) & 0xff] ^ C[(x >> 8) & 0xff] ^ D[x & 0xff]
         rkey[i] = K0
-        K1 = K1 ^ _T1(K2 ^ K3 ^ K0 ^ _CK[i + 1])
+        x = K2 ^ K3 ^ K0 ^ _CK[i + 1]
+        K1 ^= A[x >> 24] ^ B[(x >> 16) & 0xff] ^ C[(x >> 8) & 0xff] ^ D[x & 0xff]
         rkey[i + 1] = K1
-        K2 = K2 ^ _T1(K3 ^ K0 ^ K1 ^ _CK[i + 2])
+        x = K3 ^ K0 ^ K1 ^ _CK[i + 2]
+        K2 ^= A[x >> 24] ^ B[(x >> 16) & 0xff] ^ C[(x >> 8) & 0xff] ^ D[x & 0xff]
         rkey[i + 2] = K2
-        K3 = K3 ^ _T1(K0 ^ K1 ^ K2 ^ _CK[i + 3])
+        x = K0 ^ K1 ^ K2 ^ _CK[i + 3]
+        K3 ^= A[x >> 24] ^ B[(x >> 16) & 0xff] ^ C[(x >> 8) & 0xff] ^ D[x & 0xff]
         rkey[i + 3] = K3
 
 
+def _crypt_block(block: bytes, RK: List[int]) -> bytes:
+    """Run 32 rounds with round keys `RK` in order, each round is four table lookups."""
+
+    A, B, C, D = _T0_TABLES
+
+    X0, X1, X2, X3 = _unpack_block(block)
+
+    for i in range(0, 32, 4):
+        x = X1 ^ X2 ^ X3 ^ RK[i]
+        X0 ^= A[x >> 24] ^ B[(x >> 16) & 0xff] ^ C[(x >> 8) & 0xff] ^ D[x & 0xff]
+        x = X2 ^ X3 ^ X0 ^ RK[i + 1]
+        X1 ^= A[x >> 24] ^ B[(x >> 16) & 0xff] ^ C[(x >> 8) & 0xff] ^ D[x & 0xff]
+        x = X3 ^ X0 ^ X1 ^ RK[i + 2]
+        X2 ^= A[x >> 24] ^ B[(x >> 16) & 0xff] ^ C[(x >> 8) & 0xff] ^ D[x & 0xff]
+        x = X0 ^ X1 ^ X2 ^ RK[i + 3]
+        X3 ^= A[x >> 24] ^ B[(x >> 16) & 0xff] ^ C[(x >> 8) & 0xff] ^ D[x & 0xff]
+
+    return _pack_block(X3, X2, X1, X0)
+
+
+_CHUNK_BLOCKS = 256  # blocks decoded by one struct call in `_crypt_blocks`
+_chunk_struct = struct.Struct(f">{_CHUNK_BLOCKS * 4}I")
+
+
+def _crypt_blocks(src: memoryview, out: memoryview, RK: List[int]) -> None:
+    """Run 32 rounds over every block of `src` into `out`, they may be the same buffer."""
+
+    A, B, C, D = _T0_TABLES
+    RK4 = [tuple(RK[i:i + 4]) for i in range(0, 32, 4)]
+
+    n = len(src)
+    pos = 0
+    while pos < n:
+        size = min(n - pos, _CHUNK_BLOCKS * 16)
+        chunk_struct = _chunk_struct if size == _CHUNK_BLOCKS * 16 else struct.Struct(f">{size // 4}I")
+        words = iter(chunk_struct.unpack_from(src, pos))
+
+        result = []
+        extend = result.extend
+        for X0, X1, X2, X3 in zip(words, words, words, words):
+            for K0, K1, K2, K3 in RK4:
+                x = X1 ^ X2 ^ X3 ^ K0
+                X0 ^= A[x >> 24] ^ B[(x >> 16) & 0xff] ^ C[(x >> 8) & 0xff] ^ D[x & 0xff]
+                x = X2 ^ X3 ^ X0 ^ K1
+                X1 ^= A[x >> 24] ^ B[(x >> 16) & 0xff] ^ C[(x >> 8) & 0xff] ^ D[x & 0xff]
+                x = X3 ^ X0 ^ X1 ^ K2
+                X2 ^= A[x >> 24] ^ B[(x >> 16) & 0xff] ^ C[(x >> 8) & 0xff] ^ D[x & 0xff]
+                x = X0 ^ X1 ^ X2 ^ K3
+                X3 ^= A[x >> 24] ^ B[(x >> 16) & 0xff] ^ C[(x >> 8) & 0xff] ^ D[x & 0xff]
+            extend((X3, X2, X1, X0))
+
+        chunk_struct.pack_into(out, pos, *result)
+        pos += size
+
+
+# Bitsliced engine.
+#
+# S-box is `A * inv(A * x + C) + C` in GF(2^8) mod x^8+x^7+x^6+x^5+x^4+x^2+1, inversion is done in the tower field
+# GF((2^4)^2) = GF(2^4)[y] / (y^2 + y + nu) with GF(2^4) = GF(2)[t] / (t^4 + t + 1), basis changes are folded into
+# the affine maps. Bit i of a byte is the coefficient of x^i, a linear map is a list of row masks over input bits.
+
+_SBOX_A = [0xa7, 0x4f, 0x9e, 0x3d, 0x7a, 0xf4, 0xe9, 0xd3]  # row i: input bits of output bit i
+_SBOX_C = 0xd3
+_SBOX_POLY = 0x1f5
+
+
+def _mat_apply(rows: List[int], x: int) -> int:
+    return sum((bin(r & x).count("1") & 1) << i for i, r in enumerate(rows))
+
+
+def _mat_mul(P: List[int], Q: List[int]) -> List[int]:
+    """Rows of `P * Q`."""
+
+    columns = [_mat_apply(Q, 1 << j) for j in range(8)]
+    return [sum((bin(p & c).count("1") & 1) << j for j, c in enumerate(columns)) for p in P]
+
+
+def _mat_from_columns(columns: List[int]) -> List[int]:
+    return [sum(((c >> i) & 1) << j for j, c in enumerate(columns)) for i in range(8)]
+
+
+def _gf4_mul(a: int, b: int) -> int:
+    r = 0
+    for i in range(4):
+        if (b >> i) & 1:
+            r ^= a << i
+    for i in (6, 5, 4):
+        if (r >> i) & 1:
+            r ^= 0b10011 << (i - 4)
+    return r
+
+
+def _tower_mul(a: int, b: int, nu: int) -> int:
+    ah, al, bh, bl = a >> 4, a & 0xf, b >> 4, b & 0xf
+    hh = _gf4_mul(ah, bh)
+    return ((hh ^ _gf4_mul(ah, bl) ^ _gf4_mul(al, bh)) << 4) | (_gf4_mul(hh, nu) ^ _gf4_mul(al, bl))
+
+
+def _tower_maps():
+    """Find the tower field and the affine maps around its inversion, checked against `_S_BOX`."""
+
+    # y^2 + y + nu irreducible iff no root in GF(2^4)
+    nu = next(v for v in range(1, 16) if all(_gf4_mul(y, y) ^ y != v for y in range(16)))
+
+    def power(b, e):
+        r = 1
+        for _ in range(e):
+            r = _tower_mul(r, b, nu)
+        return r
+
+    # a root of the SM4 field polynomial maps x to the tower field
+    beta = next(b for b in range(2, 256)
+                if not power(b, 8) ^ power(b, 7) ^ power(b, 6) ^ power(b, 5) ^ power(b, 4) ^ power(b, 2) ^ 1)
+    M = _mat_from_columns([power(beta, i) for i in range(8)])
+    M_inv = _mat_from_columns([next(x for x in range(256) if _mat_apply(M, x) == 1 << i) for i in range(8)])
+
+    L1 = _mat_mul(M, _SBOX_A)
+    L2 = _mat_mul(_SBOX_A, M_inv)
+    Q = _mat_from_columns([_gf4_mul(_gf4_mul(1 << i, 1 << i), nu) for i in range(4)])[:4]  # h -> h^2 * nu
+    maps = (L1, _mat_apply(M, _SBOX_C), L2, _SBOX_C, Q)
+
+    # all 256 inputs at once, bit x of slice j is bit j of x
+    ones = (1 << 256) - 1
+    slices = _bs_sbox([sum(1 << x for x in range(256) if (x >> j) & 1) for j in range(8)], maps, ones)
+    if any(sum(((slices[j] >> x) & 1) << j for j in range(8)) != _S_BOX[x] for x in range(256)):
+        raise UnknownError("Bitsliced S-box not match.")
+    return maps
+
+
+def _bs_linear(rows: List[int], v: List[int], const: int, ones: int) -> List[int]:
+    out = []
+    for i, r in enumerate(rows):
+        x = ones if (const >> i) & 1 else 0
+        j = 0
+        while r:
+            if r & 1:
+                x ^= v[j]
+            r >>= 1
+            j += 1
+        out.append(x)
+    return out
+
+
+def _bs_gf4_mul(a0, a1, a2, a3, b0, b1, b2, b3):
+    c4 = (a1 & b3) ^ (a2 & b2) ^ (a3 & b1)
+    c5 = (a2 & b3) ^ (a3 & b2)
+    c6 = a3 & b3
+    return ((a0 & b0) ^ c4,
+            (a0 & b1) ^ (a1 & b0) ^ c4 ^ c5,
+            (a0 & b2) ^ (a1 & b1) ^ (a2 & b0) ^ c5 ^ c6,
+            (a0 & b3) ^ (a1 & b2) ^ (a2 & b1) ^ (a3 & b0) ^ c6)
+
+
+def _bs_sbox(v: List[int], maps, ones: int) -> List[int]:
+    L1, c1, L2, c2, Q = maps
+    l0, l1, l2, l3, h0, h1, h2, h3 = _bs_linear(L1, v, c1, ones)
+
+    # d = h^2 * nu + h * l + l^2
+    q0, q1, q2, q3 = _bs_linear(Q, (h0, h1, h2, h3), 0, 0)
+    m0, m1, m2, m3 = _bs_gf4_mul(h0, h1, h2, h3, l0, l1, l2, l3)
+    d0 = q0 ^ m0 ^ l0 ^ l2
+    d1 = q1 ^ m1 ^ l2
+    d2 = q2 ^ m2 ^ l1 ^ l3
+    d3 = q3 ^ m3 ^ l3
+
+    # d^-1 = d^2 * d^4 * d^8
+    s0, s1, s2, s3 = d0 ^ d2, d2, d1 ^ d3, d3
+    f0, f1, f2, f3 = s0 ^ s2, s2, s1 ^ s3, s3
+    e0, e1, e2, e3 = f0 ^ f2, f2, f1 ^ f3, f3
+    i0, i1, i2, i3 = _bs_gf4_mul(*_bs_gf4_mul(s0, s1, s2, s3, f0, f1, f2, f3), e0, e1, e2, e3)
+
+    # (h * y + l)^-1 = h * d^-1 * y + (h + l) * d^-1
+    H = _bs_gf4_mul(h0, h1, h2, h3, i0, i1, i2, i3)
+    L = _bs_gf4_mul(h0 ^ l0, h1 ^ l1, h2 ^ l2, h3 ^ l3, i0, i1, i2, i3)
+    return _bs_linear(L2, L + H, c2, ones)
+
+
+_TRANSPOSE_STEPS = [(7, 0x00aa00aa00aa00aa), (14, 0x0000cccc0000cccc), (28, 0x00000000f0f0f0f0)]
+
+
+def _bs_transpose(x: int, masks: List[Tuple[int, int]]) -> int:
+    """Transpose the 8x8 bit matrix in every 64-bit lane, bit `8r+j` swaps with bit `8j+r`."""
+
+    for shift, mask in masks:
+        t = (x ^ (x >> shift)) & mask
+        x ^= t ^ (t << shift)
+    return x
+
+
+def _bitslice_batch(src: memoryview, out: memoryview, RK: List[int], maps) -> None:
+    """Run 32 rounds over all blocks of `src` at once, each slice holds one bit position of every block."""
+
+    n = len(src)
+    k = (n // 16 + 7) & ~7
+    lanes = k // 8
+    ones = (1 << k) - 1
+    masks = [(shift, int.from_bytes(mask.to_bytes(8, "little") * lanes, "little")) for shift, mask in _TRANSPOSE_STEPS]
+
+    data = bytes(src) + bytes(k * 16 - n)
+
+    # slice b of word w: bit i is bit b of word w in block i
+    X = [[0] * 32 for _ in range(4)]
+    for p in range(16):
+        T = _bs_transpose(int.from_bytes(data[p::16], "little"), masks).to_bytes(k, "little")
+        word = X[p >> 2]
+        base = 8 * (3 - (p & 3))
+        for j in range(8):
+            word[base + j] = int.from_bytes(T[j::8], "little")
+
+    sbox = _bs_sbox
+    for rk in RK:
+        X0, X1, X2, X3 = X
+        t = [X1[b] ^ X2[b] ^ X3[b] ^ (ones if (rk >> b) & 1 else 0) for b in range(32)]
+        s = sbox(t[0:8], maps, ones) + sbox(t[8:16], maps, ones) + sbox(t[16:24], maps, ones) + sbox(t[24:32], maps, ones)
+        X = [X1, X2, X3, [X0[b] ^ s[b] ^ s[b - 2] ^ s[b - 10] ^ s[b - 18] ^ s[b - 24] for b in range(32)]]
+
+    X.reverse()
+    result = bytearray(k * 16)
+    T = bytearray(k)
+    for p in range(16):
+        word = X[p >> 2]
+        base = 8 * (3 - (p & 3))
+        for j in range(8):
+            T[j::8] = word[base + j].to_bytes(lanes, "little")
+        result[p::16] = _bs_transpose(int.from_bytes(T, "little"), masks).to_bytes(k, "little")
+    out[:] = result[:n]
+
+
+_BITSLICE_MIN_BLOCKS = 256  # fewer blocks are faster by tables
+_BITSLICE_BATCH_BLOCKS = 1 << 16
+
+_bs_maps = None
+
+
+def _bitslice_crypt(src: memoryview, out: memoryview, RK: List[int]) -> None:
+    """Bitsliced `_crypt_blocks` for many blocks, in batches to bound memory."""
+
+    global _bs_maps
+    if _bs_maps is None:
+        _bs_maps = _tower_maps()
+
+    n = len(src)
+    size = _BITSLICE_BATCH_BLOCKS * 16
+    for pos in range(0, n, size):
+        end = min(pos + size, n)
+        if end - pos < _BITSLICE_MIN_BLOCKS * 16:
+            _crypt_blocks(src[pos:end], out[pos:end], RK)
+        else:
+            _bitslice_batch(src[pos:end], out[pos:end], RK, _bs_maps)
+
+
+_NUMPY_MIN_BLOCKS = 64  # fewer blocks are faster by tables
+_NUMPY_CHUNK_BLOCKS = 1 << 14
+
+# byte positions of `x >> 24`, `(x >> 16) & 0xff`, `(x >> 8) & 0xff` and `x & 0xff` in a native uint32
+_NUMPY_BYTE_ORDER = (3, 2, 1, 0) if sys.byteorder == "little" else (0, 1, 2, 3)
+
+_np_tables = None
+
+
+def _numpy_crypt_words(np, X0, X1, X2, X3, RK: List[int]):
+    """Run 32 rounds on uint32 arrays of the four words of many blocks, returns output word arrays in block order.
+
+    Inputs are updated in place.
+    """
+
+    global _np_tables
+    if _np_tables is None:
+        _np_tables = np.array(_T0_TABLES, dtype=np.uint32)
+
+    A, B, C, D = _np_tables
+    a, b, c, d = _NUMPY_BYTE_ORDER
+
+    for rk in RK:
+        x = X1 ^ X2 ^ X3
+        x ^= np.uint32(rk)
+        x = x.view(np.uint8).reshape(-1, 4)
+        y = A.take(x[:, a])
+        y ^= B.take(x[:, b])
+        y ^= C.take(x[:, c])
+        y ^= D.take(x[:, d])
+        X0 ^= y
+        X0, X1, X2, X3 = X1, X2, X3, X0
+
+    return X3, X2, X1, X0
+
+
+def _numpy_crypt(np, src: memoryview, out: memoryview, RK: List[int]) -> None:
+    """`_crypt_blocks` with NumPy, each round does table lookups for a whole chunk of blocks at once."""
+
+    n = len(src)
+    size = _NUMPY_CHUNK_BLOCKS * 16
+    for pos in range(0, n, size):
+        end = min(pos + size, n)
+        words = np.frombuffer(src, dtype=">u4", count=(end - pos) // 4, offset=pos).reshape(-1, 4)
+        X = [np.ascontiguousarray(words[:, i], dtype=np.uint32) for i in range(4)]
+        out[pos:end] = np.stack(_numpy_crypt_words(np, *X, RK), axis=1).astype(">u4").tobytes()
+
+
 class SM4(BlockCipher):
     """SM4 Algorithm."""
 
@@ -103,8 +433,7 @@ class SM4(BlockCipher):
         self._key: bytes = key
         self._rkey: List[int] = [0] * 32
         _key_expand(self._key, self._rkey)
-
-        self._block_buffer = bytearray()
+        self._rkey_dec: List[int] = self._rkey[::-1]
 
     def encrypt(self, block: bytes) -> bytes:
         """Encrypt.
@@ -123,26 +452,7 @@ class SM4(BlockCipher):
             raise IncorrectLengthError(
                 "Block", f"{self.block_length()} bytes", f"{len(block)} bytes")
 
-        RK = self._rkey
-
-        X0 = int.from_bytes(block[0:4], "big")
-        X1 = int.from_bytes(block[4:8], "big")
-        X2 = int.from_bytes(block[8:12], "big")
-        X3 = int.from_bytes(block[12:16], "big")
-
-        for i in range(0, 32, 4):
-            X0 = X0 ^ _T0(X1 ^ X2 ^ X3 ^ RK[i])
-            X1 = X1 ^ _T0(X2 ^ X3 ^ X0 ^ RK[i + 1])
-            X2 = X2 ^ _T0(X3 ^ X0 ^ X1 ^ RK[i + 2])
-            X3 = X3 ^ _T0(X0 ^ X1 ^ X2 ^ RK[i + 3])
-
-        BUFFER = self._block_buffer
-        BUFFER.clear()
-        BUFFER.extend(X3.to_bytes(4, "big"))
-        BUFFER.extend(X2.to_bytes(4, "big"))
-        BUFFER.extend(X1.to_bytes(4, "big"))
-        BUFFER.extend(X0.to_bytes(4, "big"))
-        return bytes(BUFFER)
+        return _crypt_block(block, self._rkey)
 
     def decrypt(self, block: bytes) -> bytes:
         """Decrypt.
@@ -161,23 +471,66 @@ class SM4(BlockCipher):
             raise IncorrectLengthError(
                 "Block", f"{self.block_length()} bytes", f"{len(block)} bytes")
 
-        RK = self._rkey
-
-        X0 = int.from_bytes(block[0:4], "big")
-        X1 = int.from_bytes(block[4:8], "big")
-        X2 = int.from_bytes(block[8:12], "big")
-        X3 = int.from_bytes(block[12:16], "big")
-
-        for i in range(0, 32, 4):
-            X0 = X0 ^ _T0(X1 ^ X2 ^ X3 ^ RK[31 - i])
-            X1 = X1 ^ _T0(X2 ^ X3 ^ X0 ^ RK[30 - i])
-            X2 = X2 ^ _T0(X3 ^ X0 ^ X1 ^ RK[29 - i])
-            X3 = X3 ^ _T0(X0 ^ X1 ^ X2 ^ RK[28 - i])
-
-        BUFFER = self._block_buffer
-        BUFFER.clear()
-        BUFFER.extend(X3.to_bytes(4, "big"))
-        BUFFER.extend(X2.to_bytes(4, "big"))
-        BUFFER.extend(X1.to_bytes(4, "big"))
-        BUFFER.extend(X0.to_bytes(4, "big"))
-        return bytes(BUFFER)
+        return _crypt_block(block, self._rkey_dec)
+
+    def encrypt_blocks(self, data: bytes, out: Union[bytearray, memoryview] = None) -> Union[bytes, bytearray, memoryview]:
+        """Encrypt many blocks, each block is encrypted independently (ECB).
+
+        Many blocks are encrypted at once by NumPy if installed (from 64 blocks),
+            otherwise by a bitsliced engine over big integers (from 256 blocks).
+
+        Args:
+            data: Plain blocks, any C-contiguous buffer with a multiple of 16 bytes.
+            out: Writable buffer of the same length to store the result, may be `data` itself.
+
+        Returns:
+            bytes: Cipher blocks, or `out` if given.
+
+        Raises:
+            IncorrectLengthError: Incorrect data or out length.
+        """
+
+        return self._crypt_blocks(data, out, self._rkey)
+
+    def decrypt_blocks(self, data: bytes, out: Union[bytearray, memoryview] = None) -> Union[bytes, bytearray, memoryview]:
+        """Decrypt many blocks, each block is decrypted independently (ECB).
+
+        Many blocks are decrypted at once by NumPy if installed (from 64 blocks),
+            otherwise by a bitsliced engine over big integers (from 256 blocks).
+
+        Args:
+            data: Cipher blocks, any C-contiguous buffer with a multiple of 16 bytes.
+            out: Writable buffer of the same length to store the result, may be `data` itself.
+
+        Returns:
+            bytes: Plain blocks, or `out` if given.
+
+        Raises:
+            IncorrectLengthError: Incorrect data or out length.
+        """
+
+        return self._crypt_blocks(data, out, self._rkey_dec)
+
+    def _crypt_blocks(self, data: bytes, out: Union[bytearray, memoryview], RK: List[int]) -> Union[bytes, bytearray, memoryview]:
+        with memoryview(data) as view, view.cast("B") as src:
+            if len(src) % self.block_length() != 0:
+                raise IncorrectLengthError(
+                    "Data", f"multiple of {self.block_length()} bytes", f"{len(src)} bytes")
+
+            crypt = _crypt_blocks
+            if len(src) >= _NUMPY_MIN_BLOCKS * 16 and import_numpy() is not None:
+                crypt = functools.partial(_numpy_crypt, import_numpy())
+            elif len(src) >= _BITSLICE_MIN_BLOCKS * 16:
+                crypt = _bitslice_crypt
+
+            if out is None:
+                buffer = bytearray(len(src))
+                with memoryview(buffer) as dst:
+                    crypt(src, dst, RK)
+                return bytes(buffer)
+
+            with memoryview(out) as out_view, out_view.cast("B") as dst:
+                if len(dst) != len(src):
+                    raise IncorrectLengthError("Output", f"{len(src)} bytes", f"{len(dst)} bytes")
+                crypt(src, dst, RK)
+            return out
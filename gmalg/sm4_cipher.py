@@ -1,11 +1,287 @@
+"""SM4 Block Cipher Modes Module.
+
+All modes are built on `SM4.encrypt_blocks` and `SM4.decrypt_blocks`,
+    parallelizable steps (ECB, CBC decryption, CFB decryption, CTR, GCM) process the whole message at once.
+    With NumPy installed, ECB runs on uint32 arrays and CTR also builds its counter blocks as arrays.
+
+Every mode also has `encryptor()` and `decryptor()` streaming contexts, `update(chunk)` returns the output
+    ready so far and `finalize()` the rest, memory stays bounded for messages of any length.
+"""
+
 import os
 from typing import List, Optional, Tuple
 import struct
 import hmac
-import hashlib
 
 from .errors import *
-from .sm4 import SM4
+from .sm4 import _NUMPY_CHUNK_BLOCKS, _NUMPY_MIN_BLOCKS, SM4, _numpy_crypt_words
+from .utils import import_numpy
+
+__all__ = [
+    "SM4_CBC",
+    "SM4_ECB",
+    "SM4_CFB",
+    "SM4_OFB",
+    "SM4_CTR",
+    "SM4_GCM",
+]
+
+
+def _xor(a: bytes, b: bytes) -> bytes:
+    """XOR `a` with the first `len(a)` bytes of `b`."""
+
+    n = len(a)
+    return (int.from_bytes(a, "big") ^ int.from_bytes(b[:n], "big")).to_bytes(n, "big")
+
+
+class _CipherContext:
+    """Streaming encryption or decryption of one message.
+
+    Input is buffered only as far as a step needs it (a partial block, the held back last block of padded
+    ciphertext, the IV or nonce header), so memory stays bounded whatever the message length.
+    """
+
+    def __init__(self, prefix: bytes = b"", header_length: int = 0) -> None:
+        self._prefix = prefix  # output before the first data, IV or nonce
+        self._header_length = header_length  # input before the first data, IV or nonce
+        self._buffer = b""
+        self._finalized = False
+
+    def update(self, data: bytes) -> bytes:
+        """Process a chunk of the message.
+
+        Args:
+            data: Chunk of any length.
+
+        Returns:
+            bytes: Output ready so far, not necessarily as long as the chunk.
+
+        Raises:
+            InvalidArgumentError: Context already finalized.
+        """
+
+        if self._finalized:
+            raise InvalidArgumentError("Context already finalized.")
+
+        data = self._buffer + bytes(data)
+        if self._header_length:
+            if len(data) < self._header_length:
+                self._buffer = data
+                return b""
+            self._start(data[:self._header_length])
+            data = data[self._header_length:]
+            self._header_length = 0
+
+        end = self._ready(len(data))
+        self._buffer = data[end:]
+        output = self._process(data[:end]) if end else b""
+
+        prefix, self._prefix = self._prefix, b""
+        return prefix + output
+
+    def finalize(self) -> bytes:
+        """Finish the message.
+
+        Returns:
+            bytes: Remaining output.
+
+        Raises:
+            InvalidArgumentError: Context already finalized.
+            IncorrectLengthError: Input ended inside the header or a block.
+        """
+
+        if self._finalized:
+            raise InvalidArgumentError("Context already finalized.")
+        self._finalized = True
+
+        if self._header_length:
+            raise IncorrectLengthError("Ciphertext header", f"{self._header_length} bytes", f"{len(self._buffer)} bytes")
+
+        output = self._final(self._buffer)
+        self._buffer = b""
+
+        prefix, self._prefix = self._prefix, b""
+        return prefix + output
+
+    def _start(self, header: bytes) -> None:
+        """Receive the IV or nonce read from the input."""
+
+    def _ready(self, length: int) -> int:
+        """Length of the buffered input that can be processed now."""
+
+        return length
+
+    def _process(self, data: bytes) -> bytes:
+        raise NotImplementedError
+
+    def _final(self, data: bytes) -> bytes:
+        return self._process(data)
+
+
+class _BlockContext(_CipherContext):
+    """Context of a padded block mode, `_process` gets whole blocks only.
+
+    Encryption pads the last partial block, decryption holds back the last block until `finalize` to unpad it.
+    """
+
+    def __init__(self, pad=None, unpad=None, prefix: bytes = b"", header_length: int = 0) -> None:
+        super().__init__(prefix, header_length)
+        self._pad = pad
+        self._unpad = unpad
+
+    def _ready(self, length: int) -> int:
+        end = length & ~15
+        if self._unpad is not None and end and end == length:
+            end -= 16
+        return end
+
+    def _final(self, data: bytes) -> bytes:
+        if self._unpad is None:
+            return self._process(self._pad(data))
+
+        if len(data) != 16:
+            raise IncorrectLengthError("Ciphertext", "multiple of 16 bytes", f"{len(data)} bytes left")
+        return self._unpad(self._process(data))
+
+
+class _StreamContext(_CipherContext):
+    """Context of a keystream mode, output is ready as soon as input arrives.
+
+    `_keystream(count)` returns the next `count` keystream blocks, unused keystream is kept for the next chunk.
+    """
+
+    def __init__(self, prefix: bytes = b"", header_length: int = 0) -> None:
+        super().__init__(prefix, header_length)
+        self._unused = b""
+
+    def _keystream(self, count: int) -> bytes:
+        raise NotImplementedError
+
+    def _process(self, data: bytes) -> bytes:
+        keystream = self._unused
+        need = len(data) - len(keystream)
+        if need > 0:
+            keystream += self._keystream((need + 15) // 16)
+        self._unused = keystream[len(data):]
+        return _xor(data, keystream)
+
+
+class _ECBContext(_BlockContext):
+    def __init__(self, cipher: "SM4_ECB", encrypting: bool) -> None:
+        if encrypting:
+            super().__init__(pad=cipher._pad)
+            self._crypt = cipher.encrypt_blocks
+        else:
+            super().__init__(unpad=cipher._unpad)
+            self._crypt = cipher.decrypt_blocks
+
+    def _process(self, data: bytes) -> bytes:
+        return self._crypt(data)
+
+
+class _CBCEncryptor(_BlockContext):
+    def __init__(self, cipher: "SM4_CBC") -> None:
+        super().__init__(pad=cipher._pad)
+        self._encrypt_blocks = cipher.encrypt_blocks
+        self._previous_cipher_block = cipher._iv
+
+    def _process(self, data: bytes) -> bytes:
+        encrypt_blocks = self._encrypt_blocks
+        previous = self._previous_cipher_block
+
+        # Each block depends on the previous cipher block, encrypt one by one
+        output = bytearray(len(data))
+        for i in range(0, len(data), 16):
+            previous = encrypt_blocks(_xor(data[i:i + 16], previous))
+            output[i:i + 16] = previous
+
+        self._previous_cipher_block = previous
+        return bytes(output)
+
+
+class _CBCDecryptor(_BlockContext):
+    def __init__(self, cipher: "SM4_CBC") -> None:
+        super().__init__(unpad=cipher._unpad)
+        self._decrypt_blocks = cipher.decrypt_blocks
+        self._previous_cipher_block = cipher._iv
+
+    def _process(self, data: bytes) -> bytes:
+        # All blocks are decrypted at once, then XOR with the previous cipher blocks
+        output = _xor(self._decrypt_blocks(data), self._previous_cipher_block + data[:-16])
+        self._previous_cipher_block = data[-16:]
+        return output
+
+
+class _CFBEncryptor(_BlockContext):
+    def __init__(self, cipher: "SM4_CFB") -> None:
+        super().__init__(pad=cipher.pad, prefix=cipher.iv)
+        self._encrypt_blocks = cipher.encrypt_blocks
+        self._feedback = cipher.iv
+
+    def _process(self, data: bytes) -> bytes:
+        encrypt_blocks = self._encrypt_blocks
+        feedback = self._feedback
+
+        # Each keystream block is the encryption of the previous cipher block
+        output = bytearray(len(data))
+        for i in range(0, len(data), 16):
+            feedback = _xor(data[i:i + 16], encrypt_blocks(feedback))
+            output[i:i + 16] = feedback
+
+        self._feedback = feedback
+        return bytes(output)
+
+
+class _CFBDecryptor(_BlockContext):
+    def __init__(self, cipher: "SM4_CFB") -> None:
+        super().__init__(unpad=cipher.unpad, header_length=16)
+        self._encrypt_blocks = cipher.encrypt_blocks
+
+    def _start(self, header: bytes) -> None:
+        self._feedback = header
+
+    def _process(self, data: bytes) -> bytes:
+        # Feedback blocks are all known, generate the keystream of the chunk at once
+        output = _xor(data, self._encrypt_blocks(self._feedback + data[:-16]))
+        self._feedback = data[-16:]
+        return output
+
+
+class _OFBContext(_StreamContext):
+    def __init__(self, cipher: "SM4_OFB", encrypting: bool) -> None:
+        if encrypting:
+            super().__init__(prefix=cipher.iv)
+            self._start(cipher.iv)
+        else:
+            super().__init__(header_length=16)
+        self._cipher = cipher
+
+    def _start(self, header: bytes) -> None:
+        self._state = header
+
+    def _keystream(self, count: int) -> bytes:
+        keystream = self._cipher._keystream(self._state, count * 16)
+        self._state = keystream[-16:]
+        return keystream
+
+
+class _CTRContext(_StreamContext):
+    def __init__(self, cipher: "SM4_CTR", encrypting: bool) -> None:
+        if encrypting:
+            super().__init__(prefix=cipher.nonce)
+            self._start(cipher.nonce)
+        else:
+            super().__init__(header_length=8)
+        self._cipher = cipher
+        self._blocks = 0
+
+    def _start(self, header: bytes) -> None:
+        self._nonce = header
+
+    def _keystream(self, count: int) -> bytes:
+        keystream = self._cipher._keystream(self._nonce, count * 16, self._blocks)
+        self._blocks += count
+        return keystream
 
 
 class SM4_CBC(SM4):
@@ -32,37 +308,36 @@ class SM4_CBC(SM4):
                     "IV", f"{self.block_length()} bytes", f"{len(iv)} bytes")
             self._iv = iv
 
-        self._previous_cipher_block = self._iv
+    def encryptor(self) -> _CipherContext:
+        """Streaming encryption, joined outputs equal `encrypt` of the whole message.
 
-    def encrypt(self, data: bytes) -> bytes:
-        """Encrypt data using SM4 CBC mode.
+        Returns:
+            Context with `update(chunk) -> bytes` and `finalize() -> bytes`.
+        """
+        return _CBCEncryptor(self)
 
-        Args:
-            data: Data to encrypt. Must be a multiple of the block size.
+    def decryptor(self) -> _CipherContext:
+        """Streaming decryption, joined outputs equal `decrypt` of the whole message.
 
         Returns:
-            bytes: Encrypted data.
+            Context with `update(chunk) -> bytes` and `finalize() -> bytes`.
         """
-        # Pad the data to make it a multiple of the block size (16 bytes)
-        data = self._pad(data)
+        return _CBCDecryptor(self)
 
-        cipher_text = bytearray()
-        # Process each 16-byte block
-        for i in range(0, len(data), self.block_length()):
-            block = data[i:i + self.block_length()]
-            # XOR with the previous cipher block (for CBC mode)
-            block = bytes(a ^ b for a, b in zip(
-                block, self._previous_cipher_block))
-            encrypted_block = super().encrypt(block)
-            cipher_text.extend(encrypted_block)
+    def encrypt(self, data: bytes) -> bytes:
+        """Encrypt data using SM4 CBC mode, every call starts from the IV.
 
-            # Update the previous cipher block to the current encrypted block
-            self._previous_cipher_block = encrypted_block
+        Args:
+            data: Data to encrypt, padded to a multiple of the block size.
 
-        return bytes(cipher_text)
+        Returns:
+            bytes: Encrypted data.
+        """
+        context = self.encryptor()
+        return context.update(data) + context.finalize()
 
     def decrypt(self, data: bytes) -> bytes:
-        """Decrypt data using SM4 CBC mode.
+        """Decrypt data using SM4 CBC mode, every call starts from the IV.
 
         Args:
             data: Encrypted data to decrypt. Must be a multiple of the block size.
@@ -70,22 +345,8 @@ class SM4_CBC(SM4):
         Returns:
             bytes: Decrypted data.
         """
-        # Decrypt in blocks and remove padding
-        decrypted_data = bytearray()
-        for i in range(0, len(data), self.block_length()):
-            block = data[i:i + self.block_length()]
-            decrypted_block = super().decrypt(block)
-
-            # XOR with the previous cipher block to get the original plaintext
-            decrypted_block = bytes(a ^ b for a, b in zip(
-                decrypted_block, self._previous_cipher_block))
-            decrypted_data.extend(decrypted_block)
-
-            # Update the previous cipher block to the current encrypted block
-            self._previous_cipher_block = block
-
-        # Remove padding
-        return self._unpad(decrypted_data)
+        context = self.decryptor()
+        return context.update(data) + context.finalize()
 
     def _pad(self, data: bytes) -> bytes:
         """Pad data to a multiple of the block size (16 bytes)."""
@@ -113,26 +374,33 @@ class SM4_ECB(SM4):
         """
         super().__init__(key)
 
+    def encryptor(self) -> _CipherContext:
+        """Streaming encryption, joined outputs equal `encrypt` of the whole message.
+
+        Returns:
+            Context with `update(chunk) -> bytes` and `finalize() -> bytes`.
+        """
+        return _ECBContext(self, True)
+
+    def decryptor(self) -> _CipherContext:
+        """Streaming decryption, joined outputs equal `decrypt` of the whole message.
+
+        Returns:
+            Context with `update(chunk) -> bytes` and `finalize() -> bytes`.
+        """
+        return _ECBContext(self, False)
+
     def encrypt(self, data: bytes) -> bytes:
         """Encrypt data using SM4 ECB mode.
 
         Args:
-            data: Data to encrypt. Must be a multiple of the block size.
+            data: Data to encrypt, padded to a multiple of the block size.
 
         Returns:
             bytes: Encrypted data.
         """
-        # Pad the data to make it a multiple of the block size (16 bytes)
-        data = self._pad(data)
-
-        cipher_text = bytearray()
-        # Process each 16-byte block
-        for i in range(0, len(data), self.block_length()):
-            block = data[i:i + self.block_length()]
-            encrypted_block = super().encrypt(block)
-            cipher_text.extend(encrypted_block)
-
-        return bytes(cipher_text)
+        context = self.encryptor()
+        return context.update(data) + context.finalize()
 
     def decrypt(self, data: bytes) -> bytes:
         """Decrypt data using SM4 ECB mode.
@@ -143,15 +411,8 @@ class SM4_ECB(SM4):
         Returns:
             bytes: Decrypted data.
         """
-        # Decrypt in blocks
-        decrypted_data = bytearray()
-        for i in range(0, len(data), self.block_length()):
-            block = data[i:i + self.block_length()]
-            decrypted_block = super().decrypt(block)
-            decrypted_data.extend(decrypted_block)
-
-        # Remove padding
-        return self._unpad(decrypted_data)
+        context = self.decryptor()
+        return context.update(data) + context.finalize()
 
     def _pad(self, data: bytes) -> bytes:
         """Pad data to a multiple of the block size (16 bytes)."""
@@ -199,23 +460,28 @@ class SM4_CFB(SM4):
             raise ValueError("Invalid padding detected.")
         return data[:-padding_length]
 
+    def encryptor(self) -> _CipherContext:
+        """
+        Streaming encryption, joined outputs equal `encrypt` of the whole message.
+        :return: Context with `update(chunk) -> bytes` and `finalize() -> bytes`.
+        """
+        return _CFBEncryptor(self)
+
+    def decryptor(self) -> _CipherContext:
+        """
+        Streaming decryption, joined outputs equal `decrypt` of the whole message.
+        :return: Context with `update(chunk) -> bytes` and `finalize() -> bytes`.
+        """
+        return _CFBDecryptor(self)
+
     def encrypt(self, plaintext: bytes) -> bytes:
         """
         Encrypt using CFB mode.
         :param plaintext: Data to encrypt.
         :return: IV + encrypted data.
         """
-        plaintext = self.pad(plaintext)  # Ensure the length is a multiple of 16 bytes.
-        ciphertext = b""
-        iv = self.iv  # Initial IV
-
-        for i in range(0, len(plaintext), 16):
-            iv_encrypted = self.encrypt_block(iv)  # Encrypt IV to generate keystream.
-            encrypted_block = bytes(a ^ b for a, b in zip(iv_encrypted, plaintext[i:i+16]))
-            ciphertext += encrypted_block
-            iv = encrypted_block  # Use current ciphertext block as IV for next iteration.
-
-        return self.iv + ciphertext  # Prepend IV to ciphertext for proper decryption.
+        context = self.encryptor()
+        return context.update(plaintext) + context.finalize()
 
     def decrypt(self, ciphertext: bytes) -> bytes:
         """
@@ -226,16 +492,8 @@ class SM4_CFB(SM4):
         if len(ciphertext) < 16:
             raise ValueError("Ciphertext must be at least 16 bytes long.")
 
-        iv, ciphertext = ciphertext[:16], ciphertext[16:]  # Extract IV.
-        plaintext = b""
-
-        for i in range(0, len(ciphertext), 16):
-            iv_encrypted = self.encrypt_block(iv)  # Encrypt IV to generate keystream.
-            decrypted_block = bytes(a ^ b for a, b in zip(iv_encrypted, ciphertext[i:i+16]))
-            plaintext += decrypted_block
-            iv = ciphertext[i:i+16]  # Use current ciphertext block as IV for next iteration.
-
-        return self.unpad(plaintext)  # Remove padding before returning.
+        context = self.decryptor()
+        return context.update(ciphertext) + context.finalize()
 
     def encrypt_hex(self, plaintext: str) -> str:
         """
@@ -258,7 +516,7 @@ class SM4_CFB(SM4):
 
     def display_info(self):
         """Print the current key and IV in hex format."""
-        print(f"Key: {self.key.hex()}")
+        print(f"Key: {self._key.hex()}")
         print(f"IV:  {self.iv.hex()}")
 
 class SM4_OFB(SM4):
@@ -275,21 +533,42 @@ class SM4_OFB(SM4):
             raise ValueError("IV must be exactly 16 bytes long.")
         self.iv = iv or os.urandom(16)  # Ensure IV exists.
 
+    def _keystream(self, iv: bytes, length: int) -> bytes:
+        """
+        Generate keystream, each block is the encryption of the previous one.
+        :param iv: Initial keystream input.
+        :param length: Keystream byte length.
+        :return: Keystream, rounded up to whole blocks.
+        """
+        blocks = []
+        keystream = iv
+        for _ in range((length + 15) // 16):
+            keystream = self.encrypt_blocks(keystream)  # Encrypt the previous keystream.
+            blocks.append(keystream)
+        return b"".join(blocks)
+
+    def encryptor(self) -> _CipherContext:
+        """
+        Streaming encryption, joined outputs equal `encrypt` of the whole message.
+        :return: Context with `update(chunk) -> bytes` and `finalize() -> bytes`.
+        """
+        return _OFBContext(self, True)
+
+    def decryptor(self) -> _CipherContext:
+        """
+        Streaming decryption, joined outputs equal `decrypt` of the whole message.
+        :return: Context with `update(chunk) -> bytes` and `finalize() -> bytes`.
+        """
+        return _OFBContext(self, False)
+
     def encrypt(self, plaintext: bytes) -> bytes:
         """
         Encrypt using OFB mode.
         :param plaintext: Data to encrypt.
         :return: IV + encrypted data.
         """
-        ciphertext = b""
-        keystream = self.iv  # Initial keystream (IV)
-
-        for i in range(0, len(plaintext), 16):
-            keystream = self.encrypt_block(keystream)  # Encrypt the previous keystream.
-            block = bytes(a ^ b for a, b in zip(keystream, plaintext[i:i+16]))
-            ciphertext += block
-
-        return self.iv + ciphertext  # Prepend IV to ciphertext for decryption.
+        context = self.encryptor()
+        return context.update(plaintext) + context.finalize()
 
     def decrypt(self, ciphertext: bytes) -> bytes:
         """
@@ -300,16 +579,8 @@ class SM4_OFB(SM4):
         if len(ciphertext) < 16:
             raise ValueError("Ciphertext must be at least 16 bytes long.")
 
-        iv, ciphertext = ciphertext[:16], ciphertext[16:]  # Extract IV.
-        plaintext = b""
-        keystream = iv  # Initial keystream (IV)
-
-        for i in range(0, len(ciphertext), 16):
-            keystream = self.encrypt_block(keystream)  # Encrypt the previous keystream.
-            block = bytes(a ^ b for a, b in zip(keystream, ciphertext[i:i+16]))
-            plaintext += block
-
-        return plaintext  # OFB does not require padding/unpadding.
+        context = self.decryptor()
+        return context.update(ciphertext) + context.finalize()  # OFB does not require padding/unpadding.
 
     def encrypt_hex(self, plaintext: str) -> str:
         """
@@ -332,7 +603,7 @@ class SM4_OFB(SM4):
 
     def display_info(self):
         """Print the current key and IV in hex format."""
-        print(f"Key: {self.key.hex()}")
+        print(f"Key: {self._key.hex()}")
         print(f"IV:  {self.iv.hex()}")
 
 class SM4_CTR(SM4):
@@ -351,15 +622,62 @@ class SM4_CTR(SM4):
         self.nonce = nonce or os.urandom(8)  # Generate a random nonce if not provided.
         self.counter = counter  # Initial counter value.
 
-    def _generate_keystream(self, block_index: int) -> bytes:
+    def _keystream(self, nonce: bytes, length: int, start: int = 0) -> bytes:
         """
-        Generate a keystream block by encrypting the nonce + counter.
-        :param block_index: Block index for counter increment.
-        :return: 16-byte keystream block.
+        Generate keystream by encrypting all nonce + counter blocks at once.
+        :param nonce: 8-byte nonce.
+        :param length: Keystream byte length.
+        :param start: Block offset from the initial counter.
+        :return: Keystream, rounded up to whole blocks.
         """
-        counter_bytes = struct.pack(">Q", self.counter + block_index)  # Convert counter to 8 bytes (big-endian)
-        nonce_counter = self.nonce + counter_bytes  # 8-byte nonce + 8-byte counter
-        return self.encrypt_block(nonce_counter)  # Encrypt to generate keystream
+        count = (length + 15) // 16
+        counter = self.counter + start
+        if counter + count > 1 << 64:
+            raise DataOverflowError("CTR counter", "2^64 blocks")
+
+        np = import_numpy()
+        if np is not None and count >= _NUMPY_MIN_BLOCKS:
+            return self._numpy_keystream(np, nonce, counter, count)
+
+        pack = struct.Struct(">Q").pack  # Convert counter to 8 bytes (big-endian)
+        counters = b"".join(nonce + pack(counter + i) for i in range(count))
+        return self.encrypt_blocks(counters)
+
+    def _numpy_keystream(self, np, nonce: bytes, counter: int, count: int) -> bytes:
+        """
+        Generate keystream with NumPy, counter blocks are built as word arrays without bytes.
+        :param nonce: 8-byte nonce.
+        :param counter: First counter value.
+        :param count: Number of keystream blocks.
+        :return: Keystream.
+        """
+        n0, n1 = struct.unpack(">2I", nonce)
+        chunks = []
+        for begin in range(0, count, _NUMPY_CHUNK_BLOCKS):
+            size = min(_NUMPY_CHUNK_BLOCKS, count - begin)
+            counters = np.arange(size, dtype=np.uint64) + np.uint64(counter + begin)
+            words = _numpy_crypt_words(np,
+                                       np.full(size, n0, dtype=np.uint32),
+                                       np.full(size, n1, dtype=np.uint32),
+                                       (counters >> np.uint64(32)).astype(np.uint32),
+                                       (counters & np.uint64(0xffffffff)).astype(np.uint32),
+                                       self._rkey)
+            chunks.append(np.stack(words, axis=1).astype(">u4").tobytes())
+        return b"".join(chunks)
+
+    def encryptor(self) -> _CipherContext:
+        """
+        Streaming encryption, joined outputs equal `encrypt` of the whole message.
+        :return: Context with `update(chunk) -> bytes` and `finalize() -> bytes`.
+        """
+        return _CTRContext(self, True)
+
+    def decryptor(self) -> _CipherContext:
+        """
+        Streaming decryption, joined outputs equal `decrypt` of the whole message.
+        :return: Context with `update(chunk) -> bytes` and `finalize() -> bytes`.
+        """
+        return _CTRContext(self, False)
 
     def encrypt(self, plaintext: bytes) -> bytes:
         """
@@ -367,13 +685,8 @@ class SM4_CTR(SM4):
         :param plaintext: Data to encrypt.
         :return: Nonce + encrypted data.
         """
-        ciphertext = b""
-        for i in range(0, len(plaintext), 16):
-            keystream = self._generate_keystream(i // 16)  # Generate keystream block
-            block = bytes(a ^ b for a, b in zip(keystream, plaintext[i:i+16]))  # XOR with plaintext
-            ciphertext += block
-
-        return self.nonce + ciphertext  # Prepend nonce to ciphertext for decryption
+        context = self.encryptor()
+        return context.update(plaintext) + context.finalize()
 
     def decrypt(self, ciphertext: bytes) -> bytes:
         """
@@ -384,15 +697,8 @@ class SM4_CTR(SM4):
         if len(ciphertext) < 8:
             raise ValueError("Ciphertext must be at least 8 bytes long.")
 
-        nonce, ciphertext = ciphertext[:8], ciphertext[8:]  # Extract nonce.
-        plaintext = b""
-
-        for i in range(0, len(ciphertext), 16):
-            keystream = self._generate_keystream(i // 16)  # Generate keystream block
-            block = bytes(a ^ b for a, b in zip(keystream, ciphertext[i:i+16]))  # XOR with ciphertext
-            plaintext += block
-
-        return plaintext  # No need for padding/unpadding in CTR mode.
+        context = self.decryptor()
+        return context.update(ciphertext) + context.finalize()  # No need for padding/unpadding in CTR mode.
 
     def encrypt_hex(self, plaintext: str) -> str:
         """
@@ -415,90 +721,308 @@ class SM4_CTR(SM4):
 
     def display_info(self):
         """Print the current key, nonce, and counter in hex format."""
-        print(f"Key:    {self.key.hex()}")
+        print(f"Key:    {self._key.hex()}")
         print(f"Nonce:  {self.nonce.hex()}")
         print(f"Counter: {self.counter}")
         
         
+# GF(2^128) elements are 128-bit integers of the big-endian block, the most significant bit is the coefficient of x^0.
+_GCM_R = 0xe1 << 120
+
+
+def _gf128_mulx(v: int) -> int:
+    return (v >> 1) ^ _GCM_R if v & 1 else v >> 1
+
+
+def _gf128_shift8_table() -> List[int]:
+    """Reduction of the low byte shifted out by a multiplication with x^8."""
+
+    table = []
+    for b in range(256):
+        v = b
+        for _ in range(8):
+            v = _gf128_mulx(v)
+        table.append(v)
+    return table
+
+
+_GCM_R8 = _gf128_shift8_table()
+
+
+def _ghash_table(H: int) -> List[int]:
+    """Shoup 8-bit table of `H`, entry `b` is `H` times the byte `b` placed at x^0..x^7."""
+
+    table = [0] * 256
+    v = H
+    for bit in (0x80, 0x40, 0x20, 0x10, 0x08, 0x04, 0x02, 0x01):
+        table[bit] = v
+        v = _gf128_mulx(v)
+    for b in range(256):
+        low = b & -b
+        if b != low:
+            table[b] = table[low] ^ table[b ^ low]
+    return table
+
+
+class _GHASH:
+    """GHASH over the key table, data can be updated in pieces of any length."""
+
+    def __init__(self, table: List[int]) -> None:
+        self._table = table
+        self._y = 0
+        self._buffer = b""
+
+    def update(self, data: bytes) -> None:
+        data = self._buffer + bytes(data)
+        end = len(data) & ~15
+
+        M = self._table
+        R = _GCM_R8
+        y = self._y
+        for i in range(0, end, 16):
+            x = (y ^ int.from_bytes(data[i:i + 16], "big")).to_bytes(16, "big")
+            # Horner over bytes from x^120..x^127 to x^0..x^7, each step multiplies by x^8
+            z = M[x[15]]
+            for b in x[14::-1]:
+                z = (z >> 8) ^ R[z & 0xff] ^ M[b]
+            y = z
+        self._y = y
+        self._buffer = data[end:]
+
+    def pad(self) -> None:
+        """Zero pad the last partial block, ends a section of AAD or ciphertext."""
+
+        if self._buffer:
+            self.update(bytes(16 - len(self._buffer)))
+
+    def value(self) -> int:
+        return self._y
+
+
+class _GCMContext(_StreamContext):
+    def __init__(self, cipher: "SM4_GCM", aad: bytes, tag: Optional[bytes], iv: bytes = b"", iv_length: int = 0) -> None:
+        self._cipher = cipher
+        self._tag = tag  # expected tag when decrypting
+        self._encrypting = tag is None
+        if self._encrypting:
+            super().__init__(prefix=iv)
+            self._start(iv)
+        else:
+            super().__init__(header_length=iv_length)
+
+        self._ghash = _GHASH(cipher._ghash_table)
+        self._ghash.update(aad)
+        self._aad_length = len(aad)
+        self._aad_open = True
+        self._length = 0
+        self._blocks = 0
+
+    def update_aad(self, aad: bytes) -> None:
+        """
+        追加附加认证数据, 必须在第一次 update 之前调用
+        :param aad: 附加认证数据片段
+        """
+        if self._finalized:
+            raise InvalidArgumentError("Context already finalized.")
+        if not self._aad_open:
+            raise InvalidArgumentError("AAD must be given before data.")
+
+        self._ghash.update(aad)
+        self._aad_length += len(aad)
+
+    def _close_aad(self) -> None:
+        if self._aad_open:
+            self._ghash.pad()
+            self._aad_open = False
+
+    def update(self, data: bytes) -> bytes:
+        if not self._finalized:
+            self._close_aad()
+        return super().update(data)
+
+    def finalize(self) -> bytes:
+        if not self._finalized:
+            self._close_aad()
+        return super().finalize()
+
+    @property
+    def tag(self) -> Optional[bytes]:
+        """认证标签, 加密时在 finalize 之后可用"""
+        return self._tag
+
+    def _start(self, header: bytes) -> None:
+        self._j0 = self._cipher._j0(header)
+
+    def _keystream(self, count: int) -> bytes:
+        keystream = self._cipher._keystream(self._j0, count * 16, self._blocks)
+        self._blocks += count
+        return keystream
+
+    def _process(self, data: bytes) -> bytes:
+        output = super()._process(data)
+        self._ghash.update(output if self._encrypting else data)  # GHASH runs over the ciphertext
+        self._length += len(data)
+        return output
+
+    def _final(self, data: bytes) -> bytes:
+        self._ghash.pad()
+        self._ghash.update(struct.pack(">QQ", self._aad_length * 8, self._length * 8))
+        tag = _xor(self._cipher.encrypt_blocks(self._j0), self._ghash.value().to_bytes(16, "big"))
+
+        if self._encrypting:
+            self._tag = tag
+        elif not hmac.compare_digest(tag, self._tag):
+            raise CheckFailedError("GCM authentication failed.")
+        return b""
+
+
 class SM4_GCM(SM4):
-    """SM4 GCM（Galois/Counter Mode）"""
+    """SM4 GCM（Galois/Counter Mode）, 与 RFC 8998 / NIST SP 800-38D 兼容"""
 
     def __init__(self, key: bytes, iv: Optional[bytes] = None):
         """
         初始化 GCM 模式
         :param key: 16 字节加密密钥
-        :param iv: 12 字节初始化向量（默认生成随机 IV）
+        :param iv: 第一条消息的初始化向量, 任意非零长度, 推荐 12 字节（默认生成随机 IV）, 之后的消息各自使用新的 IV
         """
         super().__init__(key)
-        if iv and len(iv) != 12:
-            raise ValueError("IV 必须为 12 字节长")
+        if iv is not None and len(iv) == 0:
+            raise ValueError("IV 不能为空")
         self.iv = iv or os.urandom(12)  # 生成随机 IV
+        self._iv_fixed = iv is not None
+        self._iv_used = False
+
+        # 哈希子密钥 H = E(K, 0^128) 的乘法表只计算一次, 同一密钥的每条消息只需查表
+        self._ghash_table = _ghash_table(int.from_bytes(self.encrypt_blocks(bytes(16)), "big"))
 
-    def _generate_keystream(self, counter: int) -> bytes:
+    def _j0(self, iv: bytes) -> bytes:
         """
-        生成密钥流块
-        :param counter: 计数器值
-        :return: 16 字节密钥流
+        计算初始计数器块 J0
+        :param iv: IV
+        :return: 16 字节 J0
         """
-        counter_bytes = struct.pack(">I", counter)  # 4 字节计数器
-        nonce_counter = self.iv + counter_bytes  # 12 字节 IV + 4 字节计数器
-        return self.encrypt_block(nonce_counter)  # 生成密钥流
+        if len(iv) == 12:
+            return iv + b"\x00\x00\x00\x01"
 
-    def _compute_gmac(self, aad: bytes, ciphertext: bytes) -> bytes:
+        g = _GHASH(self._ghash_table)
+        g.update(iv)
+        g.pad()
+        g.update(struct.pack(">QQ", 0, len(iv) * 8))
+        return g.value().to_bytes(16, "big")
+
+    def _keystream(self, j0: bytes, length: int, start: int = 0) -> bytes:
+        """
+        一次生成全部密钥流, 计数器块从 inc32(J0) 开始
+        :param j0: 16 字节 J0
+        :param length: 密钥流字节长度
+        :param start: 从 inc32(J0) 起跳过的块数
+        :return: 密钥流, 按块向上取整
+        """
+        prefix = j0[:12]
+        counter = int.from_bytes(j0[12:], "big") + start
+        pack = struct.Struct(">I").pack  # 4 字节计数器, 模 2^32 递增
+        counters = b"".join(prefix + pack((counter + i) & 0xffffffff) for i in range(1, (length + 15) // 16 + 1))
+        return self.encrypt_blocks(counters)  # 生成密钥流
+
+    def _compute_gmac(self, j0: bytes, aad: bytes, ciphertext: bytes) -> bytes:
         """
-        计算 GMAC（Galois Message Authentication Code）
+        计算认证标签 E(K, J0) xor GHASH(H, A, C)
+        :param j0: 16 字节 J0
         :param aad: 附加认证数据
         :param ciphertext: 加密后的数据
-        :return: 16 字节 GMAC 认证码
+        :return: 16 字节认证标签
+        """
+        g = _GHASH(self._ghash_table)
+        g.update(aad)
+        g.pad()
+        g.update(ciphertext)
+        g.pad()
+        g.update(struct.pack(">QQ", len(aad) * 8, len(ciphertext) * 8))
+        return _xor(self.encrypt_blocks(j0), g.value().to_bytes(16, "big"))
+
+    def _message_iv(self, iv: Optional[bytes]) -> bytes:
+        """
+        选取一条消息的 IV, 同一密钥下 IV 重复会泄露 H 并允许伪造标签
+        未指定时每条消息生成新的随机 IV, 构造时指定的 IV 只能用于第一条消息
+        :param iv: 调用方指定的 IV, 由调用方保证不重复
+        :return: IV
         """
-        hmac_key = self.encrypt_block(b"\x00" * 16)  # 生成 GMAC 密钥
-        gmac = hmac.new(hmac_key, aad + ciphertext, hashlib.sha256).digest()[:16]
-        return gmac
+        if iv is not None:
+            if len(iv) == 0:
+                raise ValueError("IV 不能为空")
+        elif not self._iv_used:
+            iv = self.iv
+        elif self._iv_fixed:
+            raise InvalidArgumentError("IV given at construction was already used, pass a new iv.")
+        else:
+            iv = os.urandom(12)
+
+        self._iv_used = True
+        return bytes(iv)
 
-    def encrypt(self, plaintext: bytes, aad: bytes = b"") -> Tuple[bytes, bytes]:
+    def encryptor(self, aad: bytes = b"", iv: Optional[bytes] = None) -> _CipherContext:
         """
-        GCM 加密
-        :param plaintext: 需要加密的数据
+        流式加密, 各输出拼接后与 encrypt 的密文相同, finalize 之后由 tag 属性取得认证标签
+        附加认证数据可以再由上下文的 update_aad 分段追加
         :param aad: 附加认证数据（默认无）
-        :return: (密文, GMAC 认证码)
+        :param iv: 本条消息的 IV（默认生成新的随机 IV）
+        :return: 具有 update(chunk) -> bytes 与 finalize() -> bytes 的上下文
         """
-        ciphertext = b""
-        for i in range(0, len(plaintext), 16):
-            keystream = self._generate_keystream(i // 16 + 1)
-            block = bytes(a ^ b for a, b in zip(keystream, plaintext[i:i+16]))
-            ciphertext += block
+        return _GCMContext(self, aad, None, iv=self._message_iv(iv))
 
-        gmac = self._compute_gmac(aad, ciphertext)
-        return self.iv + ciphertext, gmac  # 预置 IV 以便解密时使用
+    def decryptor(self, gmac: bytes, aad: bytes = b"", iv_length: int = 12) -> _CipherContext:
+        """
+        流式解密, 输入开头的 iv_length 字节为 IV, finalize 时校验认证标签, 失败抛出 CheckFailedError
+        update 返回的明文在 finalize 成功之前未经认证, 不可信任
+        :param gmac: 认证标签
+        :param aad: 附加认证数据（默认无）, 可以再由上下文的 update_aad 分段追加
+        :param iv_length: 密文开头 IV 的字节长度（默认 12）
+        :return: 具有 update(chunk) -> bytes 与 finalize() -> bytes 的上下文
+        """
+        if iv_length < 1:
+            raise ValueError("IV 不能为空")
+        return _GCMContext(self, aad, gmac, iv_length=iv_length)
 
-    def decrypt(self, ciphertext: bytes, gmac: bytes, aad: bytes = b"") -> Optional[bytes]:
+    def encrypt(self, plaintext: bytes, aad: bytes = b"", iv: Optional[bytes] = None) -> Tuple[bytes, bytes]:
         """
-        GCM 解密
-        :param ciphertext: 需要解密的数据（前 12 字节为 IV）
-        :param gmac: GMAC 认证码
+        GCM 加密, 每条消息使用不同的 IV
+        :param plaintext: 需要加密的数据
         :param aad: 附加认证数据（默认无）
-        :return: 明文，如果认证失败则返回 None
+        :param iv: 本条消息的 IV（默认生成新的随机 IV）
+        :return: (IV + 密文, 16 字节认证标签)
         """
-        if len(ciphertext) < 12:
-            raise ValueError("密文必须至少包含 12 字节的 IV")
+        context = self.encryptor(aad, iv)
+        ciphertext = context.update(plaintext) + context.finalize()  # 预置 IV 以便解密时使用
+        return ciphertext, context.tag
 
-        iv, ciphertext = ciphertext[:12], ciphertext[12:]
-        plaintext = b""
+    def decrypt(self, ciphertext: bytes, gmac: bytes, aad: bytes = b"", iv_length: int = 12) -> bytes:
+        """
+        GCM 解密, 先校验认证标签再解密
+        :param ciphertext: 需要解密的数据（前 iv_length 字节为 IV）
+        :param gmac: 认证标签
+        :param aad: 附加认证数据（默认无）
+        :param iv_length: 密文开头 IV 的字节长度（默认 12）
+        :return: 明文
+        :raises CheckFailedError: 认证失败, 数据可能被篡改
+        """
+        if iv_length < 1:
+            raise ValueError("IV 不能为空")
+        if len(ciphertext) < iv_length:
+            raise ValueError(f"密文必须至少包含 {iv_length} 字节的 IV")
+
+        iv, ciphertext = bytes(ciphertext[:iv_length]), bytes(ciphertext[iv_length:])
+        j0 = self._j0(iv)
 
         # 认证检测
-        computed_gmac = self._compute_gmac(aad, ciphertext)
-        if computed_gmac != gmac:
-            print("认证失败，数据可能被篡改！")
-            return None
+        computed_gmac = self._compute_gmac(j0, aad, ciphertext)
+        if not hmac.compare_digest(computed_gmac, gmac):
+            raise CheckFailedError("GCM authentication failed.")
 
-        for i in range(0, len(ciphertext), 16):
-            keystream = self._generate_keystream(i // 16 + 1)
-            block = bytes(a ^ b for a, b in zip(keystream, ciphertext[i:i+16]))
-            plaintext += block
+        plaintext = _xor(ciphertext, self._keystream(j0, len(ciphertext)))
 
         return plaintext  # 无需填充/去填充
 
     def display_info(self):
         """打印当前密钥和 IV"""
-        print(f"密钥: {self.key.hex()}")
-        print(f"IV:  {self.iv.hex()}")
\ No newline at end of file
+        print(f"密钥: {self._key.hex()}")
+        print(f"IV:  {self.iv.hex()}")
@@ -1,13 +1,15 @@
 """SM9 Algorithm Implementation Module."""
 
 import math
-from typing import Callable, Tuple, Type
+import threading
+from typing import Callable, Tuple, Type, Union
 
 from . import ellipticcurve as Ec
+from . import precompute
 from . import primefield as Fp
 from .base import KEYXCHG_MODE, PC_MODE, Hash, SMCoreBase
 from .errors import *
-from .sm3 import SM3
+from . import sm3
 from .utils import bytes_to_int, int_to_bytes
 
 __all__ = [
@@ -17,14 +19,35 @@ __all__ = [
     "KEYXCHG_MODE",
 ]
 
-_bnbp = Ec.SM9BNBP(
-    (0x93DE051D_62BF718F_F5ED0704_487D01D6_E1E40869_09DC3280_E8C4E481_7C66DDDD,
-     0x21FE8DDA_4F21E607_63106512_5C395BBC_1C1C00CB_FA602435_0C464CD7_0A3EA616),
-    ((0x85AEF3D0_78640C98_597B6027_B441A01F_F1DD2C19_0F5E93C4_54806C11_D8806141,
-      0x37227552_92130B08_D2AAB97F_D34EC120_EE265948_D19C17AB_F9B7213B_AF82D65B),
-     (0x17509B09_2E845C12_66BA0D26_2CBEE6ED_0736A96F_A347C8BD_856DC76B_84EBEB96,
-      0xA7CF28D5_19BE3DA6_5F317015_3D278FF2_47EFBA98_A71A0811_6215BBA5_C999A7C7))
-)
+_bnbp_instance: Union[Ec.SM9BNBP, None] = None
+_bnbp_lock = threading.Lock()
+
+
+def _get_bnbp() -> Ec.SM9BNBP:
+    """Get SM9 curve parameters, built on first use."""
+
+    global _bnbp_instance
+    if _bnbp_instance is None:
+        with _bnbp_lock:
+            if _bnbp_instance is None:
+                bnbp = Ec.SM9BNBP(
+                    (0x93DE051D_62BF718F_F5ED0704_487D01D6_E1E40869_09DC3280_E8C4E481_7C66DDDD,
+                     0x21FE8DDA_4F21E607_63106512_5C395BBC_1C1C00CB_FA602435_0C464CD7_0A3EA616),
+                    ((0x85AEF3D0_78640C98_597B6027_B441A01F_F1DD2C19_0F5E93C4_54806C11_D8806141,
+                      0x37227552_92130B08_D2AAB97F_D34EC120_EE265948_D19C17AB_F9B7213B_AF82D65B),
+                     (0x17509B09_2E845C12_66BA0D26_2CBEE6ED_0736A96F_A347C8BD_856DC76B_84EBEB96,
+                      0xA7CF28D5_19BE3DA6_5F317015_3D278FF2_47EFBA98_A71A0811_6215BBA5_C999A7C7))
+                )
+                bnbp.precompute(precompute.cache_path("sm9_P1.gmpt"), precompute.cache_path("sm9_P2.gmpt"))
+                _bnbp_instance = bnbp
+    return _bnbp_instance
+
+
+def __getattr__(name: str):
+    # keep `sm9._bnbp` available without building it at import
+    if name == "_bnbp":
+        return _get_bnbp()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def point_to_bytes_1(P: Ec.EcPoint, mode: PC_MODE) -> bytes:
@@ -41,10 +64,11 @@ def point_to_bytes_1(P: Ec.EcPoint, mode: PC_MODE) -> bytes:
         TypeError: Invalid mode.
     """
 
-    if P == _bnbp.ec1.INF:
+    bnbp = _get_bnbp()
+    if P == bnbp.ec1.INF:
         return b"\x00"
 
-    etob = _bnbp.fp1.etob
+    etob = bnbp.fp1.etob
     x, y = P
 
     if mode is PC_MODE.RAW:
@@ -77,8 +101,9 @@ def bytes_to_point_1(p: bytes) -> Ec.EcPoint:
         InvalidPCError: Invalid PC byte.
     """
 
-    ec1 = _bnbp.ec1
-    fp1 = _bnbp.fp1
+    bnbp = _get_bnbp()
+    ec1 = bnbp.ec1
+    fp1 = bnbp.fp1
 
     mode = p[0]
     if mode == 0x00:
@@ -114,10 +139,11 @@ def point_to_bytes_2(P: Ec.EcPoint2, mode: PC_MODE) -> bytes:
         TypeError: Invalid mode.
     """
 
-    if P == _bnbp.ec2.INF:
+    bnbp = _get_bnbp()
+    if P == bnbp.ec2.INF:
         return b"\x00"
 
-    etob = _bnbp.fp2.etob
+    etob = bnbp.fp2.etob
     x, y = P
 
     if mode is PC_MODE.RAW:
@@ -150,21 +176,22 @@ def bytes_to_point_2(p: bytes) -> Ec.EcPoint2:
         InvalidPCError: Invalid PC byte.
     """
 
+    bnbp = _get_bnbp()
     mode = p[0]
     if mode == 0x00:
-        return _bnbp.ec2.INF
+        return bnbp.ec2.INF
 
     point = p[1:]
-    x = _bnbp.fp2.btoe(point[:_bnbp.fp2.e_length])
+    x = bnbp.fp2.btoe(point[:bnbp.fp2.e_length])
     if mode == 0x04 or mode == 0x06 or mode == 0x07:
-        return x, _bnbp.fp2.btoe(point[_bnbp.fp2.e_length:])
+        return x, bnbp.fp2.btoe(point[bnbp.fp2.e_length:])
     elif mode == 0x02 or mode == 0x03:
-        y = _bnbp.ec2.get_y(x)
+        y = bnbp.ec2.get_y(x)
         if y is None:
             raise PointNotOnCurveError((x, y))
         ylsb = y[1] & 0x1
         if mode == 0x02 and ylsb or mode == 0x03 and not ylsb:
-            return x, _bnbp.fp2.neg(y)
+            return x, bnbp.fp2.neg(y)
         return x, y
     else:
         raise InvalidPCError(mode)
@@ -192,22 +219,7 @@ class SM9Core(SMCoreBase):
         self._hlen = math.ceil((5 * math.log2(bnbp.fpn.p)) / 32)  # used for H1 and H2
 
     def _cipher_fn(self, prefix_byte: bytes, Z: bytes, hlen: int) -> int:
-        hash_fn = self._hash_fn
-        v = self._hash_cls.hash_length()
-
-        count, tail = divmod(hlen, v)
-        if count + (tail > 0) > 0xffffffff:
-            raise DataOverflowError("cipher fn", f"{0xffffffff * v} bytes")
-
-        Z = prefix_byte + Z
-
-        Ha = bytearray()
-        for ct in range(1, count + 1):
-            Ha.extend(hash_fn(Z + ct.to_bytes(4, "big")))
-
-        if tail > 0:
-            Ha.extend(hash_fn(Z + (count + 1).to_bytes(4, "big"))[:tail])
-
+        Ha = self._key_derivation_fn(prefix_byte + Z, hlen)
         h = (int.from_bytes(Ha, "big") % (self.bnbp.fpn.p - 1)) + 1
         return h
 
@@ -620,7 +632,7 @@ class SM9KGC:
             pc_mode: Point compress mode used for generated data, no effects on the data to be parsed.
         """
 
-        self._core = SM9Core(_bnbp, SM3, rnd_fn)
+        self._core = SM9Core(_get_bnbp(), sm3.get_hash_cls(), rnd_fn)
 
         self._hid_s = hid_s
         self._msk_s = bytes_to_int(msk_s) if msk_s else None
@@ -768,7 +780,7 @@ class SM9:
             mac_klen: MAC value key length in bytes, default to `32`.
         """
 
-        self._core = SM9Core(_bnbp, SM3, rnd_fn)
+        self._core = SM9Core(_get_bnbp(), sm3.get_hash_cls(), rnd_fn)
 
         self._hid_s = hid_s
         self._mpk_s = bytes_to_point_2(mpk_s) if mpk_s else None
@@ -1,5 +1,9 @@
 """Utils."""
 
+import collections
+import threading
+from typing import Any, Hashable, NamedTuple
+
 __all__ = []
 
 
@@ -17,4 +21,75 @@ def bytes_to_int(b: bytes) -> int:
 def int_to_bytes(i: int) -> bytes:
     """Convert integer to minimum number of bytes required to store its value."""
 
+    i = int(i)
     return i.to_bytes((i.bit_length() + 7) >> 3, "big")
+
+
+_numpy = None
+
+
+def import_numpy():
+    """Import NumPy on first use, `None` if not installed."""
+
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+        _numpy = numpy
+    return _numpy or None
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+class LRUCache:
+    """Thread safe bounded LRU cache with hit and miss counters."""
+
+    def __init__(self, maxsize: int) -> None:
+        """Bounded LRU cache.
+
+        Args:
+            maxsize: Maximum number of items, 0 disables caching.
+        """
+
+        self.maxsize = maxsize
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self._misses += 1
+                return default
+            self._data.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._hits = 0
+            self._misses = 0
+
+    def info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, self.maxsize, len(self._data))
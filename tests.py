@@ -1,10 +1,155 @@
+import importlib.util
+import os
+import tempfile
 import unittest
+import unittest.mock
 
 import gmalg
 import gmalg.ellipticcurve as Ec
 import gmalg.primefield as Fp
 
 
+def setUpModule():
+    # persisted precomputation tables go to a temporary directory instead of the user cache
+    tmpdir = tempfile.TemporaryDirectory()
+    unittest.addModuleCleanup(tmpdir.cleanup)
+    patcher = unittest.mock.patch.dict(os.environ, {"GMALG_CACHE_DIR": tmpdir.name})
+    patcher.start()
+    unittest.addModuleCleanup(patcher.stop)
+
+
+class TestImport(unittest.TestCase):
+    def test_lazy(self):
+        import subprocess
+        import sys
+
+        code = "; ".join([
+            "import sys",
+            "import gmalg",
+            "assert not {'gmalg.sm2', 'gmalg.sm9', 'gmalg.ellipticcurve', 'gmalg.primefield'} & set(sys.modules)",
+            "gmalg.SM3",
+            "assert 'gmalg.sm2' not in sys.modules",
+            "assert not {'hashlib', 'mmap', 'secrets'} & set(sys.modules)",
+            "import gmalg.sm2, gmalg.sm9",
+            "assert gmalg.sm2._ecdlp_instance is None and gmalg.sm9._bnbp_instance is None",
+            "gmalg.SM2()",
+            "assert gmalg.sm2._ecdlp is gmalg.sm2._ecdlp_instance",
+            "assert gmalg.sm9._bnbp_instance is None",
+            "import threading",
+            "bnbps = []",
+            "threads = [threading.Thread(target=lambda: bnbps.append(gmalg.sm9._get_bnbp())) for _ in range(4)]",
+            "[t.start() for t in threads]",
+            "[t.join() for t in threads]",
+            "assert len(bnbps) == 4 and all(b is gmalg.sm9._bnbp_instance for b in bnbps)",
+        ])
+        subprocess.run([sys.executable, "-c", code], check=True)
+
+    def test_attrs(self):
+        for name in gmalg.__all__:
+            self.assertIn(name, dir(gmalg))
+            self.assertIsNotNone(getattr(gmalg, name))
+        self.assertIs(gmalg.SM9KGC, gmalg.sm9.SM9KGC)
+        self.assertRaises(AttributeError, getattr, gmalg, "SM5")
+
+
+class TestPrimeField(unittest.TestCase):
+    def _sign(self, backend: str):
+        default = Fp.get_backend().name
+        Fp.set_backend(backend)
+        try:
+            ecdlp = Ec.ECDLP(
+                0x8542D69E_4C044F18_E8B92435_BF6FF7DE_45728391_5C45517D_722EDB8B_08F1DFC3,
+                0x787968B4_FA32C3FD_2417842E_73BBFEFF_2F3C848B_6831D7E0_EC65228B_3937E498,
+                0x63E4C6D3_B23B0C84_9CF84241_484BFE48_F61D59A5_B16BA06E_6E12D1DA_27C5249A,
+                (0x421DEBD6_1B62EAB6_746434EB_C3CC315E_32220B3B_ADD50BDC_4C4E6C14_7FEDD43D,
+                 0x0680512B_CBB42C07_D47349D2_153B70C4_E5D7FDFC_BFA36EA1_A85841B9_E46E09A2),
+                0x8542D69E_4C044F18_E8B92435_BF6FF7DD_29772063_0485628D_5AE74EE7_C32E79B7,
+            )
+        finally:
+            Fp.set_backend(default)
+
+        self.assertEqual(ecdlp.fp.backend.name, backend)
+
+        ecc = gmalg.sm2.SM2Core(
+            ecdlp, gmalg.SM3,
+            lambda _: 0x6CB28D99_385C175C_94F94E93_4817663F_C176D925_DD72B727_260DBAAE_1FB2F96F
+        )
+        d = 0x128B2FA8_BD433C6C_068C8D80_3DFF7979_2A519A55_171B1B65_0C23661D_15897263
+        uid = b"ALICE123@YAHOO.COM"
+        P = (0x0AE4C779_8AA0F119_471BEE11_825BE462_02BB79E2_A5844495_E97C04FF_4DF2548A,
+             0x7C0240F8_8F1CD4E1_6352A73C_17B7F16F_07353E53_A176D684_A9FE0C6B_B798E857)
+
+        r, s = ecc.sign(b"message digest", d, uid, P)
+        self.assertEqual(r, 0x40F1EC59_F793D9F4_9E09DCEF_49130D41_94F79FB1_EED2CAA5_5BACDB49_C4E755D1)
+        self.assertEqual(s, 0x6FC6DAC3_2C5D5CF1_0C77DFB2_0F7C2EB6_67A45787_2FB09EC5_6327A67E_C7DEEBE7)
+        self.assertTrue(ecc.verify(b"message digest", r, s, uid, P))
+
+    def test_backend_python(self):
+        self._sign("python")
+
+    @unittest.skipUnless("gmpy2" in Fp.available_backends(), "gmpy2 not installed.")
+    def test_backend_gmpy2(self):
+        self._sign("gmpy2")
+
+    def test_register_backend(self):
+        calls = []
+
+        def powmod(x, e, p):
+            calls.append("powmod")
+            return pow(x, e, p)
+
+        def invert(x, p):
+            calls.append("invert")
+            return pow(x, p - 2, p)
+
+        Fp.register_backend("test", int, powmod, invert)
+        self.addCleanup(Fp._BACKENDS.pop, "test", None)
+        self.assertIn("test", Fp.available_backends())
+
+        self._sign("test")
+        self.assertIn("invert", calls)
+
+        fp2 = Fp.PrimeField2(0xB6400000_02A3A6F1_D603AB4F_F58EC745_21F2934B_1A7AEEDB_E56F9B27_E351457D, "test")
+        self.assertEqual(fp2.fp.backend.name, "test")
+
+    def test_sqrt(self):
+        for p in [3, 5, 7, 17, 41, 73, 97, 113, 257, 65537]:
+            fp = Fp.PrimeField(p)
+            squares = {x * x % p for x in range(p)}
+            for x in range(p):
+                y = fp.sqrt(x)
+                if x in squares:
+                    self.assertEqual(y * y % p, x)
+                else:
+                    self.assertIsNone(y)
+
+        # composite p = 1 mod 8 has no non-residue z with z^((p-1)/2) = -1
+        fp = Fp.PrimeField(9)
+        self.assertRaises(gmalg.errors.InvalidArgumentError, fp.sqrt, 2)
+
+    def test_sqrt_8u1(self):
+        # NIST P-224, p = 2^224 - 2^96 + 1
+        ecdlp = Ec.ECDLP(
+            0xFFFFFFFF_FFFFFFFF_FFFFFFFF_FFFFFFFF_00000000_00000000_00000001,
+            0xFFFFFFFF_FFFFFFFF_FFFFFFFF_FFFFFFFE_FFFFFFFF_FFFFFFFF_FFFFFFFE,
+            0xB4050A85_0C04B3AB_F5413256_5044B0B7_D7BFD8BA_270B3943_2355FFB4,
+            (0xB70E0CBD_6BB4BF7F_321390B9_4A03C1D3_56C21122_343280D6_115C1D21,
+             0xBD376388_B5F723FB_4C22DFE6_CD4375A0_5A074764_44D58199_85007E34),
+            0xFFFFFFFF_FFFFFFFF_FFFFFFFF_FFFF16A2_E0B8F03E_13DD2945_5C5C2A3D,
+        )
+        fp, ec = ecdlp.fp, ecdlp.ec
+
+        for k in [1, 2, 3, 0xFF, ecdlp.fpn.p - 1]:
+            x, y = ecdlp.kG(k)
+            self.assertIn(ec.get_y(x), (y, fp.neg(y)))
+
+        self.assertIsNone(fp.sqrt(fp._ts_c))  # z^q is a non-residue
+
+    def test_raises(self):
+        self.assertRaises(gmalg.errors.InvalidArgumentError, Fp.set_backend, "unknown")
+        self.assertRaises(gmalg.errors.InvalidArgumentError, Fp.PrimeField, 7, "unknown")
+
+
 class TestEllipticCurve(unittest.TestCase):
     def test_ec(self):
         p = 0xB6400000_02A3A6F1_D603AB4F_F58EC745_21F2934B_1A7AEEDB_E56F9B27_E351457D
@@ -31,6 +176,120 @@ class TestEllipticCurve(unittest.TestCase):
         self.assertTrue(ec2.mul(n, P2) == ec2.INF)
 
 
+class TestOpCount(unittest.TestCase):
+    def test_count(self):
+        from gmalg.opcount import count_ops
+
+        mul = Fp.PrimeField.mul
+        bnbp = gmalg.sm9._bnbp
+
+        with count_ops() as counts:
+            P = bnbp.ec1.mul(0xFF, bnbp.G1)
+            with count_ops() as inner:
+                bnbp.e(P, bnbp.G2)
+
+        self.assertIs(Fp.PrimeField.mul, mul)
+
+        self.assertEqual(counts["EllipticCurve(PrimeField)"], {"double": 7, "add": 7})
+        self.assertEqual(inner["SM9BNBP"], {"miller_loop": 1, "final_exp": 1})
+        self.assertEqual(counts["SM9BNBP"], inner["SM9BNBP"])
+        self.assertGreater(counts["PrimeField12"]["sqr"], 0)
+        self.assertGreater(counts["PrimeField"]["mul"], inner["PrimeField"]["mul"])
+        self.assertNotIn("EllipticCurve(PrimeField)", inner.levels())
+
+        levels = counts.as_dict()
+        for level in ("PrimeField", "PrimeField2", "PrimeField4", "PrimeField12", "EllipticCurve(PrimeField2)", "SM9BNBP"):
+            self.assertIn(level, levels)
+
+    def test_sqr(self):
+        p = 0xB6400000_02A3A6F1_D603AB4F_F58EC745_21F2934B_1A7AEEDB_E56F9B27_E351457D
+        fp12 = Fp.PrimeField12(p)
+
+        X = (((1, 2), (3, 4)), ((5, 6), (7, 8)), ((9, 10), (p - 11, p - 12)))
+        self.assertEqual(fp12.sqr(X), fp12.mul(X, X))
+        self.assertEqual(fp12.fp4.sqr(X[0]), fp12.fp4.mul(X[0], X[0]))
+        self.assertEqual(fp12.fp4.fp2.sqr(X[2][1]), fp12.fp4.fp2.mul(X[2][1], X[2][1]))
+
+
+class TestPrecompute(unittest.TestCase):
+    def test_table(self):
+        import os
+        import tempfile
+
+        from gmalg.precompute import FixedBaseTable
+
+        bnbp = gmalg.sm9._bnbp
+        ks = [1, 2, 15, 16, 0xFF, bnbp.fpn.p - 1, 0x59276E27_D506861A_16680F3A_D9C02DCC_EF3CC1FA_3CDBE4CE_6D54B80D_EAC1BC21]
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "P2.gmpt")
+
+            table = FixedBaseTable(bnbp.ec2, bnbp.G2, 256, 4, path)
+            self.assertFalse(os.path.exists(path))
+            for k in ks:
+                self.assertEqual(table.mul(k), bnbp.ec2.mul(k, bnbp.G2))
+            self.assertTrue(os.path.exists(path))
+
+            table = FixedBaseTable(bnbp.ec2, bnbp.G2, 256, 4, path)
+            for k in ks:
+                self.assertEqual(table.mul(k), bnbp.ec2.mul(k, bnbp.G2))
+            self.assertIsNotNone(table._buffer)
+            table._buffer.close()
+
+            # stale table of another point
+            table = FixedBaseTable(bnbp.ec2, bnbp.ec2.neg(bnbp.G2), 256, 4, path)
+            self.assertEqual(table.mul(ks[-1]), bnbp.ec2.neg(bnbp.ec2.mul(ks[-1], bnbp.G2)))
+            self.assertIsNone(table._buffer)
+
+            table = FixedBaseTable(bnbp.ec2, bnbp.ec2.neg(bnbp.G2), 256, 4, path)
+            table.mul(1)
+            self.assertIsNotNone(table._buffer)
+            table._buffer.close()
+
+            # corrupted entry of the lowest window, used by every odd scalar
+            with open(path, "r+b") as f:
+                f.seek(gmalg.precompute._HEADER.size + 5)
+                byte = f.read(1)
+                f.seek(gmalg.precompute._HEADER.size + 5)
+                f.write(bytes([byte[0] ^ 1]))
+            table = FixedBaseTable(bnbp.ec2, bnbp.ec2.neg(bnbp.G2), 256, 4, path)
+            self.assertEqual(table.mul(ks[-1]), bnbp.ec2.neg(bnbp.ec2.mul(ks[-1], bnbp.G2)))
+            self.assertIsNone(table._buffer)
+
+            table = FixedBaseTable(bnbp.ec2, bnbp.ec2.neg(bnbp.G2), 256, 4, path)
+            table.mul(1)
+            self.assertIsNotNone(table._buffer)
+            table._buffer.close()
+
+            # truncated table
+            with open(path, "r+b") as f:
+                f.truncate(1000)
+            table = FixedBaseTable(bnbp.ec2, bnbp.ec2.neg(bnbp.G2), 256, 4, path)
+            table.mul(1)
+            self.assertIsNone(table._buffer)
+
+            # unwritable path, parent is a file
+            table = FixedBaseTable(bnbp.ec1, bnbp.G1, 256, 5, os.path.join(path, "P1.gmpt"))
+            self.assertEqual(table.mul(ks[-1]), bnbp.ec1.mul(ks[-1], bnbp.G1))
+            self.assertEqual(os.listdir(tmpdir), ["P2.gmpt"])
+
+    def test_kG(self):
+        ecdlp = Ec.ECDLP(
+            0x8542D69E_4C044F18_E8B92435_BF6FF7DE_45728391_5C45517D_722EDB8B_08F1DFC3,
+            0x787968B4_FA32C3FD_2417842E_73BBFEFF_2F3C848B_6831D7E0_EC65228B_3937E498,
+            0x63E4C6D3_B23B0C84_9CF84241_484BFE48_F61D59A5_B16BA06E_6E12D1DA_27C5249A,
+            (0x421DEBD6_1B62EAB6_746434EB_C3CC315E_32220B3B_ADD50BDC_4C4E6C14_7FEDD43D,
+             0x0680512B_CBB42C07_D47349D2_153B70C4_E5D7FDFC_BFA36EA1_A85841B9_E46E09A2),
+            0x8542D69E_4C044F18_E8B92435_BF6FF7DD_29772063_0485628D_5AE74EE7_C32E79B7,
+        )
+        k = 0x6CB28D99_385C175C_94F94E93_4817663F_C176D925_DD72B727_260DBAAE_1FB2F96F
+
+        Q = ecdlp.kG(k)
+        ecdlp.precompute()
+        self.assertEqual(ecdlp.kG(k), Q)
+        self.assertEqual(ecdlp.kG(0), ecdlp.ec.mul(0, ecdlp.G))
+
+
 class TestSM2(unittest.TestCase):
     def test_sign1(self):
         ecdlp = Ec.ECDLP(
@@ -56,6 +315,77 @@ class TestSM2(unittest.TestCase):
 
         self.assertEqual(ecc.verify(b"message digest", r, s, uid, P), True)
 
+    def test_kdf(self):
+        class BufferedSM3(gmalg.base.Hash):
+            # hash without its own copy()
+            @classmethod
+            def hash_length(self):
+                return 32
+
+            def __init__(self):
+                self.data = bytearray()
+
+            def update(self, data):
+                self.data.extend(data)
+
+            def value(self):
+                return gmalg.SM3(self.data).value()
+
+        def kdf(Z, klen):
+            K = b"".join(gmalg.SM3(Z + ct.to_bytes(4, "big")).value() for ct in range(1, (klen + 31) // 32 + 1))
+            return K[:klen]
+
+        Z = bytes(range(256)) * 2
+        for hash_cls in (gmalg.SM3, BufferedSM3):
+            core = gmalg.sm2.SM2Core(gmalg.sm2._ecdlp, hash_cls)
+            for klen in (0, 1, 31, 32, 33, 100, 1000):
+                self.assertEqual(core._key_derivation_fn(Z, klen), kdf(Z, klen))
+
+        core = gmalg.sm2.SM2Core(gmalg.sm2._ecdlp, gmalg.SM3)
+        core.kdf_workers = 2
+        core.kdf_parallel_threshold = 100
+        for klen in (99, 100, 1000, 4097):
+            self.assertEqual(core._key_derivation_fn(Z, klen), kdf(Z, klen))
+
+        # local class can not be pickled, native SM3 is not worth a pool, both run serially
+        for hash_cls in (BufferedSM3, gmalg.sm3._NativeSM3):
+            if hash_cls is gmalg.sm3._NativeSM3 and "hashlib" not in gmalg.sm3.available_backends():
+                continue
+            core = gmalg.sm2.SM2Core(gmalg.sm2._ecdlp, hash_cls)
+            core.kdf_workers = 2
+            core.kdf_parallel_threshold = 100
+            with unittest.mock.patch("concurrent.futures.ProcessPoolExecutor", side_effect=AssertionError):
+                self.assertEqual(core._key_derivation_fn(Z, 1000), kdf(Z, 1000))
+
+    def test_za_cache(self):
+        ecdlp = gmalg.sm2._ecdlp
+        core = gmalg.sm2.SM2Core(ecdlp, gmalg.SM3, za_cache_size=2)
+        nocache = gmalg.sm2.SM2Core(ecdlp, gmalg.SM3, za_cache_size=0)
+
+        etob = ecdlp.fp.etob
+        uid = b"1234567812345678"
+        pks = [ecdlp.kG(k) for k in (1, 2, 3)]
+
+        def za(uid, pk):
+            data = (len(uid) << 3).to_bytes(2, "big") + uid
+            for e in (ecdlp.ec.a, ecdlp.ec.b, *ecdlp.G, *pk):
+                data += etob(e)
+            return gmalg.SM3(data).value()
+
+        for pk in pks + pks[1:] + [pks[0]]:
+            self.assertEqual(core.entity_info(uid, pk), za(uid, pk))
+            self.assertEqual(nocache.entity_info(bytearray(uid), pk), za(uid, pk))
+        self.assertEqual(core.entity_info(b"ALICE", pks[0]), za(b"ALICE", pks[0]))
+
+        self.assertEqual(core.za_cache_info(), (2, 5, 2, 2))
+        self.assertEqual(nocache.za_cache_info().currsize, 0)
+
+        info = gmalg.SM2.za_cache_info()
+        sm2 = gmalg.SM2(pk=gmalg.sm2.point_to_bytes(pks[0], gmalg.PC_MODE.RAW), uid=uid)
+        sm2.verify(b"message", b"\x01", b"\x01")
+        sm2.verify(b"message", b"\x01", b"\x01")
+        self.assertEqual(gmalg.SM2.za_cache_info().hits, info.hits + 1)
+
     def test_sign2(self):
         sm2 = gmalg.SM2(
             bytes.fromhex("3945208F 7B2144B1 3F36E38A C6D39F95 88939369 2860B51A 42FB81EF 4DF7C5B8"),
@@ -377,6 +707,368 @@ class TestSM3(unittest.TestCase):
         self.h.update(b"1234567812345678123456781234567812345678123456781234567812345678")
         self.assertEqual(self.h.value(), bytes.fromhex("45418F14DC9077297E5E8480664A294DB2C05F73382469933917E662208B948B"))
 
+    def test_compress_block(self):
+        import os
+
+        from gmalg.sm3 import _compress, _compress_block, _expand
+
+        W1 = [0] * 68
+        W2 = [0] * 64
+        V1 = [0x7380166f, 0x4914b2b9, 0x172442d7, 0xda8a0600, 0xa96f30bc, 0x163138aa, 0xe38dee4d, 0xb0fb0e4e]
+        V2 = V1.copy()
+        data = bytes(64) + b"\xff" * 64 + os.urandom(64 * 30)
+        for i in range(0, len(data), 64):
+            _expand(data[i:i + 64], W1, W2)
+            _compress(W1, W2, V1)
+            _compress_block(V2, data, i)
+            self.assertEqual(V1, V2)
+
+    def test_buffer(self):
+        import array
+        import mmap
+        import os
+
+        data = os.urandom(64 * 64 * 2 + 100)
+        expected = gmalg.SM3(data).value()
+
+        h = gmalg.SM3()
+        h.update(data[:10])
+        h.update(memoryview(data)[10:4200])
+        h.update(bytearray(data[4200:]))
+        self.assertEqual(h.value(), expected)
+
+        h = gmalg.SM3(array.array("I", data[:8192]))
+        h.update(memoryview(data[8192:]).cast("B", (len(data) - 8192,)))
+        self.assertEqual(h.value(), expected)
+
+        with mmap.mmap(-1, len(data)) as m:
+            m.write(data)
+            self.assertEqual(gmalg.SM3(m).value(), expected)
+
+        self.assertRaises(TypeError, self.h.update, memoryview(data)[::2])
+
+    def test_file_digest(self):
+        import contextlib
+        import io
+        import os
+        import tempfile
+
+        from gmalg.sm3 import file_digest, main
+
+        data = os.urandom(5000)
+        expected = gmalg.SM3(data).hexdigest()
+
+        class Reader:
+            # file object without readinto
+            def __init__(self, data):
+                self._f = io.BytesIO(data)
+
+            def read(self, size):
+                return self._f.read(size)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "data")
+            empty = os.path.join(tmpdir, "empty")
+            with open(path, "wb") as f:
+                f.write(data)
+            open(empty, "wb").close()
+
+            self.assertEqual(file_digest(path).hexdigest(), expected)
+            self.assertEqual(file_digest(path, 100, use_mmap=False).hexdigest(), expected)
+            self.assertEqual(file_digest(io.BytesIO(data), 100).hexdigest(), expected)
+            self.assertEqual(file_digest(Reader(data), 100).hexdigest(), expected)
+            self.assertEqual(file_digest(empty).hexdigest(), gmalg.SM3().hexdigest())
+
+            stdout = io.StringIO()
+            with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(io.StringIO()):
+                status = main([path, os.path.join(tmpdir, "missing"), empty])
+            self.assertEqual(status, 1)
+            self.assertEqual(stdout.getvalue().splitlines(), [f"{expected}  {path}", f"{gmalg.SM3().hexdigest()}  {empty}"])
+
+    def test_copy(self):
+        self.h.update(b"1234567812345678123456781234567812345678123456781234567812345678")
+        self.h.update(b"12")
+        h2 = self.h.copy()
+        self.h.update(b"345")
+        h2.update(b"34")
+        self.assertEqual(self.h.value(), bytes.fromhex("40EDF000B67036C78BC4B394FB3F3201D466E5084FFAA1C4EA6A8427D12F4C40"))
+        self.assertEqual(h2.digest(), gmalg.SM3(b"1234567812345678123456781234567812345678123456781234567812345678" b"1234").digest())
+
+    def test_hashlib_api(self):
+        h = gmalg.SM3(b"12345")
+        self.assertEqual(h.hexdigest(), "91a7adde5b0919d53ffb7dc7253f9f345c3c902a759fe5a2493c70abb7e25095")
+        self.assertEqual(h.digest(), h.value())
+        self.assertEqual((h.name, h.digest_size, h.block_size), ("sm3", 32, 64))
+
+    def test_reset(self):
+        self.h.update(b"1234567812345678123456781234567812345678123456781234567812345678" b"123")
+        self.h.reset()
+        self.h.update(b"abc")
+        self.assertEqual(self.h.value(), gmalg.SM3(b"abc").value())
+
+    def test_hash_many(self):
+        import gmalg.sm3
+
+        messages = [bytes(range(i % 150)) for i in range(300)]
+        expected = [gmalg.sm3.SM3(m).value() for m in messages]
+
+        for backend in gmalg.sm3.available_backends():
+            self.assertEqual(list(gmalg.sm3.hash_many(messages, chunksize=64, backend=backend)), expected)
+        self.assertEqual(list(gmalg.sm3.hash_many(iter(messages), workers=2, chunksize=64)), expected)
+        self.assertEqual(list(gmalg.sm3.hash_many([])), [])
+        with self.assertRaises(gmalg.errors.InvalidArgumentError):
+            next(gmalg.sm3.hash_many(messages, chunksize=0))
+
+    def test_state(self):
+        data = bytes(range(256)) * 3
+        for split in [0, 1, 63, 64, 65, 200, len(data)]:
+            h = gmalg.SM3(data[:split])
+            state = h.export_state()
+            self.assertEqual(len(state), 45 + split % 64)
+
+            h2 = gmalg.SM3.from_state(state)
+            h2.update(data[split:])
+            self.assertEqual(h2.value(), gmalg.SM3(data).value())
+            self.assertEqual(h.export_state(), state)
+
+        state = gmalg.SM3(b"abc").export_state()
+        with self.assertRaises(gmalg.errors.IncorrectLengthError):
+            gmalg.SM3.from_state(state[:-1])
+        with self.assertRaises(gmalg.errors.IncorrectLengthError):
+            gmalg.SM3.from_state(state[:10])
+        with self.assertRaises(gmalg.errors.InvalidArgumentError):
+            gmalg.SM3.from_state(b"XXXX" + state[4:])
+        with self.assertRaises(gmalg.errors.InvalidArgumentError):
+            gmalg.SM3.from_state(state[:4] + b"\x02" + state[5:])
+
+    def test_hash_equal_length(self):
+        import gmalg.sm3
+
+        for length in [0, 3, 55, 56, 64, 130]:
+            messages = [bytes([i]) * length for i in range(40)]
+            self.assertEqual(gmalg.sm3.hash_equal_length(messages), [gmalg.sm3.SM3(m).value() for m in messages])
+        self.assertEqual(gmalg.sm3.hash_equal_length([]), [])
+        with self.assertRaises(gmalg.errors.IncorrectLengthError):
+            gmalg.sm3.hash_equal_length([b"a", b"bc"])
+
+    @unittest.skipIf(importlib.util.find_spec("numpy") is None, "numpy not installed.")
+    def test_hash_lanes(self):
+        import numpy
+        import gmalg.sm3
+
+        messages = [bytes(range(i, i + 100)) for i in range(40)]
+        self.assertEqual(gmalg.sm3._hash_lanes(numpy, messages, 100), [gmalg.sm3.SM3(m).value() for m in messages])
+        self.assertEqual(list(gmalg.sm3.hash_many(messages, backend="python")), [gmalg.sm3.SM3(m).value() for m in messages])
+
+    def test_hmac(self):
+        import hmac
+
+        # key longer than block size is hashed by hmac module
+        for key in [b"key", b"k" * 64, b"k" * 100]:
+            mac = hmac.new(key, b"message", gmalg.SM3)
+            mac2 = mac.copy()
+            mac2.update(b" digest")
+
+            ipad = bytes(b ^ 0x36 for b in key.ljust(64, b"\x00")) if len(key) <= 64 else None
+            if ipad is not None:
+                opad = bytes(b ^ 0x5c for b in key.ljust(64, b"\x00"))
+                inner = gmalg.SM3(ipad + b"message").digest()
+                self.assertEqual(mac.digest(), gmalg.SM3(opad + inner).digest())
+
+            self.assertEqual(mac2.hexdigest(), hmac.new(key, b"message digest", gmalg.SM3).hexdigest())
+
+    @unittest.skipUnless("sm3" in __import__("hashlib").algorithms_available, "hashlib has no sm3")
+    def test_hashlib(self):
+        import hashlib
+        import os
+
+        for length in [0, 1, 55, 56, 63, 64, 65, 119, 120, 128, 1000, 4099]:
+            data = os.urandom(length)
+            h = gmalg.SM3()
+            h.update(data)
+            self.assertEqual(h.value(), hashlib.new("sm3", data).digest())
+
+
+class TestSM3Backend(unittest.TestCase):
+    def setUp(self) -> None:
+        import gmalg.sm3
+
+        self.default = gmalg.sm3.get_backend()
+
+    def tearDown(self) -> None:
+        gmalg.sm3.set_backend(self.default)
+
+    def test_backends(self):
+        import os
+
+        import gmalg.sm3
+
+        data = os.urandom(1000)
+        expected = gmalg.SM3(data).hexdigest()
+
+        self.assertIn("python", gmalg.sm3.available_backends())
+        for backend in gmalg.sm3.available_backends():
+            with self.subTest(backend=backend):
+                gmalg.sm3.set_backend(backend)
+                self.assertEqual(gmalg.sm3.get_backend(), backend)
+
+                hash_cls = gmalg.sm3.get_hash_cls()
+                h = hash_cls(data[:100])
+                h2 = h.copy()
+                h.update(memoryview(data)[100:])
+                h2.update(b"x")
+                self.assertEqual(h.hexdigest(), expected)
+                self.assertEqual(h.value(), bytes.fromhex(expected))
+                self.assertEqual(h2.value(), gmalg.SM3(data[:100] + b"x").value())
+                self.assertEqual(hash_cls.hash_length(), 32)
+
+                self.assertIs(gmalg.SM2()._core._hash_cls, hash_cls)
+                TestSM2("test_sign2").test_sign2()
+                TestSM2("test_encrypt2").test_encrypt2()
+                TestSM9("test_sign").test_sign()
+
+    def test_raises(self):
+        import gmalg.sm3
+
+        self.assertRaises(gmalg.errors.InvalidArgumentError, gmalg.sm3.set_backend, "unknown")
+        self.assertRaises(gmalg.errors.InvalidArgumentError, gmalg.sm3.file_digest, __file__, backend="unknown")
+
+
+class TestHMAC_SM3(unittest.TestCase):
+    def test_hmac(self):
+        import hmac
+
+        import gmalg.sm3
+
+        mac = gmalg.HMAC_SM3(b"key", b"abc")
+        self.assertEqual(mac.hexdigest(), "28e63256e7c5a087b1f073265dc53092163f7b82729735d06f28f10af9d52393")
+
+        for backend in gmalg.sm3.available_backends():
+            for key in [b"", b"key", b"k" * 64, bytearray(b"k" * 65), b"k" * 200]:
+                with self.subTest(backend=backend, key_length=len(key)):
+                    expected = hmac.new(bytes(key), b"message digest", gmalg.SM3).digest()
+
+                    mac = gmalg.HMAC_SM3(key, b"message", backend=backend)
+                    fork = mac.copy()
+                    mac.update(b" digest")
+                    fork.update(b" digest")
+                    self.assertEqual(mac.digest(), expected)
+                    self.assertEqual(fork.value(), expected)
+                    self.assertEqual(mac.digest(), expected)
+
+    def test_many(self):
+        from gmalg.hmac_sm3 import hmac_sm3_many
+
+        key = b"0123456789abcdef"
+        messages = [b"", b"a", b"message" * 20, memoryview(b"view")]
+        self.assertEqual(hmac_sm3_many(key, messages), [gmalg.HMAC_SM3(key, m).digest() for m in messages])
+        self.assertEqual(hmac_sm3_many(key, iter([])), [])
+
+
+class TestPBKDF2(unittest.TestCase):
+    def test_pbkdf2(self):
+        import hashlib
+
+        import gmalg.sm3
+
+        self.assertEqual(gmalg.pbkdf2_sm3(b"password", b"salt", 2, 40, backend="python").hex(),
+                         "fee723a2bc966e11dffb66133f4e8df577383c78ade30e3298edbd3e54ed85b7650006f9e15d3798")
+
+        for backend in gmalg.sm3.available_backends():
+            for iterations, dklen in [(1, 1), (1, 32), (3, 33), (10, 64), (4, 100)]:
+                with self.subTest(backend=backend, iterations=iterations, dklen=dklen):
+                    key = gmalg.pbkdf2_sm3(b"password" * 10, bytearray(b"salt"), iterations, dklen, backend=backend)
+                    self.assertEqual(len(key), dklen)
+                    if "sm3" in hashlib.algorithms_available:
+                        self.assertEqual(key, hashlib.pbkdf2_hmac("sm3", b"password" * 10, b"salt", iterations, dklen))
+
+        self.assertEqual(gmalg.pbkdf2_sm3(b"p", b"s", 2, 70, workers=2, backend="python"),
+                         gmalg.pbkdf2_sm3(b"p", b"s", 2, 70, backend="python"))
+        self.assertEqual(len(gmalg.pbkdf2_sm3(b"p", b"s", 1)), 32)
+
+    def test_raises(self):
+        self.assertRaises(gmalg.errors.InvalidArgumentError, gmalg.pbkdf2_sm3, b"p", b"s", 0)
+        self.assertRaises(gmalg.errors.InvalidArgumentError, gmalg.pbkdf2_sm3, b"p", b"s", 1, 0)
+        self.assertRaises(gmalg.errors.DataOverflowError, gmalg.pbkdf2_sm3, b"p", b"s", 1, 0xffffffff * 32 + 1)
+
+
+class TestMerkle(unittest.TestCase):
+    def test_tree(self):
+        import json
+        import os
+
+        from gmalg.merkle import SM3MerkleTree
+
+        data = os.urandom(1050)
+        tree = SM3MerkleTree.from_bytes(data, 100)
+
+        leaves = [gmalg.SM3(b"\x00" + data[i:i + 100]).value() for i in range(0, len(data), 100)]
+        self.assertEqual(tree.leaves, leaves)
+        self.assertEqual(len(tree), 11)
+
+        # ((((0,1),(2,3)),((4,5),(6,7))),((8,9),10))
+        def node(l, r):
+            return gmalg.SM3(b"\x01" + l + r).value()
+        n = [node(leaves[i], leaves[i + 1]) for i in range(0, 10, 2)]
+        root = node(node(node(n[0], n[1]), node(n[2], n[3])), node(n[4], leaves[10]))
+        self.assertEqual(tree.root, root)
+
+        self.assertEqual(SM3MerkleTree.from_bytes(data, 100, workers=2).root, root)
+        self.assertEqual(SM3MerkleTree.from_bytes(b"").root, gmalg.SM3(b"\x00").value())
+
+        patched = bytearray(data)
+        patched[1000] ^= 0xff
+        self.assertFalse(tree.verify_chunk(10, patched[1000:]))
+        self.assertNotEqual(tree.update_chunk(10, patched[1000:]), root)
+        self.assertEqual(tree.root, SM3MerkleTree.from_bytes(patched, 100).root)
+        self.assertTrue(tree.verify_chunk(10, patched[1000:]))
+
+        for i in range(len(tree)):
+            chunk = bytes(patched[i * 100:(i + 1) * 100])
+            self.assertTrue(SM3MerkleTree.verify_proof(tree.root, i, chunk, tree.proof(i)))
+            self.assertFalse(SM3MerkleTree.verify_proof(root, i, chunk[:-1], tree.proof(i)))
+            self.assertFalse(SM3MerkleTree.verify_proof(tree.root, i + 16, chunk, tree.proof(i)))
+
+        chunk = bytes(patched[1000:])
+        self.assertFalse(SM3MerkleTree.verify_proof(tree.root, -6, chunk, tree.proof(10)))
+        self.assertFalse(SM3MerkleTree.verify_proof(tree.root, 11, chunk, tree.proof(10)))
+
+        loaded = SM3MerkleTree.from_dict(json.loads(json.dumps(tree.to_dict())))
+        self.assertEqual(loaded.root, tree.root)
+
+        d = tree.to_dict()
+        d["leaves"][0] = "00" * 32
+        self.assertRaises(gmalg.errors.CheckFailedError, SM3MerkleTree.from_dict, d)
+        self.assertRaises(gmalg.errors.IncorrectLengthError, tree.update_chunk, 0, b"short")
+        self.assertRaises(gmalg.errors.InvalidArgumentError, tree.update_chunk, 11, b"")
+
+    def test_file(self):
+        import os
+        import tempfile
+
+        from gmalg.merkle import SM3MerkleTree
+
+        data = os.urandom(5000)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "data")
+            with open(path, "wb") as f:
+                f.write(data)
+
+            tree = SM3MerkleTree.from_file(path, 512)
+            self.assertEqual(tree.root, SM3MerkleTree.from_bytes(data, 512).root)
+            self.assertEqual(SM3MerkleTree.from_file(path, 512, workers=2).root, tree.root)
+            self.assertEqual(tree.verify_file(path), [])
+
+            with open(path, "r+b") as f:
+                f.seek(3000)
+                f.write(b"patched")
+            self.assertEqual(tree.verify_file(path), [5])
+            self.assertEqual(tree.verify_file(path, [0, 1]), [])
+
+            with open(path, "ab") as f:
+                f.write(b"tail")
+            self.assertEqual(tree.verify_file(path), [5, 9])
+
 
 class TestSM4(unittest.TestCase):
     def setUp(self) -> None:
@@ -401,6 +1093,22 @@ class TestSM4(unittest.TestCase):
             plain = self.c.decrypt(plain)
         self.assertEqual(plain, bytes.fromhex("0123456789ABCDEFFEDCBA9876543210"))
 
+    def test_tables(self):
+        import random
+
+        import gmalg.sm4
+
+        rnd = random.Random(0)
+        for T, tables in ((gmalg.sm4._T0, gmalg.sm4._T0_TABLES), (gmalg.sm4._T1, gmalg.sm4._T1_TABLES)):
+            for X in [0, 0xffffffff] + [rnd.getrandbits(32) for _ in range(100)]:
+                t0, t1, t2, t3 = tables
+                self.assertEqual(t0[X >> 24] ^ t1[(X >> 16) & 0xff] ^ t2[(X >> 8) & 0xff] ^ t3[X & 0xff], T(X))
+
+        # different key, cross-checked with OpenSSL sm4-ecb
+        c = gmalg.SM4(bytes(range(16)))
+        self.assertEqual(c.encrypt(b"a" * 16), bytes.fromhex("051fbe4d12f1e3da1ac68dfaf8520f09"))
+        self.assertEqual(c.decrypt(bytes.fromhex("051fbe4d12f1e3da1ac68dfaf8520f09")), b"a" * 16)
+
     def test_raises(self):
         self.assertRaises(gmalg.errors.IncorrectLengthError, self.c.encrypt, b"123456781234567")
         self.assertRaises(gmalg.errors.IncorrectLengthError, self.c.encrypt, b"12345678123456781")
@@ -408,6 +1116,224 @@ class TestSM4(unittest.TestCase):
         self.assertRaises(gmalg.errors.IncorrectLengthError, self.c.decrypt, b"12345678123456781")
 
 
+class TestSM4Cipher(unittest.TestCase):
+    # vectors generated by OpenSSL `enc -sm4-*`
+    key = bytes.fromhex("0123456789abcdeffedcba9876543210")
+    iv = bytes.fromhex("000102030405060708090a0b0c0d0e0f")
+    plain = b"The quick brown fox jumps over the lazy dog."
+
+    def test_blocks(self):
+        c = gmalg.SM4(self.key)
+        data = bytes(range(256)) * 3
+        cipher = c.encrypt_blocks(data)
+        self.assertEqual(cipher, b"".join(c.encrypt(data[i:i + 16]) for i in range(0, len(data), 16)))
+        self.assertEqual(c.decrypt_blocks(memoryview(cipher)), data)
+        self.assertEqual(c.encrypt_blocks(b""), b"")
+
+        buffer = bytearray(data)
+        self.assertIs(c.encrypt_blocks(buffer, out=buffer), buffer)
+        self.assertEqual(buffer, cipher)
+        out = bytearray(len(data) + 16)
+        c.decrypt_blocks(buffer, out=memoryview(out)[16:])
+        self.assertEqual(out[16:], data)
+
+        self.assertRaises(gmalg.errors.IncorrectLengthError, c.encrypt_blocks, data[:-1])
+        self.assertRaises(gmalg.errors.IncorrectLengthError, c.decrypt_blocks, data, out=bytearray(16))
+
+    def test_bitslice(self):
+        import gmalg.sm4
+
+        c = gmalg.SM4(self.key)
+        for blocks in (1, 7, 8, 9, 300):
+            data = (bytes(range(256)) * blocks)[:blocks * 16]
+            expected = b"".join(c.encrypt(data[i:i + 16]) for i in range(0, len(data), 16))
+
+            out = bytearray(len(data))
+            gmalg.sm4._bitslice_batch(memoryview(data), memoryview(out), c._rkey, gmalg.sm4._tower_maps())
+            self.assertEqual(out, expected)
+
+        # auto selected for many blocks without NumPy
+        with unittest.mock.patch("gmalg.sm4.import_numpy", return_value=None), \
+                unittest.mock.patch("gmalg.sm4._bitslice_crypt", wraps=gmalg.sm4._bitslice_crypt) as bitslice:
+            self.assertEqual(c.encrypt_blocks(data), expected)
+            self.assertEqual(c.decrypt_blocks(expected), data)
+        self.assertEqual(bitslice.call_count, 2)
+
+    @unittest.skipIf(importlib.util.find_spec("numpy") is None, "numpy not installed.")
+    def test_numpy(self):
+        import struct
+
+        import numpy
+
+        import gmalg.sm4
+        from gmalg.sm4_cipher import SM4_CTR, SM4_ECB
+
+        c = gmalg.SM4(self.key)
+        data = bytes(range(256)) * 40
+        expected = b"".join(c.encrypt(data[i:i + 16]) for i in range(0, len(data), 16))
+
+        out = bytearray(len(data))
+        gmalg.sm4._numpy_crypt(numpy, memoryview(data), memoryview(out), c._rkey)
+        self.assertEqual(out, expected)
+        self.assertEqual(SM4_ECB(self.key).encrypt(data)[:len(data)], expected)
+
+        counter = (1 << 32) - 5
+        ctr = SM4_CTR(self.key, self.iv[:8], counter)
+        keystream = b"".join(c.encrypt(self.iv[:8] + struct.pack(">Q", counter + i)) for i in range(100))
+        self.assertEqual(ctr._numpy_keystream(numpy, self.iv[:8], counter, 100), keystream)
+        self.assertEqual(ctr.decrypt(ctr.encrypt(data)), data)
+
+    def test_gcm(self):
+        from gmalg.sm4_cipher import SM4_GCM
+
+        # RFC 8998 A.1
+        key = bytes.fromhex("0123456789ABCDEFFEDCBA9876543210")
+        iv = bytes.fromhex("00001234567800000000ABCD")
+        aad = bytes.fromhex("FEEDFACEDEADBEEFFEEDFACEDEADBEEFABADDAD2")
+        plain = bytes.fromhex("AAAAAAAAAAAAAAAABBBBBBBBBBBBBBBBCCCCCCCCCCCCCCCCDDDDDDDDDDDDDDDD"
+                              "EEEEEEEEEEEEEEEEFFFFFFFFFFFFFFFFEEEEEEEEEEEEEEEEAAAAAAAAAAAAAAAA")
+        cipher = bytes.fromhex("17F399F08C67D5EE19D0DC9969C4BB7D5FD46FD3756489069157B282BB200735"
+                               "D82710CA5C22F0CCFA7CBF93D496AC15A56834CBCF98C397B4024A2691233B8D")
+        tag = bytes.fromhex("83DE3541E4C2B58177E065A9BF7B62EC")
+
+        c = SM4_GCM(key, iv)
+        self.assertEqual(c.encrypt(plain, aad), (iv + cipher, tag))
+        self.assertEqual(c.decrypt(iv + cipher, tag, aad), plain)
+        self.assertRaises(gmalg.errors.CheckFailedError, c.decrypt, iv + cipher, tag, aad[:-1])
+        self.assertRaises(gmalg.errors.CheckFailedError, c.decrypt, iv + cipher[:-1] + b"\x00", tag, aad)
+
+        # any IV length, J0 = GHASH(IV || 0-pad || [0]64 || [len(IV)]64)
+        def mul(X, Y):
+            Z = 0
+            for i in range(127, -1, -1):
+                if (X >> i) & 1:
+                    Z ^= Y
+                Y = (Y >> 1) ^ (0xe1 << 120) if Y & 1 else Y >> 1
+            return Z
+
+        H = int.from_bytes(gmalg.SM4(key).encrypt(bytes(16)), "big")
+        for iv in (b"\x01", bytes(range(16)), bytes(range(60))):
+            y = 0
+            data = iv + bytes(-len(iv) % 16) + (len(iv) * 8).to_bytes(16, "big")
+            for i in range(0, len(data), 16):
+                y = mul(y ^ int.from_bytes(data[i:i + 16], "big"), H)
+
+            c = SM4_GCM(key, iv)
+            self.assertEqual(c._j0(iv), y.to_bytes(16, "big"))
+            self.assertEqual(c.decrypt(*c.encrypt(plain, aad), aad, len(iv)), plain)
+
+    def test_ecb(self):
+        from gmalg.sm4_cipher import SM4_ECB
+
+        c = SM4_ECB(self.key)
+        cipher = c.encrypt(self.plain)
+        self.assertEqual(cipher.hex(), "088c41beac31615d33c94face62404a66ecf036539a35ddb288c6a82bfe937db499f38a3ce00e6da9c6bae0481d209dc")
+        self.assertEqual(c.decrypt(cipher), self.plain)
+
+    def test_cbc(self):
+        from gmalg.sm4_cipher import SM4_CBC
+
+        cipher = SM4_CBC(self.key, self.iv).encrypt(self.plain)
+        self.assertEqual(cipher.hex(), "b6556613480f80c2a4c4beadbdc795ced203d6945466924b4faa7bf47bfb403416f9f170bafbf72fe52be77cae3d3a98")
+        self.assertEqual(SM4_CBC(self.key, self.iv).decrypt(cipher), self.plain)
+
+    def test_cfb(self):
+        from gmalg.sm4_cipher import SM4_CFB
+
+        c = SM4_CFB(self.key, self.iv)
+        cipher = c.encrypt(self.plain)
+        self.assertEqual(cipher, self.iv + bytes.fromhex(
+            "52f0f9414cd301ce41ad95f08edf974aebdab6ed9ce21b3172640c3512ebed77dc634ef8e55749e62a86e5b1cb871638"))
+        self.assertEqual(c.decrypt(cipher), self.plain)
+
+    def test_ofb(self):
+        from gmalg.sm4_cipher import SM4_OFB
+
+        c = SM4_OFB(self.key, self.iv)
+        cipher = c.encrypt(self.plain)
+        self.assertEqual(cipher, self.iv + bytes.fromhex(
+            "52f0f9414cd301ce41ad95f08edf974a95803a6cddf6370d127f83e2b851c8543322b824ee737e0854816308"))
+        self.assertEqual(c.decrypt(cipher), self.plain)
+
+    def test_ctr(self):
+        from gmalg.sm4_cipher import SM4_CTR
+
+        nonce = self.iv[:8]
+        c = SM4_CTR(self.key, nonce)
+        cipher = c.encrypt(self.plain)
+        self.assertEqual(cipher, nonce + bytes.fromhex(
+            "043017608c6db94e7bb376a1dded4ac6b36acf0d7ee5d0ce7ff20698d38eba2871976d10bec1b00fce537017"))
+        self.assertEqual(SM4_CTR(self.key).decrypt(cipher), self.plain)
+
+        self.assertRaises(gmalg.errors.DataOverflowError, SM4_CTR(self.key, nonce, (1 << 64) - 2).encrypt, self.plain)
+
+    def test_stream(self):
+        from gmalg.sm4_cipher import SM4_CBC, SM4_CFB, SM4_CTR, SM4_ECB, SM4_GCM, SM4_OFB
+
+        def run(context, data, size):
+            output = [context.update(data[i:i + size]) for i in range(0, len(data), size)]
+            return b"".join(output) + context.finalize()
+
+        ciphers = [SM4_ECB(self.key), SM4_CBC(self.key, self.iv), SM4_CFB(self.key, self.iv),
+                   SM4_OFB(self.key, self.iv), SM4_CTR(self.key, self.iv[:8])]
+        for length in (0, 1, 16, 44, 2000):
+            plain = bytes(range(256)) * 8
+            plain = plain[:length]
+            for c in ciphers:
+                cipher = c.encrypt(plain)
+                for size in (1, 7, 16, 33, 1000, 4096):
+                    self.assertEqual(run(c.encryptor(), plain, size), cipher)
+                    self.assertEqual(run(c.decryptor(), cipher, size), plain)
+
+            c = SM4_GCM(self.key)
+            cipher, tag = c.encrypt(plain, b"aad", self.iv[:12])
+            for size in (1, 7, 16, 33, 1000, 4096):
+                context = c.encryptor(b"a", self.iv[:12])
+                context.update_aad(b"a")
+                context.update_aad(b"d")
+                self.assertEqual(run(context, plain, size), cipher)
+                self.assertEqual(context.tag, tag)
+                context = c.decryptor(tag)
+                context.update_aad(b"aad")
+                self.assertEqual(run(context, cipher, size), plain)
+            self.assertRaises(gmalg.errors.CheckFailedError, run, c.decryptor(tag, b"bad"), cipher, 16)
+
+        # a fresh IV for every GCM message, an IV given at construction is used once
+        c = SM4_GCM(self.key)
+        (a, tag_a), (b, tag_b) = c.encrypt(self.plain), c.encrypt(self.plain)
+        self.assertNotEqual(a[:12], b[:12])
+        self.assertEqual(c.decrypt(a, tag_a), self.plain)
+        self.assertEqual(c.decrypt(b, tag_b), self.plain)
+
+        # the IV length of the ciphertext does not depend on the last encryption
+        long_iv, long_tag = c.encrypt(self.plain, iv=bytes(16))
+        self.assertEqual(c.decrypt(a, tag_a), self.plain)
+        self.assertEqual(SM4_GCM(self.key).decrypt(long_iv, long_tag, iv_length=16), self.plain)
+        self.assertEqual(run(c.decryptor(long_tag, iv_length=16), long_iv, 5), self.plain)
+        c = SM4_GCM(self.key, self.iv[:12])
+        self.assertEqual(c.encrypt(self.plain)[0][:12], self.iv[:12])
+        self.assertRaises(gmalg.errors.InvalidArgumentError, c.encrypt, self.plain)
+        self.assertRaises(gmalg.errors.InvalidArgumentError, c.encryptor)
+
+        context = c.encryptor(iv=bytes(12))
+        context.update(self.plain)
+        self.assertRaises(gmalg.errors.InvalidArgumentError, context.update_aad, b"late")
+
+        # every call starts from the IV
+        c = SM4_CBC(self.key, self.iv)
+        self.assertEqual(c.encrypt(self.plain), c.encrypt(self.plain))
+        self.assertEqual(c.decrypt(c.encrypt(self.plain)), self.plain)
+
+        context = c.decryptor()
+        context.update(c.encrypt(self.plain)[:-1])
+        self.assertRaises(gmalg.errors.IncorrectLengthError, context.finalize)
+        self.assertRaises(gmalg.errors.InvalidArgumentError, context.update, b"")
+
+        context = SM4_CFB(self.key, self.iv).decryptor()
+        context.update(self.iv[:-1])
+        self.assertRaises(gmalg.errors.IncorrectLengthError, context.finalize)
+
+
 class TestSM9(unittest.TestCase):
     def test_sign(self):
         hid_s = b"\x01"